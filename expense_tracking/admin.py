@@ -1,6 +1,9 @@
 from django.contrib import admin
-from .models import ExpenseType, Expense
+from .models import ExpenseType, Expense, Budget, Job, RecurringExpense
 
 
 admin.site.register(ExpenseType)
 admin.site.register(Expense)
+admin.site.register(Budget)
+admin.site.register(RecurringExpense)
+admin.site.register(Job)
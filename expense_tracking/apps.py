@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ExpenseTrackingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'expense_tracking'
+
+    def ready(self):
+        # Connect the signal receivers and register the system checks
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+from pretty_html_table import build_table
+from plotly.offline import plot
+from .reports import TREND_PERIODS, expense_totals_by_type, trend_range
+
+
+# This module holds the pandas and plotly code of the reports.  It is only
+# imported by the views that draw charts, so loading the application does
+# not load these libraries.
+
+# Set float values to 2 decimal places
+pd.options.display.float_format = '{:,.2f}'.format
+pd.set_option('future.no_silent_downcasting', True)
+
+# Most points per line of a trends chart.  Longer series are averaged down
+# so the payload stays the same size however many years are shown.
+MAX_TREND_POINTS = 400
+
+# Pandas frequency of each trend period
+TREND_FREQUENCIES = {
+    'week': 'W-MON',
+    'month': 'MS',
+}
+
+
+def build_report(start, end):
+    # Function returns the HTML table and chart of the expense totals per
+    # expense type between start and end, or an empty dict when there are no
+    # expenses in the range
+
+    # Totals per expense type for the date range, grouped and summed in the
+    # database
+    return draw_report(start, end, expense_totals_by_type(start, end))
+
+
+def draw_report(start, end, totals):
+    # Function returns the HTML table and chart of expense totals per
+    # expense type, or an empty dict when there are none.  It does not use
+    # the database, so async views can run it in a worker thread.
+
+    # String format of dates for chart
+    start_str = start.strftime('%m-%d-%Y')
+    end_str = end.strftime('%m-%d-%Y')
+
+    grouped_df = pd.DataFrame(
+        [
+            (total['expense_type'], float(total['amount']))
+            for total in totals
+        ],
+        columns=['Expense Type', 'Amount']
+    )
+
+    if len(grouped_df.index) == 0:
+        return {}
+
+    trace = go.Bar(
+        x=grouped_df['Expense Type'],
+        y=grouped_df['Amount']
+    )
+
+    layout = go.Layout(
+        title={
+            'text': f'<b>Expenses from {start_str} to {end_str}</b>',
+        },
+        title_x=.5,
+        xaxis={
+            'title': '<b>Expense Type</b>'
+        },
+        yaxis={
+            'title': '<b>Amount (in dollars)</b>'
+        },
+        plot_bgcolor='rgba(0, 0, 0, 0)',
+        paper_bgcolor='rgba(0, 0, 0, 0)',
+    )
+    fig = go.Figure(data=trace, layout=layout)
+    plt_div = plot(fig, output_type='div', include_plotlyjs=False)
+
+    return {
+        'grouped_df': build_table(grouped_df, 'blue_light'),
+        'plt_div': plt_div
+    }
+
+
+def trend_layout(title, y_title):
+    return {
+        'title': {'text': f'<b>{title}</b>', 'x': .5},
+        'xaxis': {'title': {'text': '<b>Period</b>'}},
+        'yaxis': {'title': {'text': f'<b>{y_title}</b>'}},
+        'hovermode': 'x unified',
+        'height': 500,
+        'plot_bgcolor': 'rgba(0, 0, 0, 0)',
+        'paper_bgcolor': 'rgba(0, 0, 0, 0)',
+    }
+
+
+def draw_trends(start, end, period, window, totals):
+    # Function returns the payload of the trends report from the totals per
+    # period and expense type, or an empty dict when there are none.  For
+    # every expense type, and all of them together, it holds the total of
+    # each period from start to end, its rolling average over window periods
+    # and its percent change from a year earlier, as whole columns computed
+    # from the totals (which start a year before start).  The page draws the
+    # charts with plotly.js.  Like draw_report it does not use the database.
+
+    frame = pd.DataFrame(
+        [
+            (total['period'], total['expense_type'], float(total['total']))
+            for total in totals
+        ],
+        columns=['period', 'expense_type', 'total']
+    )
+    if len(frame.index) == 0:
+        return {}
+    frame['period'] = pd.to_datetime(frame['period'])
+
+    # One column per expense type and a row for every period, including the
+    # periods without expenses
+    by_type = frame.pivot_table(
+        index='period',
+        columns='expense_type',
+        values='total',
+        aggfunc='sum',
+        fill_value=0.0
+    )
+    names = [str(name) for name in by_type.columns] + ['All types']
+    periods = pd.date_range(
+        pd.Timestamp(trend_range(start, end, period)[1]),
+        pd.Timestamp(end),
+        freq=TREND_FREQUENCIES[period]
+    )
+    series = by_type.reindex(periods, fill_value=0.0).to_numpy()
+    series = pd.DataFrame(
+        np.column_stack([series, series.sum(axis=1)]), index=periods
+    )
+
+    rolling = series.rolling(window, min_periods=1).mean()
+    previous = series.shift(TREND_PERIODS[period])
+    change = (series - previous) / previous.where(previous != 0) * 100
+
+    shown = periods >= pd.Timestamp(start)
+    series, rolling, change = series[shown], rolling[shown], change[shown]
+    if len(series.index) == 0:
+        return {}
+
+    # The last period of each series, for the table
+    latest = [
+        {
+            'expense_type': name,
+            'total': total,
+            'rolling': average,
+            'change': None if pd.isna(delta) else delta,
+        }
+        for name, total, average, delta in zip(
+            names, series.iloc[-1], rolling.iloc[-1], change.iloc[-1]
+        )
+    ]
+
+    # Average consecutive periods together when there are too many to draw
+    step = -(-len(series.index) // MAX_TREND_POINTS)
+
+    def points(values):
+        if step > 1:
+            blocks = np.arange(len(values.index)) // step
+            values = values.groupby(blocks).mean()
+        values = values.round(2).astype(object)
+        return values.where(values.notna(), None).to_numpy().T.tolist()
+
+    label = 'Week' if period == 'week' else 'Month'
+    title = f'{start:%m-%d-%Y} to {end:%m-%d-%Y}'
+    return {
+        'latest': latest,
+        'periods': series.index[::step].strftime('%Y-%m-%d').tolist(),
+        'step': step,
+        'series': [
+            {'name': name, 'total': total, 'rolling': average, 'change': delta}
+            for name, total, average, delta in zip(
+                names, points(series), points(rolling), points(change)
+            )
+        ],
+        'layouts': {
+            'totals': trend_layout(
+                f'{label}ly Expenses from {title}', 'Amount (in dollars)'
+            ),
+            'change': trend_layout(
+                f'Year Over Year Change from {title}', 'Change (%)'
+            ),
+        },
+    }
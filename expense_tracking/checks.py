@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_report_cache(app_configs, **kwargs):
+    # Check the report cache is shared between processes outside of
+    # development.  Expenses written by one process (a web worker, or the
+    # job worker's imports and recurring expenses) only invalidate the
+    # cached reports and pages of the others through the shared versions.
+
+    from .report_cache import shared_cache
+
+    if settings.DEBUG or shared_cache():
+        return []
+    return [Warning(
+        'The report cache is local to each process, so processes can show '
+        'reports and pages from before another process changed expenses '
+        'for up to a minute.',
+        hint='Set REPORT_CACHE_BACKEND in .env to a shared cache, e.g. '
+             'django.core.cache.backends.filebased.FileBasedCache (the '
+             'default) or django.core.cache.backends.redis.RedisCache.',
+        id='expense_tracking.W001',
+    )]
@@ -0,0 +1,84 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from .report_cache import shared_cache
+
+
+# Cookie holding the messages waiting to be shown (Django's cookie message
+# storage, which also marks messages that overflowed to the session)
+MESSAGES_COOKIE = 'messages'
+
+
+def page_etag(request, *parts):
+    # Function returns the ETag of a response that only changes with the
+    # given parts (e.g. a data version and the url).  It also varies on the
+    # cookies a page shows something of: the session (whose user is logged
+    # in), the CSRF token of its forms and the messages waiting to be shown.
+    # The versions are read from the report cache, so without a cache shared
+    # between processes a change made by another process would keep the
+    # ETag and the client's stale copy: None is returned then, and the
+    # response is built and gets an ETag from its content instead (by
+    # ConditionalGetMiddleware).
+
+    if not shared_cache():
+        return None
+    cookies = [
+        request.COOKIES.get(name, '')
+        for name in (
+            settings.SESSION_COOKIE_NAME,
+            settings.CSRF_COOKIE_NAME,
+            MESSAGES_COOKIE
+        )
+    ]
+    value = '\n'.join(str(part) for part in [*parts, *cookies])
+    return quote_etag(hashlib.md5(value.encode()).hexdigest())
+
+
+def not_modified(request, etag):
+    # Function returns an empty 304 response when the client's copy of a GET
+    # response has the etag, otherwise None
+
+    if etag is None or request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(request, etag=etag)
+
+
+def set_etag(response, etag, **cache_control):
+    # Function adds the ETag to a response and lets only the user's browser
+    # store it, by default checking it is still current before every use
+
+    if response.status_code in (200, 304):
+        if etag is not None:
+            response.headers.setdefault('ETag', etag)
+        patch_cache_control(
+            response, private=True, **(cache_control or {'no_cache': True})
+        )
+    return response
+
+
+def conditional_page(etag_parts):
+    # Decorator for async views of pages that only change with the values
+    # returned by the coroutine function etag_parts, called with the view's
+    # arguments.  A GET request for a page the client already has gets an
+    # empty 304 response without running the view.  Pages are built as
+    # usual when the report cache is not shared (see page_etag).
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not shared_cache():
+                return await view(request, *args, **kwargs)
+
+            etag = page_etag(
+                request, *await etag_parts(request, *args, **kwargs)
+            )
+            response = not_modified(request, etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return set_etag(response, etag)
+        return inner
+    return decorator
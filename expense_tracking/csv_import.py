@@ -0,0 +1,181 @@
+import csv
+import datetime
+import io
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+from .expense_types import get_expense_types
+from .forms import ExpenseForm
+from .models import Expense
+from .rollups import refresh_rollups
+
+
+# CSV columns, in order, of an expense row
+COLUMNS = ExpenseForm.Meta.fields
+
+
+class ExpenseRowValidator:
+    # Class for validating CSV rows with the ExpenseForm field rules.  Expense
+    # types are looked up by name (or id) in a map built once from the cached
+    # expense types.
+
+    def __init__(self):
+        self.form_fields = {
+            name: field
+            for name, field in ExpenseForm.base_fields.items()
+            if name != 'expense_type'
+        }
+        self.expense_types = {}
+        for expense_type in get_expense_types():
+            self.expense_types[expense_type.name] = expense_type.pk
+            self.expense_types[str(expense_type.pk)] = expense_type.pk
+
+    def clean(self, record):
+        # Function returns an unsaved expense for a valid record, or the list
+        # of error messages for an invalid one
+
+        if len(record) != len(COLUMNS):
+            return None, [
+                f'Expected {len(COLUMNS)} columns but found {len(record)}.'
+            ]
+
+        values = {}
+        errors = []
+        for name, value in zip(COLUMNS, record):
+            value = value.strip()
+            if name == 'expense_type':
+                if value not in self.expense_types:
+                    errors.append(f'expense_type: Unknown type "{value}".')
+                    continue
+                values['expense_type_id'] = self.expense_types[value]
+                continue
+            if name == 'expense_date':
+                # Fast path for ISO dates, which the form accepts as well
+                try:
+                    values[name] = datetime.date.fromisoformat(value)
+                    continue
+                except ValueError:
+                    pass
+            try:
+                values[name] = self.form_fields[name].clean(value)
+            except ValidationError as error:
+                errors.extend(
+                    f'{name}: {message}' for message in error.messages
+                )
+
+        if errors:
+            return None, errors
+        return Expense(**values), None
+
+
+def copy_expenses(expenses):
+    # Function writes expenses with PostgreSQL COPY
+
+    fields = [
+        'expense_date', 'expense_type_id', 'name', 'org', 'amount', 'notes',
+        'inserted_date'
+    ]
+    buffer = io.StringIO()
+    # Quote every value so empty notes are not read as NULL
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+    for expense in expenses:
+        writer.writerow([getattr(expense, field) for field in fields])
+
+    sql = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+        connection.ops.quote_name(Expense._meta.db_table),
+        ', '.join(
+            connection.ops.quote_name(
+                Expense._meta.get_field(field).column
+            )
+            for field in fields
+        )
+    )
+    with connection.cursor() as cursor:
+        if hasattr(cursor.cursor, 'copy_expert'):
+            # psycopg2
+            buffer.seek(0)
+            cursor.cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with cursor.cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+class ImportResult:
+    # Class for the counts and timing of an import
+
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        if not self.elapsed:
+            return 0.0
+        return (self.imported + self.rejected) / self.elapsed
+
+
+def import_expenses(file, batch_size=1000, transaction_size=10000,
+                    use_copy=False, rejects=None, skip_header=True):
+    # Function streams expense rows from an open CSV file into the database.
+    # Valid rows are written transaction_size rows per transaction with
+    # bulk_create (or COPY), so memory does not grow with the file size.
+    # Invalid rows are written with their line number and errors to the
+    # rejects CSV writer, when one is given.  The rollups of the imported
+    # date range are refreshed once at the end.
+
+    use_copy = use_copy and connection.vendor == 'postgresql'
+    validator = ExpenseRowValidator()
+    result = ImportResult()
+    reader = csv.reader(file)
+    if skip_header:
+        next(reader, None)
+
+    expense_type_ids = set()
+    first_date = last_date = None
+    pending = []
+
+    def write_pending():
+        nonlocal first_date, last_date
+        if not pending:
+            return
+        with transaction.atomic():
+            if use_copy:
+                copy_expenses(pending)
+            else:
+                Expense.objects.bulk_create(pending, batch_size=batch_size)
+        for expense in pending:
+            expense_type_ids.add(expense.expense_type_id)
+            if first_date is None or expense.expense_date < first_date:
+                first_date = expense.expense_date
+            if last_date is None or expense.expense_date > last_date:
+                last_date = expense.expense_date
+        result.imported += len(pending)
+        pending.clear()
+
+    try:
+        for record in reader:
+            expense, errors = validator.clean(record)
+            if errors:
+                result.rejected += 1
+                if rejects is not None:
+                    rejects.writerow(
+                        [reader.line_num, '; '.join(errors), *record]
+                    )
+                continue
+            expense.inserted_date = timezone.now()
+            pending.append(expense)
+            if len(pending) >= transaction_size:
+                write_pending()
+        write_pending()
+    finally:
+        # Roll up whatever was committed, even when the import stopped early
+        if first_date is not None:
+            refresh_rollups(first_date, last_date, expense_type_ids)
+        result.elapsed = time.perf_counter() - result.started
+
+    return result
@@ -0,0 +1,156 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.urls import reverse
+from .expense_types import get_expense_types
+from .pagination import cached_count
+from .search import search_filter
+
+
+# Table columns, in display order, and the field each one sorts by
+COLUMNS = [
+    ('id', 'id'),
+    ('expense_date', 'expense_date'),
+    ('expense_type', 'expense_type__name'),
+    ('name', 'name'),
+    ('org', 'org'),
+    ('amount', 'amount'),
+    ('notes', 'notes'),
+]
+
+# Columns a client may sort by.  Only expense date (with id breaking ties)
+# and id are served by an index; sorting by another column would sort every
+# matching row on each page request.
+SORTABLE = {'id', 'expense_date'}
+
+# Seconds the cursor ending a page is kept for the request of the next page
+CURSOR_TIMEOUT = 60 * 5
+
+# Largest page a client may ask for
+MAX_LENGTH = 500
+
+
+def get_int(params, name, default, minimum=0, maximum=None):
+    # Function returns an integer request parameter within bounds, or the
+    # default when it is missing or not a number
+
+    try:
+        value = int(params.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    value = max(value, minimum)
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+
+def seek(expenses, ordering, cursor):
+    # Function returns the expenses after the cursor (the ordering fields'
+    # values of the last row of the previous page)
+
+    lookup = 'lt' if ordering[0].startswith('-') else 'gt'
+    fields = [field.lstrip('-') for field in ordering]
+    if len(fields) == 1:
+        return expenses.filter(**{f'{fields[0]}__{lookup}': cursor[0]})
+    value, pk = cursor
+    # The bound on the first field lets the index range scan start at the
+    # cursor
+    return expenses.filter(
+        Q(**{f'{fields[0]}__{lookup}': value}) |
+        Q(**{fields[0]: value, f'id__{lookup}': pk}),
+        **{f'{fields[0]}__{lookup}e': value}
+    )
+
+
+def table_data(params, expenses, count_key):
+    # Function returns the response of the DataTables server-side processing
+    # protocol (draw, start, length, order and search parameters) for a
+    # queryset of expenses.  Sorting, searching and paging run in the
+    # database so only the rows shown are fetched.
+
+    draw = get_int(params, 'draw', 0)
+    start = get_int(params, 'start', 0)
+    length = get_int(params, 'length', 50, minimum=1, maximum=MAX_LENGTH)
+
+    records_total = cached_count(expenses, count_key)
+
+    # Search the columns with trigram indexes, and match expense types by
+    # name in the cached expense types rather than joining their table, so
+    # every condition of the OR can use an index on the expense table
+    search = params.get('search[value]', '').strip()
+    search_key = hashlib.md5(search.encode()).hexdigest()
+    if search:
+        matches = search_filter(search)
+        expense_type_ids = [
+            expense_type.pk for expense_type in get_expense_types()
+            if search.upper() in expense_type.name.upper()
+        ]
+        if expense_type_ids:
+            matches |= Q(expense_type_id__in=expense_type_ids)
+        expenses = expenses.filter(matches)
+        records_filtered = cached_count(
+            expenses, f'{count_key}:search:{search_key}'
+        )
+    else:
+        records_filtered = records_total
+
+    # Sort by the first sortable column requested, expense date by default,
+    # with id breaking ties so pages are stable
+    ordering = ['-expense_date', '-id']
+    i = 0
+    while f'order[{i}][column]' in params:
+        column = get_int(params, f'order[{i}][column]', -1)
+        if 0 <= column < len(COLUMNS) and COLUMNS[column][0] in SORTABLE:
+            field = COLUMNS[column][1]
+            sign = '-' if params.get(f'order[{i}][dir]') == 'desc' else ''
+            ordering = [sign + field]
+            if field != 'id':
+                ordering.append(sign + 'id')
+            break
+        i += 1
+
+    # Paging forward from the previous page seeks past the cursor of its
+    # last row instead of skipping start rows, so every page costs the same
+    cursor_key = 'datatables:cursor:' + hashlib.md5(
+        f'{count_key}:{search_key}:{",".join(ordering)}'.encode()
+    ).hexdigest() + ':{}'
+    cursor = cache.get(cursor_key.format(start)) if start else None
+    expenses = expenses.order_by(*ordering).values(
+        *(field for _, field in COLUMNS)
+    )
+    if cursor is not None:
+        rows = list(seek(expenses, ordering, cursor)[:length])
+    else:
+        rows = list(expenses[start:start + length])
+    if len(rows) == length:
+        cache.set(
+            cursor_key.format(start + length),
+            [rows[-1][field.lstrip('-')] for field in ordering],
+            CURSOR_TIMEOUT
+        )
+
+    data = []
+    for row in rows:
+        data.append({
+            'id': row['id'],
+            'expense_date': row['expense_date'].strftime('%m/%d/%Y'),
+            'expense_type': row['expense_type__name'],
+            'name': row['name'],
+            'org': row['org'],
+            'amount': f'{row["amount"]:.2f}',
+            'notes': row['notes'],
+            'edit_url': reverse(
+                'expense_tracking:edit_expense', args=[row['id']]
+            ),
+            'delete_url': reverse(
+                'expense_tracking:delete_expense', args=[row['id']]
+            ),
+        })
+
+    return {
+        'draw': draw,
+        'recordsTotal': records_total,
+        'recordsFiltered': records_filtered,
+        'data': data,
+    }
@@ -0,0 +1,98 @@
+import time
+
+from .models import ExpenseType
+from .report_cache import get_cache, new_version, version_timeout
+
+
+# Key of the expense types version in the shared cache, bumped whenever an
+# expense type is saved or deleted
+VERSION_KEY = 'expense_tracking:expense_types:version'
+
+# Seconds a process keeps its expense types without a version change, which
+# bounds how stale they can be when the cache is not shared between processes
+MAX_AGE = 60
+
+
+class ExpenseTypes:
+    # Class for a snapshot of all expense types: ordered by name, and by id
+    # and name for lookups
+
+    def __init__(self, expense_types, version):
+        self.ordered = expense_types
+        self.by_id = {
+            expense_type.pk: expense_type for expense_type in expense_types
+        }
+        self.by_name = {
+            expense_type.name: expense_type for expense_type in expense_types
+        }
+        self.version = version
+        self.loaded = time.monotonic()
+
+    def __iter__(self):
+        return iter(self.ordered)
+
+    def __len__(self):
+        return len(self.ordered)
+
+    def fresh(self, version):
+        return (
+            version == self.version and
+            time.monotonic() - self.loaded < MAX_AGE
+        )
+
+
+# Snapshot of this process
+_snapshot = None
+
+
+def get_expense_types():
+    # Function returns the snapshot of expense types held by this process,
+    # reloading it with one query when an expense type has changed.  Checking
+    # the version costs one cache read instead of a query.  The version is
+    # read before the expense types, so a change made in between reloads
+    # them again on next use.
+
+    global _snapshot
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # A missing version starts at a new version, so it can never match
+        # the version of a snapshot loaded before it was evicted
+        cache.add(VERSION_KEY, new_version(), timeout=version_timeout())
+        version = cache.get(VERSION_KEY)
+    snapshot = _snapshot
+    if snapshot is None or not snapshot.fresh(version):
+        snapshot = _snapshot = ExpenseTypes(
+            list(ExpenseType.objects.order_by('name')), version
+        )
+    return snapshot
+
+
+async def aget_expense_types():
+    # Function is the async version of get_expense_types
+
+    global _snapshot
+    cache = get_cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(
+            VERSION_KEY, new_version(), timeout=version_timeout()
+        )
+        version = await cache.aget(VERSION_KEY)
+    snapshot = _snapshot
+    if snapshot is None or not snapshot.fresh(version):
+        snapshot = _snapshot = ExpenseTypes(
+            [
+                expense_type
+                async for expense_type in ExpenseType.objects.order_by('name')
+            ],
+            version
+        )
+    return snapshot
+
+
+def invalidate_expense_types():
+    # Function bumps the expense types version, so every process reloads its
+    # snapshot on next use
+
+    get_cache().set(VERSION_KEY, new_version(), timeout=version_timeout())
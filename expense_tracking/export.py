@@ -0,0 +1,183 @@
+import csv
+import itertools
+import tempfile
+from importlib.util import find_spec
+
+from asgiref.sync import sync_to_async
+from .csv_import import COLUMNS
+
+
+# Rows fetched from the database per round trip.  On PostgreSQL the rows are
+# read through a server-side cursor, so memory does not grow with the export.
+CHUNK_SIZE = 2000
+
+# Chunks of an export read per trip to a thread when it is streamed to an
+# ASGI server
+ASYNC_BATCH = 500
+
+# Content type and file extension of each export format
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'xlsx': (
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'xlsx'
+    ),
+}
+
+
+def available_formats():
+    # Function returns the export formats whose libraries are installed.
+    # CSV is always available; Parquet needs pyarrow and XLSX openpyxl.
+
+    formats = ['csv']
+    if find_spec('pyarrow') is not None:
+        formats.append('parquet')
+    if find_spec('openpyxl') is not None:
+        formats.append('xlsx')
+    return formats
+
+
+def export_rows(expenses, chunk_size=CHUNK_SIZE):
+    # Function yields a tuple per expense with the columns of the CSV import
+    # (the expense type by name), so an export can be imported again
+
+    fields = [
+        'expense_type__name' if column == 'expense_type' else column
+        for column in COLUMNS
+    ]
+    return expenses.order_by('expense_date', 'id').values_list(
+        *fields
+    ).iterator(chunk_size=chunk_size)
+
+
+class Echo:
+    # Class for a file-like object returning what is written to it, so
+    # csv.writer can format one row at a time for a streaming response
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    # Function yields the CSV header then one line per row
+
+    writer = csv.writer(Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class Chunks:
+    # Class for a file-like object collecting what is written to it until it
+    # is taken, so a writer's output can be streamed as it is produced
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_parquet(rows, chunk_size=CHUNK_SIZE):
+    # Function yields a Parquet file written one row group of chunk_size rows
+    # at a time
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('expense_date', pa.date32()),
+        ('expense_type', pa.string()),
+        ('name', pa.string()),
+        ('org', pa.string()),
+        ('amount', pa.decimal128(9, 2)),
+        ('notes', pa.string()),
+    ])
+    output = Chunks()
+    writer = pq.ParquetWriter(output, schema)
+
+    def write(batch):
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(column) for column in zip(*batch)], schema=schema
+        ))
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == chunk_size:
+            write(batch)
+            batch = []
+            yield output.take()
+    if batch:
+        write(batch)
+    writer.close()
+    yield output.take()
+
+
+def stream_xlsx(rows, block_size=64 * 1024):
+    # Function yields an XLSX workbook.  The sheet is written in write-only
+    # mode, which keeps rows on disk rather than in memory, then the saved
+    # file is read back in blocks.
+
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Expenses')
+    sheet.append(list(COLUMNS))
+    for row in rows:
+        sheet.append(row)
+
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while True:
+            block = file.read(block_size)
+            if not block:
+                break
+            yield block
+
+
+def stream_export(expenses, export_format, chunk_size=CHUNK_SIZE):
+    # Function yields the expenses in an export format ('csv', 'parquet' or
+    # 'xlsx')
+
+    rows = export_rows(expenses, chunk_size)
+    if export_format == 'parquet':
+        return stream_parquet(rows, chunk_size)
+    if export_format == 'xlsx':
+        return stream_xlsx(rows)
+    return stream_csv(rows)
+
+
+async def astream_export(chunks, batch_size=ASYNC_BATCH):
+    # Function yields the chunks of a synchronous export (e.g. from
+    # stream_export) for an ASGI server, which would otherwise read a
+    # synchronous iterator to the end, in memory, before sending it.  The
+    # export is read in a thread, batch_size chunks at a time, joined into
+    # one message.
+
+    chunks = iter(chunks)
+
+    def take():
+        return list(itertools.islice(chunks, batch_size))
+
+    try:
+        while batch := await sync_to_async(take)():
+            # Chunks are all str (CSV) or all bytes
+            yield batch[0][:0].join(batch)
+    finally:
+        await sync_to_async(chunks.close)()
@@ -1,7 +1,10 @@
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm
-from .models import Expense
+from .expense_types import get_expense_types
+from .models import Expense, ExpenseType
+from .reports import TREND_PERIODS
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from captcha.fields import ReCaptchaField
 
 
@@ -13,9 +16,53 @@ class AuthenticationFormWithCaptchaField(AuthenticationForm):
     )
 
 
+class ExpenseTypeChoiceIterator(forms.models.ModelChoiceIterator):
+    # Class for the choices of an expense type field, from the cached expense
+    # types instead of a query per render
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for expense_type in get_expense_types():
+            yield self.choice(expense_type)
+
+    def __len__(self):
+        return len(get_expense_types()) + (
+            1 if self.field.empty_label is not None else 0
+        )
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(get_expense_types())
+
+
+class ExpenseTypeChoiceField(forms.ModelChoiceField):
+    # Class for an expense type field choosing and validating from the cached
+    # expense types instead of querying them
+
+    iterator = ExpenseTypeChoiceIterator
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, ExpenseType):
+            value = value.pk
+        try:
+            return get_expense_types().by_id[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+
 class ExpenseForm(forms.ModelForm):
     # Class for expense form
 
+    expense_type = ExpenseTypeChoiceField(
+        queryset=ExpenseType.objects.order_by('name')
+    )
+
     class Meta:
         model = Expense
         fields = (
@@ -83,5 +130,176 @@ class ExpenseForm(forms.ModelForm):
 
 
 class DateRangeForm(forms.Form):
+    # Class for the date range of a report.  A report reads a cache version
+    # for every month of its range, so ranges cover at most MAX_YEARS.
+
+    MAX_YEARS = 25
+
     start_date = forms.DateField()
     end_date = forms.DateField()
+
+    def clean(self):
+        # Function to check the range is not longer than MAX_YEARS
+
+        cleaned_data = super().clean()
+        start = cleaned_data.get('start_date')
+        end = cleaned_data.get('end_date')
+        if start and end and (
+            (end.year - start.year) * 12 + end.month - start.month >
+            self.MAX_YEARS * 12
+        ):
+            raise ValidationError(
+                f'Reports cover at most {self.MAX_YEARS} years.'
+            )
+        return cleaned_data
+
+
+class BudgetMonthForm(forms.Form):
+    # Class for the month of the budget page, e.g. '2024-01'
+
+    month = forms.DateField(
+        input_formats=['%Y-%m'],
+        widget=forms.DateInput(attrs={'type': 'month'}, format='%Y-%m')
+    )
+
+    def clean_month(self):
+        # Function returns the first day of the month
+
+        return self.cleaned_data['month'].replace(day=1)
+
+
+class TrendForm(forms.Form):
+    # Class for the date range, period and rolling window of the trends
+    # report.  Every field is optional: the range defaults to the last five
+    # years, the period to months and the window to a quarter.
+
+    YEARS = 5
+    MAX_YEARS = DateRangeForm.MAX_YEARS
+    WINDOWS = {'week': 13, 'month': 3}
+
+    start_date = forms.DateField(required=False)
+    end_date = forms.DateField(required=False)
+    period = forms.ChoiceField(
+        choices=[('month', 'Monthly'), ('week', 'Weekly')], required=False
+    )
+    window = forms.IntegerField(min_value=1, required=False)
+
+    def clean(self):
+        # Function fills in the defaults and checks the range and window
+
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+
+        end = cleaned_data['end_date'] or timezone.now().date()
+        start = cleaned_data['start_date'] or end.replace(
+            year=end.year - self.YEARS, day=1
+        )
+        period = cleaned_data['period'] or 'month'
+        window = cleaned_data['window'] or self.WINDOWS[period]
+        if start > end:
+            raise ValidationError(
+                'The start date must be earlier than the end date.'
+            )
+        if start < end.replace(year=end.year - self.MAX_YEARS, day=1):
+            raise ValidationError(
+                f'Trends cover at most {self.MAX_YEARS} years.'
+            )
+        if window > TREND_PERIODS[period]:
+            raise ValidationError(
+                f'The rolling window is at most {TREND_PERIODS[period]} '
+                f'{period}s.'
+            )
+
+        cleaned_data.update(
+            start_date=start, end_date=end, period=period, window=window
+        )
+        return cleaned_data
+
+
+class ExpenseFilterForm(forms.Form):
+    # Class for the optional date range and expense type filters of the
+    # expense API and exports
+
+    start_date = forms.DateField(required=False)
+    end_date = forms.DateField(required=False)
+    expense_type = forms.IntegerField(required=False)
+
+    def clean(self):
+        # Function to check the start date is not after the end date
+
+        cleaned_data = super().clean()
+        start = cleaned_data.get('start_date')
+        end = cleaned_data.get('end_date')
+        if start and end and start > end:
+            raise ValidationError(
+                'The start date must be earlier than the end date.'
+            )
+        return cleaned_data
+
+    def filter(self, expenses):
+        # Function returns the expenses matching the cleaned filters
+
+        start = self.cleaned_data.get('start_date')
+        end = self.cleaned_data.get('end_date')
+        expense_type = self.cleaned_data.get('expense_type')
+        if start:
+            expenses = expenses.filter(expense_date__gte=start)
+        if end:
+            expenses = expenses.filter(expense_date__lte=end)
+        if expense_type is not None:
+            expenses = expenses.filter(expense_type_id=expense_type)
+        return expenses
+
+
+class ExpenseImportForm(forms.Form):
+    # Class for the CSV file of a background import
+
+    file = forms.FileField()
+
+    def clean_file(self):
+        # Function to check the file is a CSV file
+
+        file = self.cleaned_data['file']
+        if not file.name.lower().endswith('.csv'):
+            raise ValidationError('Please choose a CSV file.')
+        return file
+
+
+class ExpenseTotalsForm(DateRangeForm):
+    # Class for the date range and grouping of the expense totals API.
+    # group_by is a comma separated list of 'type' and at most one period
+    # ('day', 'week' or 'month').
+
+    PERIODS = ('day', 'week', 'month')
+
+    group_by = forms.CharField(required=False)
+
+    def clean_group_by(self):
+        # Function to check the grouping and return it as a (by_type,
+        # period) pair
+
+        group_by = self.cleaned_data['group_by'] or 'type'
+        groups = [group.strip() for group in group_by.split(',')]
+        periods = [group for group in groups if group in self.PERIODS]
+        unknown = [
+            group for group in groups
+            if group != 'type' and group not in self.PERIODS
+        ]
+        if unknown or len(periods) > 1:
+            raise ValidationError(
+                'Group by type and/or one of day, week or month.'
+            )
+        return 'type' in groups, periods[0] if periods else None
+
+    def clean(self):
+        # Function to check the start date is not after the end date
+
+        cleaned_data = super().clean()
+        start = cleaned_data.get('start_date')
+        end = cleaned_data.get('end_date')
+        if start and end and start > end:
+            raise ValidationError(
+                'The start date must be earlier than the end date.'
+            )
+        return cleaned_data
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+
+from .report_cache import shared_cache
+
+
+def get_fragment_cache():
+    # Function returns the cache backend of {% cache %} template fragments,
+    # the same one the cache tag uses (the 'template_fragments' cache when
+    # configured, otherwise the default cache)
+
+    if 'template_fragments' in settings.CACHES:
+        return caches['template_fragments']
+    return caches['default']
+
+
+def fragment_timeout():
+    # Function returns the seconds template fragments are cached.  They are
+    # keyed by versions in the report cache, so they are only cached when
+    # that cache is shared between processes: with a cache local to each
+    # process, a change made by another process would not change the key and
+    # a stale fragment would be shown.  A timeout of 0 caches nothing.
+
+    if not shared_cache():
+        return 0
+    return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 600)
+
+
+def fragment_settings(request):
+    # Context processor adding the seconds template fragments are cached,
+    # for the {% cache %} tags of every page (including the navbar)
+
+    return {'fragment_timeout': fragment_timeout()}
+
+
+def expense_table_key(version, expense_filter, page):
+    # Function returns what the cached expense table of a page varies on:
+    # the expense data version, the filter of the list and the page's
+    # cursor.  The decoded cursor is used so invalid cursors share the first
+    # page.
+
+    return f'{version}:{expense_filter}:{page.after}:{page.before}'
+
+
+async def afragment_cached(name, key):
+    # Function returns whether the fragment name varying on key is cached,
+    # so a view can skip the queries for a fragment that will not be
+    # rendered
+
+    if not fragment_timeout():
+        return False
+    return await get_fragment_cache().ahas_key(
+        make_template_fragment_key(name, [key])
+    )
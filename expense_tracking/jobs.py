@@ -0,0 +1,236 @@
+import csv
+import datetime
+import io
+import logging
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from .csv_import import COLUMNS, import_expenses
+from .export import FORMATS, stream_export
+from .forms import ExpenseFilterForm
+from .models import Expense, Job
+from .report_cache import cached_report
+
+
+logger = logging.getLogger(__name__)
+
+# Function running each job kind, and whether a failed job of that kind is
+# tried again
+HANDLERS = {}
+
+
+def job_handler(kind, retry=True):
+    # Decorator registering the function running a job kind.  The function
+    # takes the claimed job, may save a file to job.result and returns the
+    # job's message.
+
+    def register(function):
+        HANDLERS[kind] = (function, retry)
+        return function
+    return register
+
+
+def enqueue(kind, params=None, user=None, upload=None):
+    # Function queues a job and returns it.  An uploaded file is stored with
+    # the job so any worker can read it.
+
+    max_attempts = 1
+    if HANDLERS[kind][1]:
+        max_attempts = getattr(settings, 'JOB_MAX_ATTEMPTS', 3)
+    job = Job(
+        kind=kind,
+        params=params or {},
+        user=user,
+        max_attempts=max_attempts
+    )
+    if upload is not None:
+        job.upload.save(upload.name, upload, save=False)
+    job.save()
+    return job
+
+
+def claim_job(worker):
+    # Function claims the next due queued job for worker and returns it, or
+    # None when there is none.  A job is claimed with an UPDATE conditional
+    # on it still being queued, so concurrent workers never claim the same
+    # job, on any database.
+
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.QUEUED, run_after__lte=now
+    ).order_by('run_after', 'id').values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            worker=worker,
+            started_date=now,
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    # Function runs a claimed job and records its result.  A job that fails
+    # is queued again, after a delay doubling with every attempt, until it
+    # has run max_attempts times.
+
+    function = HANDLERS[job.kind][0]
+    try:
+        job.message = function(job) or ''
+    except Exception as error:
+        logger.exception('Job %s failed (attempt %s)', job.pk, job.attempts)
+        job.message = f'{type(error).__name__}: {error}'
+        if job.attempts < job.max_attempts:
+            delay = getattr(settings, 'JOB_RETRY_DELAY', 30)
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + datetime.timedelta(
+                seconds=delay * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = Job.FAILED
+            job.finished_date = timezone.now()
+    else:
+        job.status = Job.SUCCEEDED
+        job.finished_date = timezone.now()
+    job.save(update_fields=[
+        'status', 'message', 'result', 'run_after', 'finished_date'
+    ])
+    return job
+
+
+def run_next_job(worker):
+    # Function claims and runs the next due job, returning it, or None when
+    # no job is due
+
+    job = claim_job(worker)
+    if job is not None:
+        run_job(job)
+    return job
+
+
+def requeue_stale_jobs(timeout=None):
+    # Function queues again (or fails, after their last attempt) the jobs
+    # that have been running longer than timeout seconds, which happens when
+    # a worker is stopped while running them
+
+    if timeout is None:
+        timeout = getattr(settings, 'JOB_TIMEOUT', 60 * 60)
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        started_date__lt=timezone.now() - datetime.timedelta(seconds=timeout)
+    )
+    message = 'The worker running the job stopped.'
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.QUEUED, message=message, run_after=timezone.now()
+    )
+    failed = stale.update(
+        status=Job.FAILED, message=message, finished_date=timezone.now()
+    )
+    return requeued + failed
+
+
+def purge_jobs(days=None):
+    # Function deletes the jobs, and their files, that finished more than
+    # days ago
+
+    if days is None:
+        days = getattr(settings, 'JOB_KEEP_DAYS', 7)
+    jobs = Job.objects.filter(
+        finished_date__lt=timezone.now() - datetime.timedelta(days=days)
+    )
+    for job in jobs.iterator():
+        for file in (job.upload, job.result):
+            if file:
+                file.delete(save=False)
+    return jobs.delete()[0]
+
+
+@job_handler(Job.REPORT)
+def run_report(job):
+    # Function builds the report of a date range, which also stores it in
+    # the report cache, and saves it as an HTML page
+
+    from .charts import build_report
+
+    start = datetime.date.fromisoformat(job.params['start_date'])
+    end = datetime.date.fromisoformat(job.params['end_date'])
+    report = cached_report(
+        'get_data', start, end, lambda: build_report(start, end)
+    )
+    if not report:
+        return 'No records found for the specified range!'
+
+    page = render_to_string(
+        'expense_tracking/report_download.html',
+        {'report': report, 'start': start, 'end': end}
+    )
+    job.result.save(
+        f'report_{start:%Y%m%d}_{end:%Y%m%d}.html',
+        ContentFile(page.encode()),
+        save=False
+    )
+    return f'Report from {start:%m-%d-%Y} to {end:%m-%d-%Y}.'
+
+
+@job_handler(Job.EXPORT)
+def run_export(job):
+    # Function writes the expenses matching the job's filters to a file in
+    # the job's format, streaming them through a temporary file
+
+    form = ExpenseFilterForm(job.params)
+    if not form.is_valid():
+        raise ValueError(form.errors.as_text())
+    export_format = job.params.get('format', 'csv')
+    extension = FORMATS[export_format][1]
+
+    rows = 0
+    with tempfile.TemporaryFile() as file:
+        for chunk in stream_export(
+            form.filter(Expense.objects.all()), export_format
+        ):
+            if isinstance(chunk, str):
+                rows += 1
+                chunk = chunk.encode()
+            file.write(chunk)
+        file.seek(0)
+        job.result.save(f'expenses.{extension}', File(file), save=False)
+
+    if export_format == 'csv':
+        # Leave out the header
+        return f'Exported {rows - 1} expenses.'
+    return 'Exported expenses.'
+
+
+@job_handler(Job.IMPORT, retry=False)
+def run_import(job):
+    # Function imports the uploaded CSV file.  Rejected rows are saved with
+    # their errors as the job's result.  Imports are not retried: the rows
+    # committed before a failure would be imported twice.
+
+    with tempfile.TemporaryFile(mode='w+', newline='') as rejects_file:
+        rejects = csv.writer(rejects_file)
+        rejects.writerow(['line', 'errors', *COLUMNS])
+
+        with job.upload.open('rb') as upload:
+            result = import_expenses(
+                io.TextIOWrapper(upload, encoding='utf-8', newline=''),
+                rejects=rejects
+            )
+
+        if result.rejected:
+            rejects_file.seek(0)
+            job.result.save(
+                'rejected_rows.csv', File(rejects_file), save=False
+            )
+
+    message = f'Imported {result.imported} expenses.'
+    if result.rejected:
+        message += f' Rejected {result.rejected} rows.'
+    return message
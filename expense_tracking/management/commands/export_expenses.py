@@ -0,0 +1,91 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expense_tracking.export import (
+    CHUNK_SIZE,
+    FORMATS,
+    available_formats,
+    stream_export
+)
+from expense_tracking.forms import ExpenseFilterForm
+from expense_tracking.models import Expense
+
+
+class Command(BaseCommand):
+    # Command to export expenses to a CSV, Parquet or XLSX file
+
+    help = (
+        'Export expenses, optionally filtered by date range and expense '
+        'type, to a CSV, Parquet or XLSX file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to write the expenses to.')
+        parser.add_argument(
+            '--format',
+            choices=list(FORMATS),
+            help='Export format (default from the file extension, or csv).'
+        )
+        parser.add_argument(
+            '--start',
+            help='First expense date (YYYY-MM-DD) to export.'
+        )
+        parser.add_argument(
+            '--end',
+            help='Last expense date (YYYY-MM-DD) to export.'
+        )
+        parser.add_argument(
+            '--type',
+            type=int,
+            help='Id of the expense type to export.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Rows read per database round trip (default {CHUNK_SIZE}).'
+        )
+
+    def handle(self, *args, **options):
+        export_format = options['format']
+        if export_format is None:
+            extension = os.path.splitext(options['path'])[1].lstrip('.')
+            export_format = extension if extension in FORMATS else 'csv'
+        if export_format not in available_formats():
+            raise CommandError(
+                f'Exporting {export_format} needs '
+                f'{"pyarrow" if export_format == "parquet" else "openpyxl"}.'
+            )
+        if options['chunk_size'] < 1:
+            raise CommandError('Chunk size must be positive.')
+
+        # Same filters as the export view
+        form = ExpenseFilterForm({
+            'start_date': options['start'],
+            'end_date': options['end'],
+            'expense_type': options['type'],
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        chunks = stream_export(
+            form.filter(Expense.objects.all()),
+            export_format,
+            options['chunk_size']
+        )
+        try:
+            if export_format == 'csv':
+                with open(
+                    options['path'], 'w', newline='', encoding='utf-8'
+                ) as file:
+                    file.writelines(chunks)
+            else:
+                with open(options['path'], 'wb') as file:
+                    file.writelines(chunks)
+        except OSError as error:
+            raise CommandError(error)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported expenses to {options["path"]}.'
+        ))
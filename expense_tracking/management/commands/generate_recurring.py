@@ -0,0 +1,41 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expense_tracking.recurring import generate_recurring_expenses
+
+
+class Command(BaseCommand):
+    # Command to create the expenses of the recurring expenses that are due
+
+    help = (
+        'Create the expenses of every recurring expense due on or before '
+        'today.  Safe to run repeatedly, e.g. daily from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=datetime.date.fromisoformat,
+            help='Generate expenses due on or before this date (YYYY-MM-DD) '
+                 'instead of today.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per INSERT and UPDATE statement (default 1000).'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size must be positive.')
+
+        result = generate_recurring_expenses(
+            today=options['date'], batch_size=options['batch_size']
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {result.expenses} expenses from {result.schedules} '
+            f'recurring expenses in {result.elapsed:.2f}s.'
+        ))
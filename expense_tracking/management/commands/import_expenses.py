@@ -0,0 +1,79 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expense_tracking.csv_import import COLUMNS, import_expenses
+
+
+class Command(BaseCommand):
+    # Command to import expenses from a CSV file
+
+    help = (
+        'Import expenses from a CSV file with the columns '
+        f'{", ".join(COLUMNS)}.  Expense types may be given by name or id.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per INSERT statement (default 1000).'
+        )
+        parser.add_argument(
+            '--transaction-size',
+            type=int,
+            default=10000,
+            help='Rows per transaction (default 10000).'
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Write rows with COPY when using PostgreSQL.'
+        )
+        parser.add_argument(
+            '--rejects',
+            help='CSV file to write rejected rows and their errors to.'
+        )
+        parser.add_argument(
+            '--no-header',
+            action='store_true',
+            help='The CSV file has no header row.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['transaction_size'] < 1:
+            raise CommandError('Batch and transaction sizes must be positive.')
+
+        rejects_file = None
+        rejects = None
+        try:
+            if options['rejects']:
+                rejects_file = open(options['rejects'], 'w', newline='')
+                rejects = csv.writer(rejects_file)
+                rejects.writerow(['line', 'errors', *COLUMNS])
+
+            with open(options['path'], newline='', encoding='utf-8') as file:
+                result = import_expenses(
+                    file,
+                    batch_size=options['batch_size'],
+                    transaction_size=options['transaction_size'],
+                    use_copy=options['copy'],
+                    rejects=rejects,
+                    skip_header=not options['no_header']
+                )
+        except OSError as error:
+            raise CommandError(error)
+        finally:
+            if rejects_file is not None:
+                rejects_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.imported} expenses in {result.elapsed:.2f}s '
+            f'({result.rows_per_second:,.0f} rows/sec).'
+        ))
+        if result.rejected:
+            self.stdout.write(self.style.WARNING(
+                f'Rejected {result.rejected} rows.'
+            ))
@@ -0,0 +1,74 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from expense_tracking.models import Expense, ExpenseRollup
+from expense_tracking.rollups import refresh_rollups, verify_rollups
+
+
+class Command(BaseCommand):
+    # Command to rebuild or verify the expense rollups against the expenses
+
+    help = 'Rebuild or verify the daily and monthly expense rollups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare the rollups with the expenses.'
+        )
+        parser.add_argument(
+            '--start',
+            type=datetime.date.fromisoformat,
+            help='First date (YYYY-MM-DD) to rebuild or verify.'
+        )
+        parser.add_argument(
+            '--end',
+            type=datetime.date.fromisoformat,
+            help='Last date (YYYY-MM-DD) to rebuild or verify.'
+        )
+
+    def handle(self, *args, **options):
+        start = options['start']
+        end = options['end']
+
+        if options['verify']:
+            mismatches = verify_rollups(start, end)
+            for period, period_start, expense_type_id in mismatches:
+                self.stderr.write(
+                    f'Rollup mismatch: period={period} '
+                    f'period_start={period_start} '
+                    f'expense_type_id={expense_type_id}'
+                )
+            if mismatches:
+                raise CommandError(
+                    f'{len(mismatches)} rollups do not match the expenses.'
+                )
+            self.stdout.write(self.style.SUCCESS('Rollups match expenses.'))
+            return
+
+        # Default to the full range of expense and rollup dates, so stale
+        # rollups outside the expense dates are removed as well
+        dates = [
+            date
+            for date in [
+                *Expense.objects.aggregate(
+                    Min('expense_date'), Max('expense_date')
+                ).values(),
+                *ExpenseRollup.objects.aggregate(
+                    Min('period_start'), Max('period_start')
+                ).values(),
+            ]
+            if date is not None
+        ]
+        start = start or min(dates, default=None)
+        end = end or max(dates, default=None)
+        if start is None or end is None:
+            self.stdout.write('No expenses to roll up.')
+            return
+
+        refresh_rollups(start, end)
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt rollups from {start} to {end}.')
+        )
@@ -0,0 +1,107 @@
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from expense_tracking.jobs import purge_jobs, requeue_stale_jobs, run_next_job
+
+
+# Seconds between checks for stale and old jobs
+MAINTENANCE_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    # Command to run queued background jobs (reports, exports and imports)
+
+    help = (
+        'Run queued background jobs with a pool of worker threads until '
+        'stopped (Ctrl-C or SIGTERM finishes the running jobs first).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=getattr(settings, 'JOB_WORKERS', 2),
+            help='Jobs run at once (default JOB_WORKERS).'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds an idle worker waits before checking the queue '
+                 'again (default 1).'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no job is due instead of waiting for more.'
+        )
+
+    def work(self, worker, stop, poll_interval, once):
+        # Runs jobs in a worker thread until stopped, returning the number
+        # run
+
+        ran = 0
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                if run_next_job(worker) is not None:
+                    ran += 1
+                elif once:
+                    break
+                else:
+                    stop.wait(poll_interval)
+        finally:
+            connection.close()
+        return ran
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('Concurrency must be positive.')
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+
+        name = f'{socket.gethostname()}:{os.getpid()}'
+        requeue_stale_jobs()
+        purge_jobs()
+        self.stdout.write(
+            f'Running jobs with {options["concurrency"]} workers as {name}.'
+        )
+
+        with ThreadPoolExecutor(
+            max_workers=options['concurrency'], thread_name_prefix='jobs'
+        ) as pool:
+            futures = [
+                pool.submit(
+                    self.work,
+                    f'{name}:{i}',
+                    stop,
+                    options['poll_interval'],
+                    options['once']
+                )
+                for i in range(options['concurrency'])
+            ]
+            while True:
+                done, running = wait(
+                    futures,
+                    timeout=MAINTENANCE_INTERVAL,
+                    return_when=FIRST_EXCEPTION
+                )
+                if not running or any(f.exception() for f in done):
+                    break
+                close_old_connections()
+                requeue_stale_jobs()
+                purge_jobs()
+            stop.set()
+        connection.close()
+
+        ran = sum(future.result() for future in futures)
+        self.stdout.write(self.style.SUCCESS(f'Ran {ran} jobs.'))
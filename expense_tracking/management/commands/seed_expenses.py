@@ -0,0 +1,73 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from expense_tracking.seed import seed_expenses
+
+
+class Command(BaseCommand):
+    # Command to add synthetic expenses for development and benchmarks
+
+    help = (
+        'Add the given number of synthetic expenses spread over a date range '
+        '(the last five years by default), with realistic expense types, '
+        'amounts and organizations.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Expenses to add.')
+        parser.add_argument(
+            '--start',
+            type=datetime.date.fromisoformat,
+            help='First expense date (YYYY-MM-DD).'
+        )
+        parser.add_argument(
+            '--end',
+            type=datetime.date.fromisoformat,
+            help='Last expense date (YYYY-MM-DD), today by default.'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed; the same seed adds the same expenses '
+                 '(default 0).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per transaction (default 5000).'
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Write rows with COPY when using PostgreSQL.'
+        )
+
+    def handle(self, *args, **options):
+        if options['count'] < 1 or options['batch_size'] < 1:
+            raise CommandError('Count and batch size must be positive.')
+
+        end = options['end'] or timezone.now().date()
+        start = options['start'] or end.replace(year=end.year - 5, day=1)
+        if start > end:
+            raise CommandError('The start date must be before the end date.')
+
+        began = time.perf_counter()
+        count = seed_expenses(
+            options['count'],
+            start,
+            end,
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            use_copy=options['copy']
+        )
+        elapsed = time.perf_counter() - began
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Added {count} expenses from {start} to {end} in '
+            f'{elapsed:.2f}s ({count / elapsed:,.0f} rows/sec).'
+        ))
@@ -0,0 +1,214 @@
+import functools
+import threading
+import time
+from contextvars import ContextVar
+
+from django.template.base import Template
+
+from .report_cache import report_cache_stats
+
+
+# Upper bounds (seconds) of the request duration histogram buckets
+DURATION_BUCKETS = (.01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+# Measurements of the request being handled.  A context variable follows the
+# request into the threads sync_to_async runs the ORM and templates in.
+current_request = ContextVar('expense_tracking_request', default=None)
+
+
+class RequestStats:
+    # Class for the measurements of one request
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+
+def record_query(execute, sql, params, many, context):
+    # Function is a database execute wrapper counting and timing the queries
+    # of the current request
+
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - began
+        stats.queries += 1
+
+
+def instrument_connection(connection):
+    # Function adds the query recorder to a database connection once
+
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def instrument_templates():
+    # Function wraps Template.render to time the templates rendered by the
+    # current request.  Only the outermost render is timed, so included
+    # templates are not counted twice.
+
+    render = Template.render
+    if getattr(render, 'instrumented', False):
+        return
+
+    @functools.wraps(render)
+    def timed_render(self, context):
+        stats = current_request.get()
+        if stats is None or stats.template_depth:
+            return render(self, context)
+        stats.template_depth += 1
+        began = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            stats.template_time += time.perf_counter() - began
+            stats.template_depth -= 1
+
+    timed_render.instrumented = True
+    Template.render = timed_render
+
+
+class ViewMetrics:
+    # Class for the totals of the requests to one view
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.duration = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.response_bytes = 0
+
+
+# Totals per view name since the process started
+_views = {}
+_lock = threading.Lock()
+
+
+def record_request(view, status, duration, stats, response_bytes):
+    # Function adds a finished request to the totals of its view
+
+    with _lock:
+        metrics = _views.get(view)
+        if metrics is None:
+            metrics = _views[view] = ViewMetrics()
+        metrics.requests += 1
+        if status >= 500:
+            metrics.errors += 1
+        metrics.duration += duration
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                metrics.buckets[i] += 1
+        metrics.queries += stats.queries
+        metrics.db_time += stats.db_time
+        metrics.template_time += stats.template_time
+        metrics.response_bytes += response_bytes
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+def prometheus_text():
+    # Function returns the request totals of this process and the report
+    # cache counters in the Prometheus text exposition format
+
+    with _lock:
+        views = sorted(
+            (view, vars(metrics).copy()) for view, metrics in _views.items()
+        )
+
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            lines.append(f'{name}{labels} {value}')
+
+    def label(view, **extra):
+        labels = {'view': view, **extra}
+        return '{' + ','.join(
+            '{}="{}"'.format(
+                key, value.replace('\\', '\\\\').replace('"', '\\"')
+            )
+            for key, value in labels.items()
+        ) + '}'
+
+    metric(
+        'expense_tracking_requests_total', 'counter',
+        'Requests handled, by view.',
+        [(label(view), m['requests']) for view, m in views]
+    )
+    metric(
+        'expense_tracking_request_errors_total', 'counter',
+        'Requests answered with a 5xx status, by view.',
+        [(label(view), m['errors']) for view, m in views]
+    )
+
+    samples = []
+    for view, m in views:
+        for bound, count in zip(DURATION_BUCKETS, m['buckets']):
+            samples.append((label(view, le=str(bound)), count))
+        samples.append((label(view, le='+Inf'), m['requests']))
+    lines.append('# HELP expense_tracking_request_duration_seconds '
+                 'Wall time of requests, by view.')
+    lines.append('# TYPE expense_tracking_request_duration_seconds histogram')
+    for labels, value in samples:
+        lines.append(
+            f'expense_tracking_request_duration_seconds_bucket{labels} {value}'
+        )
+    for view, m in views:
+        lines.append(
+            f'expense_tracking_request_duration_seconds_sum{label(view)} '
+            f'{m["duration"]}'
+        )
+        lines.append(
+            f'expense_tracking_request_duration_seconds_count{label(view)} '
+            f'{m["requests"]}'
+        )
+
+    metric(
+        'expense_tracking_db_queries_total', 'counter',
+        'Database queries run, by view.',
+        [(label(view), m['queries']) for view, m in views]
+    )
+    metric(
+        'expense_tracking_db_duration_seconds_total', 'counter',
+        'Time spent running database queries, by view.',
+        [(label(view), m['db_time']) for view, m in views]
+    )
+    metric(
+        'expense_tracking_template_duration_seconds_total', 'counter',
+        'Time spent rendering templates, by view.',
+        [(label(view), m['template_time']) for view, m in views]
+    )
+    metric(
+        'expense_tracking_response_bytes_total', 'counter',
+        'Bytes of response bodies (streamed responses are not counted), '
+        'by view.',
+        [(label(view), m['response_bytes']) for view, m in views]
+    )
+
+    cache_stats = report_cache_stats()
+    metric(
+        'expense_tracking_report_cache_hits_total', 'counter',
+        'Reports served from the report cache.',
+        [('', cache_stats['hits'])]
+    )
+    metric(
+        'expense_tracking_report_cache_misses_total', 'counter',
+        'Reports built because they were not in the report cache.',
+        [('', cache_stats['misses'])]
+    )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,136 @@
+import logging
+import re
+import time
+from importlib.util import find_spec
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async
+)
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .metrics import (
+    RequestStats,
+    current_request,
+    instrument_templates,
+    record_request
+)
+
+
+logger = logging.getLogger('expense_tracking.performance')
+
+# Brotli quality of compressed responses: 11 compresses best but is too slow
+# for pages built per request, while 5 is still smaller than gzip and about
+# as fast
+BROTLI_QUALITY = 5
+
+accepts_brotli = re.compile(r'\bbr\b').search
+
+
+class PerformanceMiddleware:
+    # Class for middleware measuring each request's wall time, database
+    # queries and time, template render time and response size.  Every
+    # request is written to the expense_tracking log and added to the
+    # totals served by the metrics view.
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        instrument_templates()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        logger.info(*self.record(request, response, stats))
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        # The log file is written from a thread rather than the event loop
+        await sync_to_async(logger.info, thread_sensitive=False)(
+            *self.record(request, response, stats)
+        )
+        return response
+
+    def record(self, request, response, stats):
+        # Adds the request to the totals of its view and returns the
+        # arguments of its log line
+
+        duration = time.perf_counter() - stats.started
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        response_bytes = 0 if response.streaming else len(response.content)
+
+        record_request(
+            view, response.status_code, duration, stats, response_bytes
+        )
+        return (
+            'view=%s method=%s status=%s time_ms=%.1f queries=%d '
+            'db_ms=%.1f template_ms=%.1f bytes=%s',
+            view,
+            request.method,
+            response.status_code,
+            duration * 1000,
+            stats.queries,
+            stats.db_time * 1000,
+            stats.template_time * 1000,
+            'streamed' if response.streaming else response_bytes
+        )
+
+
+class BrotliMiddleware(MiddlewareMixin):
+    # Class for middleware compressing responses with brotli for clients
+    # that accept it.  Listed after GZipMiddleware, so responses it leaves
+    # alone (streamed, or for clients without brotli) are gzipped instead.
+    # Not used unless the brotli package is installed.
+
+    def __init__(self, get_response):
+        if find_spec('brotli') is None:
+            raise MiddlewareNotUsed('The brotli package is not installed.')
+        import brotli
+        self.compress = brotli.compress
+        super().__init__(get_response)
+
+    def process_response(self, request, response):
+        # Skip small, streamed and already compressed responses, as
+        # GZipMiddleware does
+        if (response.streaming or len(response.content) < 200 or
+                response.has_header('Content-Encoding')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not accepts_brotli(request.headers.get('Accept-Encoding', '')):
+            return response
+
+        compressed = self.compress(response.content, quality=BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed body differs from the one a strong ETag was made
+        # for, so the ETag becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    # Roll up the existing expenses by day and by month
+
+    Expense = apps.get_model('expense_tracking', 'Expense')
+    ExpenseRollup = apps.get_model('expense_tracking', 'ExpenseRollup')
+    for period, bucket in [('D', F('expense_date')),
+                           ('M', TruncMonth('expense_date'))]:
+        rows = Expense.objects.annotate(
+            period_start=bucket
+        ).values(
+            'period_start', 'expense_type_id'
+        ).annotate(
+            total=Sum(
+                'amount',
+                output_field=models.DecimalField(
+                    max_digits=12, decimal_places=2
+                )
+            ),
+            count=Count('id'),
+            min_amount=Min('amount'),
+            max_amount=Max('amount')
+        ).order_by()
+        ExpenseRollup.objects.bulk_create(
+            (ExpenseRollup(period=period, **row) for row in rows.iterator()),
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense_tracking', '0006_delete_budget'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('D', 'Day'), ('M', 'Month')], max_length=1)),
+                ('period_start', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('count', models.PositiveIntegerField()),
+                ('min_amount', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('max_amount', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('expense_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='expense_tracking.expensetype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'period_start'], name='expense_rollup_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'expense_type', 'period_start'), name='unique_expense_rollup')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense_tracking', '0007_expenserollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='expense',
+            name='expense_type',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='expense_tracking.expensetype'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['-expense_date', '-id'], name='expense_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['expense_type', '-expense_date', '-id'], name='expense_type_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense_tracking', '0008_expense_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=9)),
+                ('expense_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='expense_tracking.expensetype')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('expense_type', 'month'), name='unique_budget_month')],
+            },
+        ),
+    ]
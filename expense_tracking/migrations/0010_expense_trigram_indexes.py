@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+# Columns searched by expense search.  The indexes are on UPPER(column)
+# because that is the expression icontains compares on PostgreSQL.
+FIELDS = ['name', 'org', 'notes']
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Index the searched columns with pg_trgm GIN indexes (PostgreSQL only).
+    # The indexes are built concurrently so writes to a large expense table
+    # are not blocked while they are built.
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS expense_{field}_trgm_idx '
+            f'ON expense_tracking_expense '
+            f'USING gin (UPPER({field}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in FIELDS:
+        schema_editor.execute(
+            f'DROP INDEX CONCURRENTLY IF EXISTS expense_{field}_trgm_idx'
+        )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('expense_tracking', '0009_budget'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_trigram_indexes,
+            drop_trigram_indexes,
+            atomic=False
+        ),
+    ]
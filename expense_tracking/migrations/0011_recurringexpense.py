@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:18
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense_tracking', '0010_expense_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringExpense',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('org', models.CharField(max_length=200)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('notes', models.CharField(blank=True, max_length=200)),
+                ('frequency', models.CharField(choices=[('W', 'Weekly'), ('M', 'Monthly'), ('Y', 'Yearly')], default='M', max_length=1)),
+                ('interval', models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)])),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('next_run', models.DateField(blank=True)),
+                ('active', models.BooleanField(default=True)),
+                ('expense_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='expense_tracking.expensetype')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='recurring_expense',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='expense_tracking.recurringexpense'),
+        ),
+        migrations.AddConstraint(
+            model_name='expense',
+            constraint=models.UniqueConstraint(fields=('recurring_expense', 'expense_date'), name='unique_recurring_expense_date'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringexpense',
+            index=models.Index(condition=models.Q(('active', True)), fields=['next_run'], name='recurring_expense_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recurringexpense',
+            constraint=models.CheckConstraint(condition=models.Q(('interval__gte', 1)), name='recurring_expense_interval_positive'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils import timezone
 
@@ -19,7 +21,9 @@ class Expense(models.Model):
     expense_date = models.DateField()
     expense_type = models.ForeignKey(
         ExpenseType,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        # Covered by the expense_type_date_id_idx index below
+        db_index=False
     )
     name = models.CharField(max_length=200)
     org = models.CharField(max_length=200)
@@ -28,8 +32,262 @@ class Expense(models.Model):
     inserted_date = models.DateTimeField(
         default=timezone.now
     )
+    # Schedule the expense was generated from, if any
+    recurring_expense = models.ForeignKey(
+        'RecurringExpense',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        # Covered by the unique_recurring_expense_date constraint below
+        db_index=False
+    )
+
+    class Meta:
+        constraints = [
+            # A schedule generates at most one expense per date, so
+            # generating twice cannot duplicate expenses
+            models.UniqueConstraint(
+                fields=['recurring_expense', 'expense_date'],
+                name='unique_recurring_expense_date'
+            ),
+        ]
+        indexes = [
+            # Expense list pages by (expense date, id) descending, and date
+            # range scans for reports and rollups
+            models.Index(
+                fields=['-expense_date', '-id'],
+                name='expense_date_id_idx'
+            ),
+            # Expense list filtered by expense type, paged by (expense date,
+            # id) descending
+            models.Index(
+                fields=['expense_type', '-expense_date', '-id'],
+                name='expense_type_date_id_idx'
+            ),
+        ]
 
     def __str__(self):
         # String method returns expense name and date
 
         return self.name + '_' + self.expense_date.strftime('%m_%d_%Y')
+
+
+class ExpenseRollup(models.Model):
+    # Class for the pre-aggregated expenses of an expense type for a day or
+    # month.  Rows are maintained by expense_tracking.rollups whenever
+    # expenses change.
+
+    DAY = 'D'
+    MONTH = 'M'
+    PERIOD_CHOICES = [
+        (DAY, 'Day'),
+        (MONTH, 'Month'),
+    ]
+
+    period = models.CharField(max_length=1, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    expense_type = models.ForeignKey(
+        ExpenseType,
+        on_delete=models.CASCADE
+    )
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    count = models.PositiveIntegerField()
+    min_amount = models.DecimalField(max_digits=7, decimal_places=2)
+    max_amount = models.DecimalField(max_digits=7, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'expense_type', 'period_start'],
+                name='unique_expense_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['period', 'period_start'],
+                name='expense_rollup_period_idx'
+            ),
+        ]
+
+    def __str__(self):
+        # String method returns period, expense type id and period start
+
+        return (
+            self.period + '_' + str(self.expense_type_id) + '_' +
+            self.period_start.strftime('%m_%d_%Y')
+        )
+
+
+class Budget(models.Model):
+    # Class for the budgeted amount of an expense type for a month
+
+    expense_type = models.ForeignKey(
+        ExpenseType,
+        on_delete=models.CASCADE
+    )
+    # First day of the budgeted month
+    month = models.DateField()
+    amount = models.DecimalField(max_digits=9, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['expense_type', 'month'],
+                name='unique_budget_month'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Function to store the month as its first day
+
+        self.month = self.month.replace(day=1)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        # String method returns expense type name and month
+
+        return self.expense_type.name + '_' + self.month.strftime('%m_%Y')
+
+
+class RecurringExpense(models.Model):
+    # Class for a schedule of expenses (e.g. rent or a subscription).  The
+    # generate_recurring command creates an expense from the template fields
+    # on every due date up to today and moves next_run to the date after.
+
+    WEEKLY = 'W'
+    MONTHLY = 'M'
+    YEARLY = 'Y'
+    FREQUENCY_CHOICES = [
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+        (YEARLY, 'Yearly'),
+    ]
+
+    expense_type = models.ForeignKey(
+        ExpenseType,
+        on_delete=models.CASCADE
+    )
+    name = models.CharField(max_length=200)
+    org = models.CharField(max_length=200)
+    amount = models.DecimalField(max_digits=7, decimal_places=2)
+    notes = models.CharField(max_length=200, blank=True)
+    frequency = models.CharField(
+        max_length=1,
+        choices=FREQUENCY_CHOICES,
+        default=MONTHLY
+    )
+    # Every interval weeks, months or years
+    interval = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)]
+    )
+    # First due date; monthly and yearly schedules keep its day of the month
+    # (or the last day of shorter months)
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    # Next due date, the start date for a new schedule
+    next_run = models.DateField(blank=True)
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            # Due schedules, found by the generate_recurring command
+            models.Index(
+                fields=['next_run'],
+                condition=models.Q(active=True),
+                name='recurring_expense_due_idx'
+            ),
+        ]
+        constraints = [
+            # An interval of 0 would never move the next run forward
+            models.CheckConstraint(
+                condition=models.Q(interval__gte=1),
+                name='recurring_expense_interval_positive'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Function to start a new schedule on its start date
+
+        if self.next_run is None:
+            self.next_run = self.start_date
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        # String method returns the name and frequency of the schedule
+
+        return self.name + '_' + self.get_frequency_display()
+
+
+class Job(models.Model):
+    # Class for a background job (a report, export or CSV import) run by the
+    # run_jobs command.  Workers claim queued jobs whose run_after has
+    # passed; a job that fails is queued again until it has run max_attempts
+    # times.  Uploaded CSV files and results are kept in MEDIA_ROOT.
+
+    REPORT = 'report'
+    EXPORT = 'export'
+    IMPORT = 'import'
+    KIND_CHOICES = [
+        (REPORT, 'Report'),
+        (EXPORT, 'Export'),
+        (IMPORT, 'Import'),
+    ]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Arguments of the job, e.g. the date range of a report
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=QUEUED
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=1)
+    # Queued jobs are not run before this time, which delays retries
+    run_after = models.DateTimeField(default=timezone.now)
+    created_date = models.DateTimeField(default=timezone.now)
+    started_date = models.DateTimeField(null=True, blank=True)
+    finished_date = models.DateTimeField(null=True, blank=True)
+    # Worker running (or that last ran) the job
+    worker = models.CharField(max_length=100, blank=True)
+    upload = models.FileField(upload_to='jobs/uploads/', blank=True)
+    result = models.FileField(upload_to='jobs/results/', blank=True)
+    # Summary of the result, or the error of the last attempt
+    message = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # Queued jobs in the order workers claim them
+            models.Index(
+                fields=['run_after', 'id'],
+                condition=models.Q(status='queued'),
+                name='job_queued_idx'
+            ),
+        ]
+
+    @property
+    def finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def __str__(self):
+        # String method returns the kind and id of the job
+
+        return self.get_kind_display() + '_' + str(self.pk)
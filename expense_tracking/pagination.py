@@ -0,0 +1,138 @@
+import datetime
+
+from django.core.cache import cache
+from django.db.models import Q
+from rest_framework.pagination import CursorPagination
+
+
+def encode_cursor(expense):
+    # Function returns the cursor for an expense, e.g. '2024-01-31.123'
+
+    return f'{expense.expense_date.isoformat()}.{expense.pk}'
+
+
+def decode_cursor(cursor):
+    # Function returns the (expense_date, id) of a cursor, or None when the
+    # cursor is missing or invalid
+
+    try:
+        expense_date, pk = cursor.split('.')
+        return datetime.date.fromisoformat(expense_date), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    # Class for a page of expenses ordered by expense date and id descending.
+    # Pages are found by seeking past the (expense_date, id) cursor of the
+    # previous or next page instead of counting and skipping rows, so every
+    # page costs the same as the first.  The query runs on first use.
+
+    def __init__(self, expenses, after=None, before=None, per_page=50):
+        self.expenses = expenses.order_by('-expense_date', '-id')
+        self.after = decode_cursor(after)
+        self.before = None if self.after else decode_cursor(before)
+        self.per_page = per_page
+        self._rows = None
+
+    def _query(self):
+        expenses = self.expenses
+        if self.after:
+            expense_date, pk = self.after
+            # The expense_date bound lets the index range scan start at the
+            # cursor; the OR picks up rows of the same date with lower ids
+            expenses = expenses.filter(
+                Q(expense_date__lt=expense_date) |
+                Q(expense_date=expense_date, pk__lt=pk),
+                expense_date__lte=expense_date
+            )
+        elif self.before:
+            expense_date, pk = self.before
+            expenses = expenses.filter(
+                Q(expense_date__gt=expense_date) |
+                Q(expense_date=expense_date, pk__gt=pk),
+                expense_date__gte=expense_date
+            ).reverse()
+
+        # Fetch one extra row to know if there is another page
+        return expenses[:self.per_page + 1]
+
+    def _set_rows(self, rows):
+        self._more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if self.before:
+            rows.reverse()
+        self._rows = rows
+
+    def _fetch(self):
+        self._set_rows(list(self._query()))
+
+    async def afetch(self):
+        # Function runs the page query with the async ORM, for async views.
+        # The page can then be used (e.g. by a template) without a query.
+
+        if self._rows is None:
+            self._set_rows([expense async for expense in self._query()])
+        return self
+
+    @property
+    def object_list(self):
+        if self._rows is None:
+            self._fetch()
+        return self._rows
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        self.object_list
+        return self._more if not self.before else bool(self._rows)
+
+    def has_previous(self):
+        self.object_list
+        if self.before:
+            return self._more
+        return self.after is not None and bool(self._rows)
+
+    def next_cursor(self):
+        if self.has_next():
+            return encode_cursor(self.object_list[-1])
+        return None
+
+    def previous_cursor(self):
+        if self.has_previous():
+            return encode_cursor(self.object_list[0])
+        return None
+
+
+def cached_count(expenses, key, timeout=60):
+    # Function returns the number of expenses, cached for timeout seconds
+    # since an exact COUNT(*) reads the whole table
+
+    return cache.get_or_set(
+        f'expense_tracking:count:{key}', expenses.count, timeout
+    )
+
+
+async def acached_count(expenses, key, timeout=60):
+    # Function is the async version of cached_count
+
+    key = f'expense_tracking:count:{key}'
+    count = await cache.aget(key)
+    if count is None:
+        count = await expenses.acount()
+        await cache.aset(key, count, timeout)
+    return count
+
+
+class ExpenseCursorPagination(CursorPagination):
+    # Class for API pages of expenses by expense date and id descending,
+    # using the same index as the expense list
+
+    ordering = ('-expense_date', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
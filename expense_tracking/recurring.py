@@ -0,0 +1,137 @@
+import calendar
+import datetime
+import time
+
+from django.db import transaction
+from django.utils import timezone
+from .models import Expense, RecurringExpense
+from .rollups import refresh_rollups
+
+
+def add_months(day, months, anchor_day):
+    # Function returns the date months after day, on anchor_day or the last
+    # day of the month when it is shorter
+
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    last_day = calendar.monthrange(year, month)[1]
+    return datetime.date(year, month, min(anchor_day, last_day))
+
+
+def next_due_date(schedule, day):
+    # Function returns the due date of a schedule following day, raising
+    # ValueError rather than returning a date that does not advance (which
+    # would loop forever generating the same date)
+
+    if schedule.frequency == RecurringExpense.WEEKLY:
+        due = day + datetime.timedelta(weeks=schedule.interval)
+    else:
+        months = schedule.interval
+        if schedule.frequency == RecurringExpense.YEARLY:
+            months *= 12
+        due = add_months(day, months, schedule.start_date.day)
+    if due <= day:
+        raise ValueError(
+            f'Recurring expense {schedule.pk} has an interval of '
+            f'{schedule.interval}, which does not advance its due date.'
+        )
+    return due
+
+
+class GenerateResult:
+    # Class for the counts and timing of a generate run
+
+    def __init__(self):
+        self.schedules = 0
+        self.expenses = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+
+def generate_recurring_expenses(today=None, batch_size=1000):
+    # Function creates the expenses of every active schedule due on or
+    # before today and moves the schedules' next run past today, in one
+    # transaction.  Due schedules are locked with SKIP LOCKED so runs that
+    # overlap (e.g. from cron) split the schedules between them instead of
+    # generating them twice, and the unique (schedule, date) constraint on
+    # expenses guards against duplicates if a next run is moved back.  The
+    # expenses count is of the rows inserted, without the skipped
+    # duplicates.
+    # Expenses are written with bulk_create and the rollups of the
+    # generated dates are refreshed once at the end.
+
+    if today is None:
+        today = timezone.now().date()
+    result = GenerateResult()
+
+    with transaction.atomic():
+        schedules = list(
+            RecurringExpense.objects.filter(
+                active=True, next_run__lte=today
+            ).select_for_update(skip_locked=True).order_by('id')
+        )
+
+        expenses = []
+        expense_type_ids = set()
+        first_date = last_date = None
+        inserted_date = timezone.now()
+        for schedule in schedules:
+            due = schedule.next_run
+            while due <= today and (
+                schedule.end_date is None or due <= schedule.end_date
+            ):
+                expenses.append(Expense(
+                    expense_date=due,
+                    expense_type_id=schedule.expense_type_id,
+                    name=schedule.name,
+                    org=schedule.org,
+                    amount=schedule.amount,
+                    notes=schedule.notes,
+                    inserted_date=inserted_date,
+                    recurring_expense=schedule
+                ))
+                expense_type_ids.add(schedule.expense_type_id)
+                if first_date is None or due < first_date:
+                    first_date = due
+                if last_date is None or due > last_date:
+                    last_date = due
+                due = next_due_date(schedule, due)
+            schedule.next_run = due
+            if schedule.end_date is not None and due > schedule.end_date:
+                schedule.active = False
+
+        Expense.objects.bulk_create(
+            expenses, batch_size=batch_size, ignore_conflicts=True
+        )
+        # ignore_conflicts leaves no sign of which rows were skipped, so
+        # count the ones carrying this run's inserted date
+        inserted = 0
+        if first_date is not None:
+            inserted = Expense.objects.filter(
+                expense_date__range=(first_date, last_date),
+                recurring_expense__isnull=False,
+                inserted_date=inserted_date
+            ).count()
+
+        # Schedules on the same day move to the same next run, so update
+        # them in groups with one UPDATE per batch rather than bulk_update's
+        # CASE per row
+        moves = {}
+        for schedule in schedules:
+            moves.setdefault(
+                (schedule.next_run, schedule.active), []
+            ).append(schedule.pk)
+        for (next_run, active), ids in moves.items():
+            for i in range(0, len(ids), batch_size):
+                RecurringExpense.objects.filter(
+                    pk__in=ids[i:i + batch_size]
+                ).update(next_run=next_run, active=active)
+
+        if first_date is not None:
+            refresh_rollups(first_date, last_date, expense_type_ids)
+
+    result.schedules = len(schedules)
+    result.expenses = inserted
+    result.elapsed = time.perf_counter() - result.started
+    return result
@@ -0,0 +1,224 @@
+import datetime
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+# Keys of the hit and miss counters
+HITS = 'reports:hits'
+MISSES = 'reports:misses'
+
+# Key of the version of all expense data, bumped whenever an expense or an
+# expense type is written
+DATA_VERSION_KEY = 'expense_tracking:data:version'
+
+# Seconds a version is kept by a cache local to one process.  A change made
+# by another process (e.g. the job worker) bumps that process's versions
+# only, so this bounds how long other processes use results from before it.
+LOCAL_VERSION_MAX_AGE = 60
+
+
+def get_cache():
+    # Function returns the cache backend for report results (the 'reports'
+    # cache when configured, otherwise the default cache)
+
+    return caches['reports' if 'reports' in settings.CACHES else 'default']
+
+
+def shared_cache():
+    # Function returns whether the report cache is shared between processes,
+    # so a version bumped by one process is seen by all of them
+
+    return not isinstance(get_cache(), (LocMemCache, DummyCache))
+
+
+def new_version():
+    # Function returns a version no other bump has used.  Versions are
+    # replaced rather than incremented: incr is a get and a set in the file
+    # cache, so two processes bumping at once could both write the same
+    # version, and a report built between their commits would be kept under
+    # it.
+
+    return uuid.uuid4().hex
+
+
+def version_timeout():
+    # Function returns the timeout of versions: none in a shared cache,
+    # LOCAL_VERSION_MAX_AGE in a cache local to the process
+
+    return None if shared_cache() else LOCAL_VERSION_MAX_AGE
+
+
+def months(start, end):
+    # Function returns the first day of every month from start to end.  It
+    # stops on the last month rather than stepping past it, which would
+    # overflow after December 9999.
+
+    month = start.replace(day=1)
+    last = end.replace(day=1)
+    while month <= last:
+        yield month
+        if month == last:
+            break
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def month_key(month):
+    return f'reports:month:{month:%Y-%m}'
+
+
+def month_versions(start, end):
+    # Function returns the version of every month from start to end.  A
+    # missing version (never set, or evicted) starts at a new version, so it
+    # can never match a version used by an older entry.
+
+    cache = get_cache()
+    keys = [month_key(month) for month in months(start, end)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, new_version(), timeout=version_timeout())
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+async def amonth_versions(start, end):
+    # Function is the async version of month_versions
+
+    cache = get_cache()
+    keys = [month_key(month) for month in months(start, end)]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, new_version(), timeout=version_timeout())
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate_months(start, end):
+    # Function bumps the version of every month from start to end, which
+    # invalidates every cached report covering one of those months
+
+    get_cache().set_many(
+        {month_key(month): new_version() for month in months(start, end)},
+        timeout=version_timeout()
+    )
+
+
+def data_version():
+    # Function returns the version of all expense data.  Like the month
+    # versions, a missing version starts at a new version.
+
+    cache = get_cache()
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        cache.add(DATA_VERSION_KEY, new_version(), timeout=version_timeout())
+        version = cache.get(DATA_VERSION_KEY)
+    return version
+
+
+async def adata_version():
+    # Function is the async version of data_version
+
+    cache = get_cache()
+    version = await cache.aget(DATA_VERSION_KEY)
+    if version is None:
+        await cache.aadd(
+            DATA_VERSION_KEY, new_version(), timeout=version_timeout()
+        )
+        version = await cache.aget(DATA_VERSION_KEY)
+    return version
+
+
+def invalidate_data():
+    # Function bumps the version of all expense data, which invalidates
+    # everything cached from it (e.g. the expense table fragments)
+
+    get_cache().set(
+        DATA_VERSION_KEY, new_version(), timeout=version_timeout()
+    )
+
+
+def count(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+async def acount(key):
+    cache = get_cache()
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 0, timeout=None)
+        await cache.aincr(key)
+
+
+def report_key(kind, start, end, versions):
+    versions = '.'.join(str(version) for version in versions)
+    return 'reports:{}:{}:{}:{}'.format(
+        kind,
+        start.isoformat(),
+        end.isoformat(),
+        hashlib.md5(versions.encode()).hexdigest()
+    )
+
+
+def report_timeout(timeout):
+    if timeout is None:
+        return getattr(settings, 'REPORT_CACHE_TIMEOUT', 60 * 60 * 24)
+    return timeout
+
+
+def cached_report(kind, start, end, build, timeout=None):
+    # Function returns the result of build() for a report kind and date
+    # range, from the cache when none of the range's months have changed
+    # since it was stored
+
+    cache = get_cache()
+    key = report_key(kind, start, end, month_versions(start, end))
+
+    result = cache.get(key)
+    if result is not None:
+        count(HITS)
+        return result
+
+    count(MISSES)
+    result = build()
+    cache.set(key, result, report_timeout(timeout))
+    return result
+
+
+async def acached_report(kind, start, end, build, timeout=None):
+    # Function is the async version of cached_report; build is a coroutine
+    # function
+
+    cache = get_cache()
+    key = report_key(kind, start, end, await amonth_versions(start, end))
+
+    result = await cache.aget(key)
+    if result is not None:
+        await acount(HITS)
+        return result
+
+    await acount(MISSES)
+    result = await build()
+    await cache.aset(key, result, report_timeout(timeout))
+    return result
+
+
+def report_cache_stats():
+    # Function returns the report cache hit and miss counters
+
+    counters = get_cache().get_many([HITS, MISSES])
+    return {
+        'hits': counters.get(HITS, 0),
+        'misses': counters.get(MISSES, 0),
+    }
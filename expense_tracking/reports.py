@@ -0,0 +1,248 @@
+import datetime
+
+from django.db.models import F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from .models import Budget, Expense, ExpenseRollup, ExpenseType
+from .rollups import rollup_range_filter
+
+
+# Periods expense totals can be grouped by, and the function truncating a
+# rollup's period start to that period
+PERIODS = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# Periods of the trends report and the number of them in a year, which is
+# how far back the year over year change looks
+TREND_PERIODS = {
+    'week': 52,
+    'month': 12,
+}
+
+
+def totals_by_type_query(start, end):
+    # Function returns the query of the total amount per expense type for
+    # expenses dated between start and end (inclusive).  Totals are summed
+    # from the month and day rollups so at most one row per type and day is
+    # read.
+
+    return ExpenseRollup.objects.filter(
+        rollup_range_filter(start, end)
+    ).values(
+        'expense_type__name'
+    ).annotate(
+        amount=Sum('total')
+    ).order_by()
+
+
+def sort_totals_by_type(totals):
+    # Sort by expense type name in Python (rather than ORDER BY) so the order
+    # matches the pandas groupby regardless of the database collation
+    return sorted(
+        (
+            {
+                'expense_type': total['expense_type__name'],
+                'amount': total['amount']
+            }
+            for total in totals
+        ),
+        key=lambda total: total['expense_type']
+    )
+
+
+def expense_totals_by_type(start, end):
+    # Function returns the total amount per expense type for expenses dated
+    # between start and end (inclusive), ordered by expense type name
+
+    return sort_totals_by_type(totals_by_type_query(start, end))
+
+
+async def aexpense_totals_by_type(start, end):
+    # Function is the async version of expense_totals_by_type
+
+    return sort_totals_by_type(
+        [total async for total in totals_by_type_query(start, end)]
+    )
+
+
+def latest_inserted_date():
+    # Function returns the most recent inserted date across all expenses
+
+    return Expense.objects.aggregate(
+        max_date=Max('inserted_date')
+    )['max_date']
+
+
+async def alatest_inserted_date():
+    # Function is the async version of latest_inserted_date
+
+    return (await Expense.objects.aaggregate(
+        max_date=Max('inserted_date')
+    ))['max_date']
+
+
+def expense_totals_query(start, end, by_type=True, period=None):
+    # Function returns the query of the total amount and number of expenses
+    # dated between start and end (inclusive), grouped by expense type and/or
+    # period (day, week or month), ordered by period then type.  Totals are
+    # summed from the rollups rather than the expenses.
+
+    if period in ('day', 'week'):
+        # Weeks do not line up with months, so they are built from days
+        rollups = ExpenseRollup.objects.filter(
+            period=ExpenseRollup.DAY, period_start__range=(start, end)
+        )
+    else:
+        rollups = ExpenseRollup.objects.filter(
+            rollup_range_filter(start, end)
+        )
+
+    group_by = []
+    if period is not None:
+        truncate = PERIODS[period]
+        rollups = rollups.annotate(
+            bucket=truncate('period_start') if truncate else F('period_start')
+        )
+        group_by.append('bucket')
+    if by_type:
+        group_by.append('expense_type__name')
+
+    return rollups.values(*group_by).annotate(
+        total=Sum('total'),
+        count=Sum('count')
+    ).order_by(*group_by)
+
+
+def expense_total_rows(totals, by_type, period):
+    results = []
+    for total in totals:
+        result = {}
+        if period is not None:
+            result['period'] = total['bucket']
+        if by_type:
+            result['expense_type'] = total['expense_type__name']
+        result['total'] = total['total']
+        result['count'] = total['count']
+        results.append(result)
+    return results
+
+
+def expense_totals(start, end, by_type=True, period=None):
+    # Function returns the total amount and number of expenses dated between
+    # start and end (inclusive), grouped by expense type and/or period (day,
+    # week or month), as a list of dicts ordered by period then type
+
+    return expense_total_rows(
+        expense_totals_query(start, end, by_type, period), by_type, period
+    )
+
+
+async def aexpense_totals(start, end, by_type=True, period=None):
+    # Function is the async version of expense_totals
+
+    totals = expense_totals_query(start, end, by_type, period)
+    return expense_total_rows(
+        [total async for total in totals], by_type, period
+    )
+
+
+def trend_period_start(day, period):
+    # Function returns the first day of the week (Monday, as TruncWeek) or
+    # month of day
+
+    if period == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def trend_range(start, end, period):
+    # Function returns the first day of the first period a trends report
+    # shows, and the first day of the totals it reads: a year of periods
+    # earlier, so the first periods shown have their year over year change
+    # and full rolling averages
+
+    start = trend_period_start(start, period)
+    if period == 'week':
+        return start, start - datetime.timedelta(weeks=TREND_PERIODS[period])
+    return start, start.replace(year=start.year - 1)
+
+
+def budget_query(month):
+    # Function returns the query of the budget and expense amount per
+    # expense type for the month starting on month.  Types without a budget
+    # or expenses that month are left out.  The amounts come from one query:
+    # the budget and the month rollup of each type are joined in as
+    # subqueries.
+
+    budgets = Budget.objects.filter(
+        expense_type=OuterRef('pk'), month=month
+    ).values('amount')[:1]
+    rollups = ExpenseRollup.objects.filter(
+        expense_type=OuterRef('pk'),
+        period=ExpenseRollup.MONTH,
+        period_start=month
+    ).values('total')[:1]
+
+    return ExpenseType.objects.annotate(
+        budget_amount=Subquery(budgets),
+        expense_amount=Subquery(rollups)
+    ).filter(
+        Q(budget_amount__isnull=False) | Q(expense_amount__isnull=False)
+    ).order_by('name').values('name', 'budget_amount', 'expense_amount')
+
+
+def budget_rows(rows):
+    results = []
+    for row in rows:
+        budget = row['budget_amount'] or 0
+        expense = row['expense_amount'] or 0
+        results.append({
+            'expense_type': row['name'],
+            'budget': budget,
+            'expense': expense,
+            'remaining': budget - expense,
+        })
+    return results
+
+
+def budget_vs_actual(month):
+    # Function returns the budget, expense and remaining amount per expense
+    # type for the month starting on month, as a list of dicts ordered by
+    # expense type name
+
+    return budget_rows(budget_query(month))
+
+
+async def abudget_vs_actual(month):
+    # Function is the async version of budget_vs_actual
+
+    return budget_rows([row async for row in budget_query(month)])
+
+
+def budget_charts(budgets, title):
+    # Function returns the figure payload of the per expense type budget
+    # charts: the layout shared by every chart once, and the budget and
+    # expense amount of each chart.  The page draws the charts from it with
+    # plotly.js, so the server does not render one figure per chart.
+
+    return {
+        'layout': {
+            'title': {'text': f'<b>{title} Monthly Budget</b>', 'x': .5},
+            'xaxis': {'title': {'text': '<b>Category</b>'}},
+            'yaxis': {'title': {'text': '<b>Amount (in dollars)</b>'}},
+            'barmode': 'group',
+            'height': 500,
+            'plot_bgcolor': 'rgba(0, 0, 0, 0)',
+            'paper_bgcolor': 'rgba(0, 0, 0, 0)',
+        },
+        'charts': [
+            {
+                'category': budget['expense_type'],
+                'budget': float(budget['budget']),
+                'expense': float(budget['expense']),
+            }
+            for budget in budgets
+        ],
+    }
@@ -0,0 +1,235 @@
+import calendar
+import datetime
+import threading
+import weakref
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncMonth
+from .models import Expense, ExpenseRollup, ExpenseType
+from .report_cache import invalidate_data, invalidate_months
+
+
+CENT = Decimal('0.01')
+
+# Weak reference to the PendingRollups of the current transaction of each
+# thread
+_pending = threading.local()
+
+
+def month_start(day):
+    # Function returns the first day of the month of day
+
+    return day.replace(day=1)
+
+
+def month_end(day):
+    # Function returns the last day of the month of day
+
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def next_month_start(day):
+    # Function returns the first day of the month following day, or None
+    # for December 9999, the last month a date can hold
+
+    if day.month == 12:
+        if day.year == datetime.MAXYEAR:
+            return None
+        return day.replace(year=day.year + 1, month=1, day=1)
+    return day.replace(month=day.month + 1, day=1)
+
+
+def aggregate_expenses(expenses):
+    # Function returns the day and month rollup values (as dicts keyed by the
+    # ExpenseRollup field names) for a queryset of expenses
+
+    aggregates = {
+        'total': Sum(
+            'amount',
+            output_field=ExpenseRollup._meta.get_field('total')
+        ),
+        'count': Count('id'),
+        'min_amount': Min('amount'),
+        'max_amount': Max('amount'),
+    }
+    for period, bucket in [
+        (ExpenseRollup.DAY, F('expense_date')),
+        (ExpenseRollup.MONTH, TruncMonth('expense_date')),
+    ]:
+        rows = expenses.annotate(
+            period_start=bucket
+        ).values(
+            'period_start', 'expense_type_id'
+        ).annotate(**aggregates).order_by()
+        for row in rows:
+            row['period'] = period
+            yield row
+
+
+def refresh_rollups(start, end, expense_type_ids=None):
+    # Function recomputes the rollups of the given expense types (all types
+    # when None) for every day and month between start and end.  The range
+    # is widened to whole months so the month rollups stay consistent with
+    # the day rollups.  Every write to expenses goes through here, so it also
+    # invalidates the cached reports of those months and the expense data
+    # version.
+
+    start = month_start(start)
+    end = month_end(end)
+
+    expenses = Expense.objects.filter(expense_date__range=(start, end))
+    rollups = ExpenseRollup.objects.filter(period_start__range=(start, end))
+    expense_types = ExpenseType.objects.all()
+    if expense_type_ids is not None:
+        expense_type_ids = sorted(set(expense_type_ids))
+        expenses = expenses.filter(expense_type_id__in=expense_type_ids)
+        rollups = rollups.filter(expense_type_id__in=expense_type_ids)
+        expense_types = expense_types.filter(id__in=expense_type_ids)
+
+    with transaction.atomic():
+        # Lock the expense types so concurrent refreshes of the same rollups
+        # run one after the other
+        list(expense_types.select_for_update().order_by('id').values('id'))
+
+        rollups.delete()
+        ExpenseRollup.objects.bulk_create(
+            (ExpenseRollup(**row) for row in aggregate_expenses(expenses)),
+            batch_size=1000
+        )
+
+        # Cached reports covering these months, and pages showing the
+        # expenses, are out of date once the change is committed
+        transaction.on_commit(lambda: invalidate_months(start, end))
+        transaction.on_commit(invalidate_data)
+
+
+def refresh_expense_rollups(*expenses):
+    # Function recomputes the rollups for the months and expense types of the
+    # given (expense_date, expense_type_id) pairs
+
+    date_field = Expense._meta.get_field('expense_date')
+    months = {}
+    for expense_date, expense_type_id in expenses:
+        # Expenses created from raw values (e.g. CSV rows) may still hold the
+        # date as a string
+        expense_date = date_field.to_python(expense_date)
+        months.setdefault(month_start(expense_date), set()).add(
+            expense_type_id
+        )
+    for month, expense_type_ids in months.items():
+        refresh_rollups(month, month, expense_type_ids)
+
+
+def rollup_range_filter(start, end):
+    # Function returns a filter for the rollups covering start to end
+    # (inclusive), using month rollups for whole months and day rollups for
+    # the days before and after them.  Whole months running to the end of
+    # December 9999 have no following month, so are left unbounded.
+
+    first_month = month_start(start)
+    if first_month < start:
+        first_month = next_month_start(start)
+    after_last_month = month_start(end)
+    if end == month_end(end):
+        after_last_month = next_month_start(end)
+
+    if first_month is None or (
+        after_last_month is not None and first_month >= after_last_month
+    ):
+        return Q(period=ExpenseRollup.DAY, period_start__range=(start, end))
+
+    rollup_filter = Q(
+        period=ExpenseRollup.MONTH,
+        period_start__gte=first_month
+    )
+    if after_last_month is not None:
+        rollup_filter &= Q(period_start__lt=after_last_month)
+    if start < first_month:
+        rollup_filter |= Q(
+            period=ExpenseRollup.DAY,
+            period_start__gte=start,
+            period_start__lt=first_month
+        )
+    if after_last_month is not None and after_last_month <= end:
+        rollup_filter |= Q(
+            period=ExpenseRollup.DAY,
+            period_start__gte=after_last_month,
+            period_start__lte=end
+        )
+    return rollup_filter
+
+
+def verify_rollups(start=None, end=None):
+    # Function compares the stored rollups with rollups computed from the
+    # expenses and returns the (period, period_start, expense_type_id) keys
+    # that are missing, extra or different
+
+    fields = ['total', 'count', 'min_amount', 'max_amount']
+    expenses = Expense.objects.all()
+    rollups = ExpenseRollup.objects.all()
+    if start is not None:
+        start = month_start(start)
+        expenses = expenses.filter(expense_date__gte=start)
+        rollups = rollups.filter(period_start__gte=start)
+    if end is not None:
+        end = month_end(end)
+        expenses = expenses.filter(expense_date__lte=end)
+        rollups = rollups.filter(period_start__lte=end)
+
+    def normalize(values):
+        # Round amounts to cents; SQLite sums decimals as floats
+        return tuple(
+            value.quantize(CENT) if isinstance(value, Decimal) else value
+            for value in values
+        )
+
+    expected = {
+        (row['period'], row['period_start'], row['expense_type_id']):
+        normalize(row[field] for field in fields)
+        for row in aggregate_expenses(expenses)
+    }
+    stored = {
+        row[:3]: normalize(row[3:])
+        for row in rollups.values_list(
+            'period', 'period_start', 'expense_type_id', *fields
+        )
+    }
+    return sorted(
+        key for key in expected.keys() | stored.keys()
+        if expected.get(key) != stored.get(key)
+    )
+
+
+class PendingRollups:
+    # Class for the (expense_date, expense_type_id) pairs of the expenses a
+    # transaction saved or deleted, registered as its on_commit callback to
+    # refresh their rollups once.  Only the transaction holds it, so a
+    # rollback, which discards the callback, discards the pairs as well.
+
+    def __init__(self):
+        self.expenses = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        refresh_expense_rollups(*self.expenses)
+
+
+def refresh_expense_rollups_on_commit(*expenses):
+    # Function queues the rollups of the given (expense_date,
+    # expense_type_id) pairs to be refreshed when the transaction commits
+    # (at once outside a transaction), so a transaction writing many
+    # expenses one at a time (e.g. QuerySet.delete() or a cascade, which
+    # send a signal per row) refreshes each month and type once
+
+    ref = getattr(_pending, 'ref', None)
+    pending = ref() if ref is not None else None
+    if pending is not None and not pending.done:
+        pending.expenses.update(expenses)
+        return
+    pending = PendingRollups()
+    pending.expenses.update(expenses)
+    _pending.ref = weakref.ref(pending)
+    transaction.on_commit(pending)
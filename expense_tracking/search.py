@@ -0,0 +1,52 @@
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Greatest, Upper
+
+
+# Columns searched, and the most expenses a search returns
+SEARCH_FIELDS = ('name', 'org', 'notes')
+SEARCH_LIMIT = 100
+
+
+def search_filter(query):
+    # Function returns the filter for expenses whose name, org or notes
+    # contain the query.  On PostgreSQL icontains compares UPPER(column),
+    # which the pg_trgm GIN indexes on each column serve.
+
+    matches = Q()
+    for field in SEARCH_FIELDS:
+        matches |= Q(**{f'{field}__icontains': query})
+    return matches
+
+
+def search_expenses(expenses, query, limit=SEARCH_LIMIT):
+    # Function returns up to limit expenses whose name, org or notes contain
+    # the query.  On PostgreSQL expenses with a word similar to the query
+    # (e.g. misspelled) also match, best matches first, and both searches use
+    # the pg_trgm GIN indexes on the columns.  Other databases only match
+    # substrings, newest expense first.
+
+    query = query.strip()
+    if not query:
+        return expenses.none()
+
+    matches = search_filter(query)
+
+    if connections[expenses.db].vendor != 'postgresql':
+        return expenses.filter(matches).order_by(
+            '-expense_date', '-id'
+        )[:limit]
+
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    # Compare UPPER(column), the expression the trigram indexes are on
+    for field in SEARCH_FIELDS:
+        matches |= Q(**{f'{field}_upper__trigram_word_similar': query.upper()})
+
+    return expenses.alias(
+        **{f'{field}_upper': Upper(field) for field in SEARCH_FIELDS}
+    ).filter(matches).annotate(
+        rank=Greatest(*(
+            TrigramWordSimilarity(query, field) for field in SEARCH_FIELDS
+        ))
+    ).order_by('-rank', '-expense_date', '-id')[:limit]
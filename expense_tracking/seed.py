@@ -0,0 +1,99 @@
+import datetime
+import itertools
+import math
+import random
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+from .csv_import import copy_expenses
+from .models import Expense, ExpenseType
+from .rollups import refresh_rollups
+
+
+# Expense types of the synthetic data: name, share of the expenses, typical
+# amount, and the names and organizations expenses are drawn from.  Amounts
+# are log-normal around the typical amount, so most are close to it with a
+# long tail of larger ones.
+PROFILES = [
+    ('Groceries', 30, 60, ['Weekly groceries', 'Produce', 'Snacks'],
+     ['Kroger', 'Whole Foods', "Trader Joe's", 'Costco', 'Aldi']),
+    ('Dining', 20, 25, ['Lunch', 'Dinner', 'Coffee'],
+     ['Chipotle', 'Starbucks', 'Olive Garden', 'Panera', 'Local Diner']),
+    ('Gas', 12, 45, ['Fill up'], ['Shell', 'Exxon', 'BP', 'Chevron']),
+    ('Entertainment', 8, 30, ['Movies', 'Streaming', 'Games'],
+     ['AMC', 'Netflix', 'Spotify', 'Steam']),
+    ('Utilities', 6, 150, ['Electric bill', 'Water bill', 'Internet'],
+     ['Power Co', 'Water Dept', 'Internet Provider']),
+    ('Clothing', 6, 70, ['Shirts', 'Shoes', 'Jacket'],
+     ['Target', 'Gap', 'Old Navy', 'Nike']),
+    ('Medical', 5, 120, ['Prescription', 'Copay', 'Dentist'],
+     ['CVS', 'Walgreens', 'Clinic']),
+    ('Other', 5, 40, ['Gift', 'Supplies', 'Donation'],
+     ['Amazon', 'Walmart', 'Post Office']),
+    ('Insurance', 3, 200, ['Car insurance', 'Renters insurance'],
+     ['State Farm', 'Geico']),
+    ('Travel', 3, 400, ['Flight', 'Hotel', 'Ride'],
+     ['Delta', 'Marriott', 'Airbnb', 'Uber']),
+    ('Rent', 2, 1500, ['Rent'], ['Landlord']),
+]
+
+# Largest amount an expense can hold
+MAX_AMOUNT = Decimal('99999.99')
+
+
+def seed_expenses(count, start, end, seed=0, batch_size=5000,
+                  use_copy=False):
+    # Function adds count synthetic expenses dated between start and end
+    # (inclusive) to the expense types of PROFILES, creating the types that
+    # do not exist, and returns the number added.  The same seed gives the
+    # same expenses.  Expenses are written batch_size rows per transaction
+    # with bulk_create (or COPY) and the rollups are refreshed once at the
+    # end.
+
+    use_copy = use_copy and connection.vendor == 'postgresql'
+    rng = random.Random(seed)
+    expense_types = [
+        ExpenseType.objects.get_or_create(name=profile[0])[0]
+        for profile in PROFILES
+    ]
+    weights = list(itertools.accumulate(profile[1] for profile in PROFILES))
+    days = (end - start).days + 1
+    inserted_date = timezone.now()
+
+    def write(expenses):
+        with transaction.atomic():
+            if use_copy:
+                copy_expenses(expenses)
+            else:
+                Expense.objects.bulk_create(expenses, batch_size=1000)
+
+    batch = []
+    try:
+        for _ in range(count):
+            i = rng.choices(range(len(PROFILES)), cum_weights=weights)[0]
+            typical, names, orgs = PROFILES[i][2:]
+            amount = Decimal(
+                round(rng.lognormvariate(math.log(typical), .5), 2)
+            ).quantize(Decimal('0.01'))
+            batch.append(Expense(
+                expense_date=start + datetime.timedelta(
+                    days=rng.randrange(days)
+                ),
+                expense_type=expense_types[i],
+                name=rng.choice(names),
+                org=rng.choice(orgs),
+                amount=max(min(amount, MAX_AMOUNT), Decimal('0.01')),
+                notes='',
+                inserted_date=inserted_date
+            ))
+            if len(batch) == batch_size:
+                write(batch)
+                batch = []
+        if batch:
+            write(batch)
+    finally:
+        refresh_rollups(
+            start, end, [expense_type.pk for expense_type in expense_types]
+        )
+    return count
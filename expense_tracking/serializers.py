@@ -1,8 +1,41 @@
 from rest_framework import serializers
-from .models import ExpenseType
+from .models import Expense, ExpenseType
 
 
 class ExpenseTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = ExpenseType
         fields = ('id', 'name')
+
+
+class ExpenseSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Expense
+        fields = (
+            'id',
+            'expense_date',
+            'expense_type',
+            'name',
+            'org',
+            'amount',
+            'notes',
+            'inserted_date'
+        )
+        read_only_fields = ('inserted_date',)
+
+
+class ExpenseBulkSerializer(serializers.Serializer):
+    # Serializer for one row of a bulk create/update request.  Rows with an
+    # id update that expense, rows without one create an expense.  The
+    # expense type is a plain id, checked for all rows at once by the view,
+    # instead of one query per row.
+
+    id = serializers.IntegerField(required=False)
+    expense_date = serializers.DateField()
+    expense_type = serializers.IntegerField()
+    name = serializers.CharField(max_length=200)
+    org = serializers.CharField(max_length=200)
+    amount = serializers.DecimalField(max_digits=7, decimal_places=2)
+    notes = serializers.CharField(
+        max_length=200, allow_blank=True, required=False, default=''
+    )
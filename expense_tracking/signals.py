@@ -1,8 +1,73 @@
 from django.dispatch import receiver
 from django.contrib.auth.signals import user_logged_out
 from django.contrib import messages
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete
+from .expense_types import invalidate_expense_types
+from .metrics import instrument_connection
+from .models import Expense, ExpenseType
+from .report_cache import invalidate_data
+from .rollups import refresh_expense_rollups_on_commit
 
 
 @receiver(user_logged_out)
 def log_user_logout(sender, request, user, **kwargs):
     messages.success(request, "You have successfully logged out!")
+
+
+@receiver(connection_created)
+def record_connection_queries(sender, connection, **kwargs):
+    # Count and time the queries of each request for the performance
+    # middleware
+
+    instrument_connection(connection)
+
+
+@receiver(pre_save, sender=Expense)
+def remember_expense_rollup(sender, instance, **kwargs):
+    # Keep the date and type an edited expense had before the change so the
+    # rollup it is moving out of can be refreshed as well
+
+    instance._rollup_previous = None
+    if instance.pk is not None:
+        instance._rollup_previous = Expense.objects.filter(
+            pk=instance.pk
+        ).values_list('expense_date', 'expense_type_id').first()
+
+
+@receiver(post_save, sender=Expense)
+def update_expense_rollup(sender, instance, raw=False, **kwargs):
+    # Refresh the rollups of a saved expense, once per month and type when
+    # the transaction commits
+
+    if raw:
+        return
+    changed = [(instance.expense_date, instance.expense_type_id)]
+    if getattr(instance, '_rollup_previous', None):
+        changed.append(instance._rollup_previous)
+    refresh_expense_rollups_on_commit(*changed)
+
+
+@receiver(post_delete, sender=Expense)
+def remove_expense_rollup(sender, instance, **kwargs):
+    # Refresh the rollups of a deleted expense, once per month and type when
+    # the transaction commits
+
+    refresh_expense_rollups_on_commit(
+        (instance.expense_date, instance.expense_type_id)
+    )
+
+
+@receiver(post_save, sender=ExpenseType)
+@receiver(post_delete, sender=ExpenseType)
+def update_expense_types(sender, **kwargs):
+    # Reload the cached expense types after a change.  The version is bumped
+    # now, so this transaction sees its own change, and again on commit, so
+    # other processes do not cache the expense types from before it.  Pages
+    # showing expenses show type names, so the expense data version is bumped
+    # as well.
+
+    invalidate_expense_types()
+    transaction.on_commit(invalidate_expense_types)
+    transaction.on_commit(invalidate_data)
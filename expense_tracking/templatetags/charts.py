@@ -0,0 +1,27 @@
+from functools import lru_cache
+
+from django import template
+from django.utils.html import format_html
+
+
+register = template.Library()
+
+
+@lru_cache(maxsize=None)
+def plotlyjs_url():
+    # Function returns the CDN url of the plotly.js version matching the
+    # installed plotly package
+
+    from plotly.offline import get_plotlyjs_version
+    return f'https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js'
+
+
+@register.simple_tag
+def plotlyjs():
+    # Tag renders the script tag loading plotly.js.  Charts are rendered
+    # without the library, so pages load it once from a cacheable url
+    # instead of inlining several megabytes per chart.
+
+    return format_html(
+        '<script src="{}" charset="utf-8"></script>', plotlyjs_url()
+    )
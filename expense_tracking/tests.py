@@ -1,3 +1,1600 @@
-from django.test import TestCase
+import csv
+import datetime
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import metrics
+from .csv_import import import_expenses
+from .export import astream_export
+from .expense_types import get_expense_types
+from .forms import ExpenseForm
+from .fragments import get_fragment_cache
+from .jobs import enqueue, requeue_stale_jobs, run_next_job
+from .models import (
+    Budget,
+    Expense,
+    ExpenseRollup,
+    ExpenseType,
+    Job,
+    RecurringExpense
+)
+from .pagination import KeysetPage
+from .recurring import generate_recurring_expenses, next_due_date
+from .checks import check_report_cache
+from .report_cache import (
+    LOCAL_VERSION_MAX_AGE,
+    cached_report,
+    data_version,
+    get_cache,
+    invalidate_data,
+    invalidate_months,
+    month_versions,
+    report_cache_stats,
+    shared_cache,
+    version_timeout
+)
+from .reports import (
+    budget_vs_actual,
+    expense_totals,
+    expense_totals_by_type,
+    latest_inserted_date
+)
+from .rollups import verify_rollups
+from .search import search_expenses
+from .seed import PROFILES, seed_expenses
+
+
+# Report cache of the tests: a file cache shared between processes, like the
+# default one, in a directory of this run, so the tests never clear or bump
+# the versions of the report cache that is configured
+TEST_REPORT_CACHE = tempfile.mkdtemp(prefix='expense_tracking_reports_')
+TEST_CACHES = {
+    **settings.CACHES,
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': TEST_REPORT_CACHE,
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+
+def tearDownModule():
+    shutil.rmtree(TEST_REPORT_CACHE, ignore_errors=True)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReportTests(TestCase):
+    # Tests for the date range report
+
+    @classmethod
+    def setUpTestData(cls):
+        rent = ExpenseType.objects.create(name='Rent')
+        food = ExpenseType.objects.create(name='Food')
+        with cls.captureOnCommitCallbacks(execute=True):
+            for expense_date, expense_type, amount in [
+                (datetime.date(2023, 12, 31), food, '10.00'),
+                (datetime.date(2024, 1, 1), food, '12.50'),
+                (datetime.date(2024, 1, 15), food, '7.25'),
+                (datetime.date(2024, 1, 1), rent, '1000.00'),
+                (datetime.date(2024, 2, 1), rent, '1000.00'),
+            ]:
+                Expense.objects.create(
+                    expense_date=expense_date,
+                    expense_type=expense_type,
+                    name='Expense',
+                    org='Org',
+                    amount=Decimal(amount)
+                )
+
+    def test_totals_by_type_for_range(self):
+        # Totals only include expenses within the range and are ordered by
+        # expense type name
+
+        totals = expense_totals_by_type(
+            datetime.date(2024, 1, 1), datetime.date(2024, 1, 31)
+        )
+        self.assertEqual(totals, [
+            {'expense_type': 'Food', 'amount': Decimal('19.75')},
+            {'expense_type': 'Rent', 'amount': Decimal('1000.00')},
+        ])
+
+    def test_totals_by_type_for_partial_months(self):
+        # Ranges that do not cover whole months use the day rollups for the
+        # partial months
+
+        totals = expense_totals_by_type(
+            datetime.date(2023, 12, 31), datetime.date(2024, 2, 1)
+        )
+        self.assertEqual(totals, [
+            {'expense_type': 'Food', 'amount': Decimal('29.75')},
+            {'expense_type': 'Rent', 'amount': Decimal('2000.00')},
+        ])
+        totals = expense_totals_by_type(
+            datetime.date(2024, 1, 2), datetime.date(2024, 1, 15)
+        )
+        self.assertEqual(totals, [
+            {'expense_type': 'Food', 'amount': Decimal('7.25')},
+        ])
+
+    def test_totals_up_to_the_last_date(self):
+        # The months of a range ending in December 9999 have no following
+        # month to step to
+        with self.captureOnCommitCallbacks(execute=True):
+            for expense_date in ['9999-11-30', '9999-12-05', '9999-12-31']:
+                Expense.objects.create(
+                    expense_date=datetime.date.fromisoformat(expense_date),
+                    expense_type=ExpenseType.objects.get(name='Food'),
+                    name='Expense',
+                    org='Org',
+                    amount=Decimal('1.00')
+                )
+
+        for start, amount in [
+            (datetime.date(9999, 11, 1), Decimal('3.00')),
+            (datetime.date(9999, 11, 30), Decimal('3.00')),
+            (datetime.date(9999, 12, 10), Decimal('1.00')),
+        ]:
+            totals = cached_report(
+                'by_type', start, datetime.date.max,
+                lambda: expense_totals_by_type(start, datetime.date.max)
+            )
+            self.assertEqual(totals, [
+                {'expense_type': 'Food', 'amount': amount},
+            ])
+
+    def test_totals_by_type_empty_range(self):
+        totals = expense_totals_by_type(
+            datetime.date(2025, 1, 1), datetime.date(2025, 1, 31)
+        )
+        self.assertEqual(totals, [])
+
+    def test_totals_by_period(self):
+        start = datetime.date(2023, 12, 31)
+        end = datetime.date(2024, 2, 1)
+        self.assertEqual(
+            [
+                (total['period'], total['total'], total['count'])
+                for total in expense_totals(start, end, False, 'month')
+            ],
+            [
+                (datetime.date(2023, 12, 1), Decimal('10.00'), 1),
+                (datetime.date(2024, 1, 1), Decimal('1019.75'), 3),
+                (datetime.date(2024, 2, 1), Decimal('1000.00'), 1),
+            ]
+        )
+        self.assertEqual(
+            [
+                (total['period'], total['expense_type'], total['total'])
+                for total in expense_totals(start, end, True, 'week')
+            ],
+            [
+                (datetime.date(2023, 12, 25), 'Food', Decimal('10.00')),
+                (datetime.date(2024, 1, 1), 'Food', Decimal('12.50')),
+                (datetime.date(2024, 1, 1), 'Rent', Decimal('1000.00')),
+                (datetime.date(2024, 1, 15), 'Food', Decimal('7.25')),
+                (datetime.date(2024, 1, 29), 'Rent', Decimal('1000.00')),
+            ]
+        )
+
+    def test_latest_inserted_date(self):
+        self.assertEqual(
+            latest_inserted_date(),
+            Expense.objects.order_by('-inserted_date')[0].inserted_date
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RollupTests(TestCase):
+    # Tests for the maintenance of the expense rollups
+
+    def setUp(self):
+        self.food = ExpenseType.objects.create(name='Food')
+        self.rent = ExpenseType.objects.create(name='Rent')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.expense = Expense.objects.create(
+                expense_date=datetime.date(2024, 1, 31),
+                expense_type=self.food,
+                name='Expense',
+                org='Org',
+                amount=Decimal('5.00')
+            )
+
+    def rollup(self, period, period_start, expense_type):
+        return ExpenseRollup.objects.filter(
+            period=period,
+            period_start=period_start,
+            expense_type=expense_type
+        ).values_list('total', 'count', 'min_amount', 'max_amount').first()
+
+    def test_rollups_follow_expense_changes(self):
+        # Rollups are refreshed when the change is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(
+                expense_date=datetime.date(2024, 1, 2),
+                expense_type=self.food,
+                name='Expense',
+                org='Org',
+                amount=Decimal('7.00')
+            )
+        self.assertEqual(
+            self.rollup('M', datetime.date(2024, 1, 1), self.food),
+            (Decimal('12.00'), 2, Decimal('5.00'), Decimal('7.00'))
+        )
+
+        # Moving an expense to another month and type updates both rollups
+        self.expense.expense_date = datetime.date(2024, 2, 1)
+        self.expense.expense_type = self.rent
+        with self.captureOnCommitCallbacks(execute=True):
+            self.expense.save()
+        self.assertEqual(
+            self.rollup('M', datetime.date(2024, 1, 1), self.food),
+            (Decimal('7.00'), 1, Decimal('7.00'), Decimal('7.00'))
+        )
+        self.assertIsNone(
+            self.rollup('D', datetime.date(2024, 1, 31), self.food)
+        )
+        self.assertEqual(
+            self.rollup('D', datetime.date(2024, 2, 1), self.rent),
+            (Decimal('5.00'), 1, Decimal('5.00'), Decimal('5.00'))
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.expense.delete()
+        self.assertIsNone(
+            self.rollup('M', datetime.date(2024, 2, 1), self.rent)
+        )
+        self.assertEqual(verify_rollups(), [])
+
+    def test_bulk_deletes_refresh_each_month_once(self):
+        # Deleting many expenses, or their type, sends a signal per row, but
+        # the rollups of each month and type are refreshed once on commit
+        Expense.objects.bulk_create(
+            Expense(
+                expense_date=datetime.date(2024, 3, 1) + datetime.timedelta(
+                    days=i % 90
+                ),
+                expense_type=self.rent,
+                name='Expense',
+                org='Org',
+                amount=Decimal('1.00')
+            )
+            for i in range(300)
+        )
+        call_command('rollup_expenses', stdout=StringIO())
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                Expense.objects.filter(
+                    expense_date__lt=datetime.date(2024, 4, 15)
+                ).delete()
+        self.assertLess(len(queries), 30)
+        self.assertEqual(verify_rollups(), [])
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.rent.delete()
+        self.assertLess(len(queries), 30)
+        self.assertEqual(verify_rollups(), [])
+
+    def test_rollup_command_verifies_and_rebuilds(self):
+        ExpenseRollup.objects.filter(period='D').delete()
+        with self.assertRaises(CommandError):
+            call_command('rollup_expenses', verify=True, stderr=StringIO())
+
+        call_command('rollup_expenses', stdout=StringIO())
+        self.assertEqual(verify_rollups(), [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ImportTests(TestCase):
+    # Tests for the CSV expense import
+
+    def test_import_expenses(self):
+        food = ExpenseType.objects.create(name='Food')
+        file = StringIO(
+            'expense_date,expense_type,name,org,amount,notes\n'
+            '2024-01-02,Food,Lunch,Cafe,12.50,\n'
+            f'01/03/2024,{food.id},Dinner,Diner,20.00,Tip included\n'
+            '2024-01-04,Unknown,Lunch,Cafe,12.50,\n'
+            '2024-01-05,Food,,Cafe,abc,\n'
+        )
+        rejects = StringIO()
+
+        result = import_expenses(
+            file, transaction_size=1, rejects=csv.writer(rejects)
+        )
+
+        self.assertEqual((result.imported, result.rejected), (2, 2))
+        self.assertEqual(
+            list(Expense.objects.order_by('expense_date').values_list(
+                'name', 'expense_type__name', 'amount', 'notes'
+            )),
+            [
+                ('Lunch', 'Food', Decimal('12.50'), ''),
+                ('Dinner', 'Food', Decimal('20.00'), 'Tip included'),
+            ]
+        )
+        self.assertEqual(
+            [row[0] for row in csv.reader(StringIO(rejects.getvalue()))],
+            ['4', '5']
+        )
+        self.assertEqual(verify_rollups(), [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SeedTests(TestCase):
+    # Tests for the synthetic expense generator
+
+    def test_seed_expenses(self):
+        start = datetime.date(2024, 1, 1)
+        end = datetime.date(2024, 3, 31)
+
+        self.assertEqual(seed_expenses(200, start, end, batch_size=64), 200)
+
+        self.assertEqual(Expense.objects.count(), 200)
+        self.assertEqual(
+            set(ExpenseType.objects.values_list('name', flat=True)),
+            {profile[0] for profile in PROFILES}
+        )
+        self.assertFalse(Expense.objects.exclude(
+            expense_date__range=(start, end)
+        ).exists())
+        self.assertEqual(verify_rollups(), [])
+
+        # The same seed gives the same expenses
+        fields = ('expense_date', 'expense_type__name', 'name', 'org',
+                  'amount')
+        first = list(Expense.objects.order_by('id').values_list(*fields))
+        Expense.objects.all().delete()
+        call_command(
+            'seed_expenses', '200', '--start=2024-01-01', '--end=2024-03-31',
+            stdout=StringIO()
+        )
+        self.assertEqual(
+            list(Expense.objects.order_by('id').values_list(*fields)), first
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ExpenseTypeCacheTests(TestCase):
+    # Tests for the cached expense types shared by forms and views
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user('types', password='password')
+        self.food = ExpenseType.objects.create(name='Food')
+        self.rent = ExpenseType.objects.create(name='Rent')
+        self.client.force_login(self.user)
+
+    def expense_type_queries(self, queries):
+        # Queries loading expense types, leaving out the existence check of
+        # the saved foreign key and the rollup lock
+        return [
+            query['sql'] for query in queries.captured_queries
+            if '"expense_tracking_expensetype"."name"' in query['sql']
+        ]
+
+    def test_add_expense_does_not_query_expense_types_when_warm(self):
+        self.assertEqual(
+            [expense_type.name for expense_type in get_expense_types()],
+            ['Food', 'Rent']
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('expense_tracking:add_expense'))
+            response = self.client.post(
+                reverse('expense_tracking:add_expense'),
+                {
+                    'expense_date': '2024-01-01',
+                    'expense_type': self.rent.pk,
+                    'name': 'Rent',
+                    'org': 'Landlord',
+                    'amount': '1000.00',
+                    'notes': ''
+                }
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.expense_type_queries(queries), [])
+        self.assertEqual(Expense.objects.get().expense_type, self.rent)
+
+    def test_unknown_expense_type_is_invalid(self):
+        form = ExpenseForm({
+            'expense_date': '2024-01-01',
+            'expense_type': self.rent.pk + 100,
+            'name': 'Rent',
+            'org': 'Landlord',
+            'amount': '1000.00',
+            'notes': ''
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('expense_type', form.errors)
+
+    def test_saving_an_expense_type_reloads_the_cache(self):
+        snapshot = get_expense_types()
+        self.assertIs(get_expense_types(), snapshot)
+        ExpenseType.objects.create(name='Travel')
+        self.assertEqual(
+            [expense_type.name for expense_type in get_expense_types()],
+            ['Food', 'Rent', 'Travel']
+        )
+        self.rent.delete()
+        self.assertNotIn(self.rent.pk, get_expense_types().by_id)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecurringExpenseTests(TestCase):
+    # Tests for generating recurring expenses
+
+    def setUp(self):
+        self.rent = ExpenseType.objects.create(name='Rent')
+        self.monthly = RecurringExpense.objects.create(
+            expense_type=self.rent,
+            name='Rent',
+            org='Landlord',
+            amount=Decimal('1000.00'),
+            start_date=datetime.date(2024, 1, 31)
+        )
+        self.weekly = RecurringExpense.objects.create(
+            expense_type=self.rent,
+            name='Cleaning',
+            org='Cleaner',
+            amount=Decimal('50.00'),
+            frequency=RecurringExpense.WEEKLY,
+            interval=2,
+            start_date=datetime.date(2024, 1, 1),
+            end_date=datetime.date(2024, 2, 1)
+        )
+
+    def dates(self, schedule):
+        return list(schedule.expense_set.order_by(
+            'expense_date'
+        ).values_list('expense_date', flat=True))
+
+    def test_generates_due_expenses_once(self):
+        result = generate_recurring_expenses(datetime.date(2024, 3, 31))
+        self.assertEqual((result.schedules, result.expenses), (2, 6))
+        self.assertEqual(self.dates(self.monthly), [
+            datetime.date(2024, 1, 31),
+            datetime.date(2024, 2, 29),
+            datetime.date(2024, 3, 31),
+        ])
+        self.assertEqual(self.dates(self.weekly), [
+            datetime.date(2024, 1, 1),
+            datetime.date(2024, 1, 15),
+            datetime.date(2024, 1, 29),
+        ])
+        self.monthly.refresh_from_db()
+        self.weekly.refresh_from_db()
+        self.assertEqual(self.monthly.next_run, datetime.date(2024, 4, 30))
+        self.assertFalse(self.weekly.active)
+        self.assertEqual(verify_rollups(), [])
+
+        # Running again, or with the next run moved back, adds nothing
+        generate_recurring_expenses(datetime.date(2024, 3, 31))
+        RecurringExpense.objects.filter(pk=self.monthly.pk).update(
+            next_run=datetime.date(2024, 1, 31)
+        )
+        out = StringIO()
+        call_command('generate_recurring', '--date', '2024-03-31', stdout=out)
+        # The skipped duplicates are not counted as generated
+        self.assertIn(
+            'Generated 0 expenses from 1 recurring expenses', out.getvalue()
+        )
+        self.assertEqual(Expense.objects.count(), 6)
+
+    def test_interval_must_advance_the_due_date(self):
+        self.weekly.interval = 0
+        with self.assertRaises(ValidationError):
+            self.weekly.full_clean()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RecurringExpense.objects.filter(pk=self.weekly.pk).update(
+                interval=0
+            )
+        with self.assertRaises(ValueError):
+            next_due_date(self.weekly, datetime.date(2024, 1, 1))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ExportTests(TestCase):
+    # Tests for the streaming expense export
+
+    def test_export_filters_and_can_be_imported_again(self):
+        user = User.objects.create_user('export', password='password')
+        food = ExpenseType.objects.create(name='Food')
+        rent = ExpenseType.objects.create(name='Rent')
+        for expense_date, expense_type, notes in [
+            (datetime.date(2024, 1, 2), food, 'Lunch, with "tip"'),
+            (datetime.date(2024, 1, 3), rent, ''),
+            (datetime.date(2024, 2, 1), food, ''),
+        ]:
+            Expense.objects.create(
+                expense_date=expense_date,
+                expense_type=expense_type,
+                name='Expense',
+                org='Org',
+                amount=Decimal('9.99'),
+                notes=notes
+            )
+
+        self.client.force_login(user)
+        response = self.client.get(reverse('expense_tracking:export_expenses'), {
+            'start_date': '2024-01-01',
+            'end_date': '2024-01-31',
+            'expense_type': food.id,
+        })
+        self.assertTrue(response.streaming)
+        exported = b''.join(response.streaming_content).decode()
+        self.assertEqual(list(csv.reader(StringIO(exported))), [
+            ['expense_date', 'expense_type', 'name', 'org', 'amount', 'notes'],
+            ['2024-01-02', 'Food', 'Expense', 'Org', '9.99', 'Lunch, with "tip"'],
+        ])
+
+        Expense.objects.all().delete()
+        self.assertEqual(import_expenses(StringIO(exported)).imported, 1)
+
+        response = self.client.get(
+            reverse('expense_tracking:export_expenses'), {'format': 'pdf'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_streams_asynchronously_to_asgi_servers(self):
+        user = User.objects.create_user('export', password='password')
+        food = ExpenseType.objects.create(name='Food')
+        for day in range(1, 4):
+            Expense.objects.create(
+                expense_date=datetime.date(2024, 1, day),
+                expense_type=food,
+                name=f'Expense {day}',
+                org='Org',
+                amount=Decimal('9.99')
+            )
+
+        async def export():
+            response = await self.async_client.get(
+                reverse('expense_tracking:export_expenses'),
+                {'start_date': '2024-01-01', 'end_date': '2024-01-31'}
+            )
+            return response, [
+                chunk async for chunk in response.streaming_content
+            ]
+
+        self.async_client.force_login(user)
+        response, chunks = async_to_sync(export)()
+        self.assertTrue(response.is_async)
+        self.assertEqual(
+            [row[2] for row in csv.reader(StringIO(
+                b''.join(chunks).decode()
+            ))],
+            ['name', 'Expense 1', 'Expense 2', 'Expense 3']
+        )
+
+        # Chunks are read in batches, and the export is closed when done
+        closed = []
+
+        def rows():
+            try:
+                yield from ['a', 'b', 'c']
+            finally:
+                closed.append(True)
+
+        async def collect():
+            return [chunk async for chunk in astream_export(rows(), 2)]
+
+        self.assertEqual(async_to_sync(collect)(), ['ab', 'c'])
+        self.assertEqual(closed, [True])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ExpenseListTests(TestCase):
+    # Tests for the expense list and filter pages
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='pw')
+        cls.expense_types = [
+            ExpenseType.objects.create(name=name)
+            for name in ['Food', 'Rent', 'Travel']
+        ]
+
+    def add_expenses(self, count):
+        Expense.objects.bulk_create(
+            Expense(
+                expense_date=datetime.date(2024, 1, 1) + datetime.timedelta(
+                    days=i
+                ),
+                expense_type=self.expense_types[i % 3],
+                name=f'Expense {i}',
+                org='Org',
+                amount=Decimal('1.00')
+            )
+            for i in range(count)
+        )
+
+    def count_queries(self, url):
+        cache.clear()
+        get_fragment_cache().clear()
+        # Expense types are loaded once per process, not per page
+        get_expense_types()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_rows(self):
+        self.client.force_login(self.user)
+        urls = [
+            reverse('expense_tracking:expenses'),
+            reverse(
+                'expense_tracking:filter', args=[self.expense_types[0].id]
+            ),
+        ]
+
+        self.add_expenses(6)
+        few_rows = [self.count_queries(url) for url in urls]
+        self.add_expenses(150)
+        many_rows = [self.count_queries(url) for url in urls]
+
+        self.assertEqual(few_rows, many_rows)
+
+    def test_warm_pages_skip_the_expense_queries(self):
+        self.client.force_login(self.user)
+        self.add_expenses(60)
+        url = reverse('expense_tracking:expenses')
+        cache.clear()
+        get_fragment_cache().clear()
+        get_expense_types()
+
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as warm:
+            response = self.client.get(url)
+
+        self.assertContains(response, 'Expense 59')
+        self.assertContains(response, '60 expenses')
+        tables = [
+            query['sql'] for query in warm.captured_queries
+            if 'expense_tracking_expense' in query['sql']
+        ]
+        self.assertEqual(tables, [])
+        self.assertLess(len(warm), len(cold))
+
+        # Editing an expense, or renaming its type, shows on the next request
+        expense = Expense.objects.order_by('-expense_date').first()
+        expense.name = 'Edited'
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.save()
+        self.assertContains(self.client.get(url), 'Edited')
+
+        food = self.expense_types[0]
+        food.name = 'Groceries'
+        with self.captureOnCommitCallbacks(execute=True):
+            food.save()
+        self.assertContains(self.client.get(url), 'Groceries')
+
+    def test_fragments_are_not_cached_without_a_shared_version(self):
+        self.client.force_login(self.user)
+        self.add_expenses(3)
+        url = reverse('expense_tracking:expenses')
+        local = {
+            **settings.CACHES,
+            'reports': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'local-reports',
+            },
+        }
+        with override_settings(CACHES=local):
+            get_expense_types()
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as warm:
+                response = self.client.get(url)
+            self.assertEqual(response.context['fragment_timeout'], 0)
+
+        tables = [
+            query['sql'] for query in warm.captured_queries
+            if 'expense_tracking_expense' in query['sql']
+        ]
+        self.assertNotEqual(tables, [])
+
+    def test_unchanged_pages_are_not_modified(self):
+        self.client.force_login(self.user)
+        self.add_expenses(3)
+        url = reverse('expense_tracking:expenses')
+        # The first visit sets the CSRF cookie the page's ETag varies on
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with CaptureQueriesContext(connection) as queries:
+            repeat = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.content, b'')
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'expense_tracking_' in query['sql']
+        ])
+
+        # Another page, or a change to the expenses, is sent in full
+        response = self.client.get(
+            url, {'after': '2024-01-02.1'}, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        etag = self.client.get(url)['ETag']
+        expense = Expense.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_changes_from_another_process_are_sent_in_full(self):
+        self.client.force_login(self.user)
+        self.add_expenses(3)
+        url = reverse('expense_tracking:expenses')
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        # A change committed by another process (e.g. the job worker) bumps
+        # the data version in the shared report cache
+        code = '\n'.join([
+            'import os, django',
+            'django.setup()',
+            'from django.conf import settings',
+            'from django.test.utils import override_settings',
+            'from expense_tracking.report_cache import invalidate_data',
+            'reports = dict(settings.CACHES["reports"],',
+            '    BACKEND="django.core.cache.backends.filebased.FileBasedCache",',
+            '    LOCATION=os.environ["REPORT_CACHE_LOCATION"])',
+            'with override_settings(CACHES=dict(settings.CACHES, '
+            'reports=reports)):',
+            '    invalidate_data()',
+        ])
+        env = dict(os.environ, REPORT_CACHE_LOCATION=TEST_REPORT_CACHE)
+        subprocess.run(
+            [sys.executable, '-c', code],
+            check=True,
+            cwd=settings.BASE_DIR,
+            env=env
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pages_are_not_modified_only_with_a_shared_version(self):
+        self.client.force_login(self.user)
+        self.add_expenses(3)
+        url = reverse('expense_tracking:expense-list')
+        local = {
+            **settings.CACHES,
+            'reports': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'local-reports',
+            },
+        }
+        with override_settings(CACHES=local):
+            etag = self.client.get(url)['ETag']
+            # Written without bumping this process's version, as another
+            # process would
+            Expense.objects.filter(name='Expense 0').update(name='Changed')
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Changed')
+
+    def test_pages_are_compressed(self):
+        self.client.force_login(self.user)
+        self.add_expenses(20)
+        url = reverse('expense_tracking:expenses')
+        plain = self.client.get(url, HTTP_ACCEPT_ENCODING='identity')
+        gzipped = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertLess(len(gzipped.content), len(plain.content) / 4)
+        self.assertIn('Accept-Encoding', gzipped['Vary'])
+
+    def test_keyset_pages_cover_all_expenses(self):
+        # Paging forward and then back visits every expense once, in order
+        self.add_expenses(23)
+        # Several expenses on the same date are ordered by id
+        self.add_expenses(4)
+        expected = list(Expense.objects.order_by(
+            '-expense_date', '-id'
+        ).values_list('id', flat=True))
+
+        pages = [KeysetPage(Expense.objects.all(), per_page=10)]
+        while pages[-1].has_next():
+            pages.append(KeysetPage(
+                Expense.objects.all(),
+                after=pages[-1].next_cursor(),
+                per_page=10
+            ))
+        self.assertEqual(
+            [expense.id for page in pages for expense in page], expected
+        )
+        self.assertFalse(pages[0].has_previous())
+
+        page = pages[-1]
+        backwards = [expense.id for expense in page]
+        while page.has_previous():
+            page = KeysetPage(
+                Expense.objects.all(),
+                before=page.previous_cursor(),
+                per_page=10
+            )
+            backwards = [expense.id for expense in page] + backwards
+        self.assertEqual(backwards, expected)
+
+    def test_table_data_sorts_searches_and_pages(self):
+        self.client.force_login(self.user)
+        self.add_expenses(30)
+
+        response = self.client.get(
+            reverse('expense_tracking:expense_table_data'),
+            {
+                'draw': '4',
+                'start': '2',
+                'length': '3',
+                'order[0][column]': '1',
+                'order[0][dir]': 'asc',
+                'search[value]': 'expense 1',
+                'type': str(self.expense_types[1].id),
+            }
+        )
+
+        data = response.json()
+        self.assertEqual(data['draw'], 4)
+        self.assertEqual(data['recordsTotal'], 10)
+        # Expense 1, 10, 13, 16 and 19 have type Rent
+        self.assertEqual(data['recordsFiltered'], 5)
+        self.assertEqual(
+            [row['name'] for row in data['data']],
+            ['Expense 13', 'Expense 16', 'Expense 19']
+        )
+
+    def test_table_data_matches_expense_types_without_a_join(self):
+        self.client.force_login(self.user)
+        self.add_expenses(30)
+        get_expense_types()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('expense_tracking:expense_table_data'),
+                {'length': '50', 'search[value]': 'TRAV'}
+            )
+        data = response.json()
+        self.assertEqual(data['recordsFiltered'], 10)
+        self.assertEqual(
+            {row['expense_type'] for row in data['data']}, {'Travel'}
+        )
+        counts = [
+            query['sql'] for query in queries.captured_queries
+            if 'COUNT(' in query['sql']
+        ]
+        self.assertTrue(counts)
+        self.assertFalse([sql for sql in counts if 'expensetype' in sql])
+
+    def test_table_data_pages_by_cursor(self):
+        self.client.force_login(self.user)
+        self.add_expenses(12)
+        # Several expenses on the same date are ordered by id
+        self.add_expenses(5)
+        cache.clear()
+        url = reverse('expense_tracking:expense_table_data')
+        expected = list(Expense.objects.order_by(
+            '-expense_date', '-id'
+        ).values_list('name', flat=True))
+
+        def page(start, **params):
+            return [
+                row['name'] for row in self.client.get(url, {
+                    'start': str(start), 'length': '4', **params
+                }).json()['data']
+            ]
+
+        # Only indexed columns sort; sorting by name keeps the default order
+        self.assertEqual(page(0, **{'order[0][column]': '3'}), expected[:4])
+
+        # Pages after the first seek past the cursor the previous page left
+        pages = [page(start) for start in range(0, 20, 4)]
+        self.assertEqual(sum(pages, []), expected)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(page(8), expected[8:12])
+        self.assertNotIn('OFFSET', queries.captured_queries[-1]['sql'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SearchTests(TestCase):
+    # Tests for the expense search
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('search', password='password')
+        food = ExpenseType.objects.create(name='Food')
+        for expense_date, name, org, notes in [
+            (datetime.date(2024, 1, 1), 'Lunch', 'Corner Cafe', ''),
+            (datetime.date(2024, 1, 2), 'Coffee', 'Diner', 'cafe latte'),
+            (datetime.date(2024, 1, 3), 'Groceries', 'Market', ''),
+        ]:
+            Expense.objects.create(
+                expense_date=expense_date,
+                expense_type=food,
+                name=name,
+                org=org,
+                amount=Decimal('5.00'),
+                notes=notes
+            )
+
+    def test_search_matches_name_org_and_notes(self):
+        self.assertEqual(
+            [e.name for e in search_expenses(Expense.objects.all(), 'CAFE')],
+            ['Coffee', 'Lunch']
+        )
+        self.assertEqual(
+            [e.name for e in search_expenses(Expense.objects.all(), 'groc')],
+            ['Groceries']
+        )
+        self.assertFalse(search_expenses(Expense.objects.all(), '  '))
+
+    def test_search_page(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('expense_tracking:search_expenses'), {'q': 'market'}
+        )
+        self.assertEqual(
+            [e.name for e in response.context['my_expenses']], ['Groceries']
+        )
+        self.assertContains(response, '1 expense found')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ExpenseApiTests(TestCase):
+    # Tests for the expense API
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='pw')
+        cls.food = ExpenseType.objects.create(name='Food')
+        cls.rent = ExpenseType.objects.create(name='Rent')
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_login(self.user)
+
+    def test_bulk_create_update_and_filtered_list(self):
+        url = reverse('expense_tracking:expense-bulk')
+        response = self.client.post(url, [
+            {
+                'expense_date': '2024-01-02',
+                'expense_type': self.food.id,
+                'name': 'Lunch',
+                'org': 'Cafe',
+                'amount': '12.50'
+            },
+            {
+                'expense_date': '2024-02-01',
+                'expense_type': self.rent.id,
+                'name': 'Rent',
+                'org': 'Landlord',
+                'amount': '1000.00',
+                'notes': 'February'
+            },
+        ], content_type='application/json')
+        self.assertEqual(response.json()['created'], 2)
+        lunch_id = response.json()['ids'][0]
+
+        response = self.client.post(url, [
+            {
+                'id': lunch_id,
+                'expense_date': '2024-01-03',
+                'expense_type': self.food.id,
+                'name': 'Lunch',
+                'org': 'Cafe',
+                'amount': '13.00'
+            },
+        ], content_type='application/json')
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(verify_rollups(), [])
+
+        response = self.client.get(
+            reverse('expense_tracking:expense-list'),
+            {'start_date': '2024-01-01', 'end_date': '2024-01-31'}
+        )
+        self.assertEqual(response.json()['results'], [{
+            'id': lunch_id,
+            'expense_date': '2024-01-03',
+            'expense_type': self.food.id,
+            'name': 'Lunch',
+            'org': 'Cafe',
+            'amount': '13.00',
+            'notes': '',
+            'inserted_date': response.json()['results'][0]['inserted_date'],
+        }])
+
+    def test_bulk_rejects_unknown_expense_types(self):
+        response = self.client.post(
+            reverse('expense_tracking:expense-bulk'),
+            [{
+                'expense_date': '2024-01-02',
+                'expense_type': 0,
+                'name': 'Lunch',
+                'org': 'Cafe',
+                'amount': '12.50'
+            }],
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_totals_use_etags(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(
+                expense_date=datetime.date(2024, 1, 2),
+                expense_type=self.food,
+                name='Lunch',
+                org='Cafe',
+                amount=Decimal('12.50')
+            )
+        url = reverse('expense_tracking:expense_totals')
+        params = {
+            'start_date': '2024-01-01',
+            'end_date': '2024-01-31',
+            'group_by': 'type,month'
+        }
+
+        response = self.client.get(url, params)
+        self.assertEqual(response.json()['rows'], [
+            ['2024-01-01', 'Food', '12.50', 1]
+        ])
+        response = self.client.get(
+            url, params, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_report_ranges_are_limited(self):
+        # A report reads a version per month, so ranges over 25 years are
+        # rejected before any is read
+        url = reverse('expense_tracking:expense_totals')
+        with mock.patch(
+            'expense_tracking.views.month_versions'
+        ) as month_versions:
+            response = self.client.get(
+                url, {'start_date': '1800-01-01', 'end_date': '2199-12-31'}
+            )
+        self.assertEqual(response.status_code, 400)
+        month_versions.assert_not_called()
+        response = self.client.get(
+            url, {'start_date': '2000-01-01', 'end_date': '2025-01-31'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(
+            reverse('expense_tracking:get_data'),
+            {'start_date': '1800-01-01', 'end_date': '2199-12-31'}
+        )
+        self.assertContains(
+            response, 'Reports cover at most 25 years.', status_code=400
+        )
+        self.assertFalse(Job.objects.exists())
+
+    def test_list_uses_etags(self):
+        url = reverse('expense_tracking:expense-list')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(
+                expense_date=datetime.date(2024, 1, 2),
+                expense_type=self.food,
+                name='Lunch',
+                org='Cafe',
+                amount=Decimal('12.50')
+            )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReportCacheTests(TestCase):
+    # Tests for the report result cache
+
+    def setUp(self):
+        get_cache().clear()
+        self.food = ExpenseType.objects.create(name='Food')
+        self.builds = 0
+
+    def report(self):
+        def build():
+            self.builds += 1
+            return expense_totals_by_type(
+                datetime.date(2024, 1, 1), datetime.date(2024, 1, 31)
+            )
+        return cached_report(
+            'test', datetime.date(2024, 1, 1), datetime.date(2024, 1, 31),
+            build
+        )
+
+    def add_expense(self, expense_date):
+        return Expense.objects.create(
+            expense_date=expense_date,
+            expense_type=self.food,
+            name='Lunch',
+            org='Cafe',
+            amount=Decimal('10.00')
+        )
+
+    def test_versions_expire_in_a_cache_local_to_the_process(self):
+        local = {
+            'default': settings.CACHES['default'],
+            'reports': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'local-reports',
+            },
+        }
+        with override_settings(CACHES=local, DEBUG=False):
+            self.assertFalse(shared_cache())
+            self.assertEqual(version_timeout(), LOCAL_VERSION_MAX_AGE)
+            self.assertEqual(
+                [error.id for error in check_report_cache(None)],
+                ['expense_tracking.W001']
+            )
+
+        with tempfile.TemporaryDirectory() as location:
+            files = {
+                'default': settings.CACHES['default'],
+                'reports': {
+                    'BACKEND': 'django.core.cache.backends.filebased.'
+                               'FileBasedCache',
+                    'LOCATION': location,
+                },
+            }
+            with override_settings(CACHES=files, DEBUG=False):
+                self.assertTrue(shared_cache())
+                self.assertIsNone(version_timeout())
+                self.assertEqual(check_report_cache(None), [])
+
+    def test_versions_are_replaced_rather_than_incremented(self):
+        # Two processes incrementing a file cache version at once could
+        # both write the same value, so every bump writes a new version
+        start, end = datetime.date(2024, 1, 1), datetime.date(2024, 2, 29)
+        versions = month_versions(start, end) + [data_version()]
+        with mock.patch.object(
+            get_cache(), 'incr', side_effect=AssertionError
+        ):
+            invalidate_months(start, end)
+            invalidate_data()
+        bumped = month_versions(start, end) + [data_version()]
+        self.assertFalse(set(versions) & set(bumped))
+        self.assertEqual(len(set(bumped)), 3)
+
+    def test_reports_are_invalidated_by_changes_in_their_range(self):
+        self.report()
+        self.report()
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(report_cache_stats(), {'hits': 1, 'misses': 1})
+
+        # Reports are invalidated when the change is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            # A change outside the range keeps the cached report
+            self.add_expense(datetime.date(2024, 2, 1))
+        self.report()
+        self.assertEqual(self.builds, 1)
+
+        # Adding, editing and deleting an expense in the range rebuild it
+        with self.captureOnCommitCallbacks(execute=True):
+            expense = self.add_expense(datetime.date(2024, 1, 15))
+        self.assertEqual(self.report()[0]['amount'], Decimal('10.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.amount = Decimal('12.00')
+            expense.save()
+        self.assertEqual(self.report()[0]['amount'], Decimal('12.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.delete()
+        self.assertEqual(self.report(), [])
+        self.assertEqual(self.builds, 4)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BudgetTests(TestCase):
+    # Tests for the monthly budget page
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('budget', password='password')
+        food = ExpenseType.objects.create(name='Food')
+        rent = ExpenseType.objects.create(name='Rent')
+        ExpenseType.objects.create(name='Travel')
+        Budget.objects.create(
+            expense_type=food,
+            month=datetime.date(2024, 1, 15),
+            amount=Decimal('100.00')
+        )
+        Budget.objects.create(
+            expense_type=food,
+            month=datetime.date(2024, 2, 1),
+            amount=Decimal('50.00')
+        )
+        with cls.captureOnCommitCallbacks(execute=True):
+            for expense_date, expense_type, amount in [
+                (datetime.date(2024, 1, 3), food, '30.00'),
+                (datetime.date(2024, 1, 20), food, '12.50'),
+                (datetime.date(2024, 1, 1), rent, '1000.00'),
+                (datetime.date(2024, 2, 1), rent, '900.00'),
+            ]:
+                Expense.objects.create(
+                    expense_date=expense_date,
+                    expense_type=expense_type,
+                    name='Expense',
+                    org='Org',
+                    amount=Decimal(amount)
+                )
+
+    def test_budget_vs_actual_in_one_query(self):
+        with self.assertNumQueries(1):
+            budgets = budget_vs_actual(datetime.date(2024, 1, 1))
+        self.assertEqual(budgets, [
+            {
+                'expense_type': 'Food',
+                'budget': Decimal('100.00'),
+                'expense': Decimal('42.50'),
+                'remaining': Decimal('57.50'),
+            },
+            {
+                'expense_type': 'Rent',
+                'budget': 0,
+                'expense': Decimal('1000.00'),
+                'remaining': Decimal('-1000.00'),
+            },
+        ])
+        self.assertEqual(budget_vs_actual(datetime.date(2024, 3, 1)), [])
+
+    def test_budget_page_draws_charts_from_one_payload(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('expense_tracking:budget'), {'month': '2024-02'}
+        )
+        self.assertEqual(response.status_code, 200)
+        charts = response.context['charts']
+        self.assertEqual(
+            [chart['category'] for chart in charts['charts']],
+            ['Food', 'Rent']
+        )
+        self.assertEqual(charts['charts'][0]['budget'], 50.0)
+        self.assertContains(response, 'id="budget-charts"')
+        self.assertContains(response, 'budget-chart-1')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TrendTests(TestCase):
+    # Tests for the trends report
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('trends', password='password')
+        food = ExpenseType.objects.create(name='Food')
+        rent = ExpenseType.objects.create(name='Rent')
+        expenses = [
+            (datetime.date(year, month, 1), food, '100.00')
+            for year in (2023, 2024) for month in range(1, 13)
+        ]
+        expenses += [
+            (datetime.date(2023, 1, 1), rent, '1000.00'),
+            (datetime.date(2024, 1, 1), rent, '1500.00'),
+        ]
+        with cls.captureOnCommitCallbacks(execute=True):
+            for expense_date, expense_type, amount in expenses:
+                Expense.objects.create(
+                    expense_date=expense_date,
+                    expense_type=expense_type,
+                    name='Expense',
+                    org='Org',
+                    amount=Decimal(amount)
+                )
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_login(self.user)
+
+    def trends(self, **params):
+        response = self.client.get(reverse('expense_tracking:trends'), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_monthly_trends_with_rolling_average_and_change(self):
+        trend = self.trends(
+            start_date='2024-01-01', end_date='2024-12-31', window=3
+        ).context['trend']
+        self.assertEqual(len(trend['periods']), 12)
+        self.assertEqual(trend['periods'][0], '2024-01-01')
+        series = {series['name']: series for series in trend['series']}
+        self.assertEqual(list(series), ['Food', 'Rent', 'All types'])
+
+        self.assertEqual(series['Food']['total'], [100.0] * 12)
+        # The rolling averages and changes of the first months use the
+        # totals of the year before
+        self.assertEqual(series['Food']['rolling'], [100.0] * 12)
+        self.assertEqual(series['Food']['change'], [0.0] * 12)
+        self.assertEqual(series['Rent']['total'][:2], [1500.0, 0.0])
+        self.assertEqual(series['Rent']['rolling'][:4], [500.0] * 3 + [0.0])
+        self.assertEqual(series['Rent']['change'][:2], [50.0, None])
+        self.assertEqual(series['All types']['total'][0], 1600.0)
+
+        latest = trend['latest'][-1]
+        self.assertEqual(latest['expense_type'], 'All types')
+        self.assertEqual(latest['total'], 100.0)
+
+    def test_weekly_trends_are_downsampled(self):
+        with mock.patch('expense_tracking.charts.MAX_TREND_POINTS', 10):
+            trend = self.trends(
+                start_date='2024-01-01', end_date='2024-12-31', period='week'
+            ).context['trend']
+        # 53 weeks averaged 6 at a time
+        self.assertEqual(trend['step'], 6)
+        self.assertEqual(len(trend['periods']), 9)
+        food = trend['series'][0]
+        self.assertEqual(len(food['total']), 9)
+        self.assertAlmostEqual(sum(food['total']) * 6, 1200.0, delta=100)
+
+    def test_rolling_window_is_at_most_a_year(self):
+        response = self.trends(period='month', window=13)
+        self.assertNotIn('trend', response.context)
+        self.assertTrue(response.context['form'].errors)
+
+    def test_no_expenses_in_range(self):
+        response = self.trends(start_date='2020-01-01', end_date='2020-12-31')
+        self.assertFalse(response.context['trend'])
+        self.assertContains(response, 'No records found')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class JobTests(TestCase):
+    # Tests for background jobs
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        get_cache().clear()
+        self.user = User.objects.create_user('jobs', password='password')
+        self.client.force_login(self.user)
+        self.food = ExpenseType.objects.create(name='Food')
+        with self.captureOnCommitCallbacks(execute=True):
+            for day in (1, 2):
+                Expense.objects.create(
+                    expense_date=datetime.date(2023, 1, day),
+                    expense_type=self.food,
+                    name='Lunch',
+                    org='Cafe',
+                    amount=Decimal('10.00')
+                )
+
+    def run_jobs(self):
+        ran = []
+        while (job := run_next_job('test')) is not None:
+            ran.append(job)
+        return ran
+
+    def download(self, job):
+        response = self.client.get(
+            reverse('expense_tracking:job_download', args=[job.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_export_job(self):
+        response = self.client.post(
+            reverse('expense_tracking:export_job'),
+            {'format': 'csv', 'expense_type': self.food.pk}
+        )
+        job = Job.objects.get()
+        self.assertRedirects(
+            response, reverse('expense_tracking:job', args=[job.pk])
+        )
+        self.assertEqual(job.status, Job.QUEUED)
+
+        self.assertEqual(self.run_jobs(), [job])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.message, 'Exported 2 expenses.')
+        rows = list(csv.reader(StringIO(self.download(job).decode())))
+        self.assertEqual(len(rows), 3)
+
+        status = self.client.get(
+            reverse('expense_tracking:job_status', args=[job.pk])
+        ).json()
+        self.assertEqual(status['status'], Job.SUCCEEDED)
+        self.assertTrue(status['finished'])
+
+    def test_long_report_runs_as_a_job(self):
+        response = self.client.post(
+            reverse('expense_tracking:get_data'),
+            {'start_date': '2022-01-01', 'end_date': '2023-12-31'}
+        )
+        job = Job.objects.get()
+        self.assertRedirects(
+            response, reverse('expense_tracking:job', args=[job.pk])
+        )
+        self.assertEqual(job.params['end_date'], '2023-12-31')
+
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertIn(b'Food', self.download(job))
+
+    def test_import_job_keeps_rejected_rows(self):
+        upload = SimpleUploadedFile(
+            'expenses.csv',
+            b'expense_date,expense_type,name,org,amount,notes\n'
+            b'2023-02-01,Food,Dinner,Diner,12.50,\n'
+            b'2023-02-02,Travel,Train,Rail,30.00,\n'
+        )
+        self.client.post(
+            reverse('expense_tracking:import_expenses'), {'file': upload}
+        )
+        job = Job.objects.get()
+        self.assertEqual(job.max_attempts, 1)
+
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(
+            job.message, 'Imported 1 expenses. Rejected 1 rows.'
+        )
+        self.assertTrue(Expense.objects.filter(name='Dinner').exists())
+        self.assertIn(b'Unknown type ""Travel""', self.download(job))
+
+    @override_settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_DELAY=30)
+    def test_failed_jobs_are_retried_then_fail(self):
+        job = enqueue(Job.EXPORT, {'format': 'csv'}, user=self.user)
+        with mock.patch(
+            'expense_tracking.jobs.stream_export',
+            side_effect=RuntimeError('disk full')
+        ):
+            self.run_jobs()
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.QUEUED)
+            self.assertEqual(job.attempts, 1)
+            self.assertEqual(job.message, 'RuntimeError: disk full')
+            self.assertGreater(job.run_after, timezone.now())
+
+            # Not due until the retry delay has passed
+            self.assertEqual(self.run_jobs(), [])
+            Job.objects.update(run_after=timezone.now())
+            self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_stale_jobs_are_requeued(self):
+        job = enqueue(Job.EXPORT, {'format': 'csv'}, user=self.user)
+        Job.objects.update(
+            status=Job.RUNNING,
+            attempts=1,
+            started_date=timezone.now() - datetime.timedelta(hours=2)
+        )
+        self.assertEqual(requeue_stale_jobs(timeout=60), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+
+    def test_jobs_of_other_users_are_hidden(self):
+        other = User.objects.create_user('other', password='password')
+        job = enqueue(Job.EXPORT, {'format': 'csv'}, user=other)
+        response = self.client.get(
+            reverse('expense_tracking:job', args=[job.pk])
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MetricsTests(TestCase):
+    # Tests for the performance middleware and metrics endpoint
+
+    def setUp(self):
+        metrics.reset()
+        self.user = User.objects.create_user('metrics', password='password')
+        ExpenseType.objects.create(name='Food')
+
+    def test_requests_are_measured_per_view(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('expense_tracking:expenses'))
+        # Served by the ASGI handler, which logs from a thread
+        self.async_client.force_login(self.user)
+        with self.assertLogs('expense_tracking.performance') as logs:
+            async_to_sync(self.async_client.get)(
+                reverse('expense_tracking:expenses')
+            )
+        self.assertIn('view=expense_tracking:expenses', logs.output[0])
+
+        self.user.is_staff = True
+        self.user.save()
+        text = self.client.get(reverse('expense_tracking:metrics')).content
+        samples = dict(
+            line.rsplit(' ', 1)
+            for line in text.decode().splitlines()
+            if line and not line.startswith('#')
+        )
+        view = '{view="expense_tracking:expenses"}'
+        self.assertEqual(samples['expense_tracking_requests_total' + view], '2')
+        self.assertGreater(
+            int(samples['expense_tracking_db_queries_total' + view]), 0
+        )
+        self.assertGreater(float(
+            samples['expense_tracking_template_duration_seconds_total' + view]
+        ), 0)
+        self.assertGreater(
+            int(samples['expense_tracking_response_bytes_total' + view]), 0
+        )
+        self.assertIn('expense_tracking_report_cache_hits_total', samples)
+
+    def test_metrics_are_not_public(self):
+        url = reverse('expense_tracking:metrics')
+        # Requests through a local proxy come from 127.0.0.1
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        with override_settings(METRICS_TOKEN='secret'):
+            response = self.client.get(
+                url, HTTP_AUTHORIZATION='Bearer wrong'
+            )
+            self.assertEqual(response.status_code, 403)
+            response = self.client.get(
+                url, HTTP_AUTHORIZATION='Bearer secret'
+            )
+            self.assertEqual(response.status_code, 200)
+
+        with override_settings(METRICS_ALLOWED_IPS=['192.0.2.1']):
+            response = self.client.get(url, REMOTE_ADDR='192.0.2.1')
+            self.assertEqual(response.status_code, 200)
+
+        # Only staff users can read them when logged in
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class StartupTests(SimpleTestCase):
+    # Tests for what loading the application imports
+
+    def test_charting_libraries_are_not_imported_at_startup(self):
+        # Load the apps and URLs in a fresh interpreter (this test process
+        # may already have imported pandas) and list the heavy modules loaded
+        code = (
+            'import sys, django; django.setup(); '
+            'from django.urls import get_resolver; '
+            'get_resolver().url_patterns; '
+            'print(sorted({"pandas", "plotly", "numpy", "pandasql", '
+            '"pretty_html_table"} & set(sys.modules)))'
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        output = subprocess.run(
+            [sys.executable, '-c', code],
+            capture_output=True,
+            check=True,
+            cwd=settings.BASE_DIR,
+            env=env,
+            text=True
+        ).stdout
+        self.assertEqual(output.strip(), '[]')
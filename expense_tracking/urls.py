@@ -11,12 +11,51 @@ from django.contrib.auth.views import (
 
 router = routers.DefaultRouter()
 router.register('expense_types', views.ExpenseTypeView)
+router.register('expenses', views.ExpenseView)
 
 app_name = "expense_tracking"
 
 urlpatterns = [
     path('', views.index, name="index"),
     path('expenses', views.expenses, name="expenses"),
+    path(
+        'expenses/browse/',
+        views.browse_expenses,
+        name="browse_expenses"
+    ),
+    path(
+        'expenses/search/',
+        views.search,
+        name="search_expenses"
+    ),
+    path(
+        'expenses/table-data/',
+        views.expense_table_data,
+        name="expense_table_data"
+    ),
+    path(
+        'expenses/export/',
+        views.export_expenses,
+        name="export_expenses"
+    ),
+    path(
+        'expenses/export/job/',
+        views.export_job,
+        name="export_job"
+    ),
+    path(
+        'expenses/import/',
+        views.import_expenses,
+        name="import_expenses"
+    ),
+    path('jobs/', views.jobs, name="jobs"),
+    path('jobs/<int:id>/', views.job, name="job"),
+    path('jobs/<int:id>/status/', views.job_status, name="job_status"),
+    path(
+        'jobs/<int:id>/download/',
+        views.job_download,
+        name="job_download"
+    ),
     path('add/', views.add_expense, name="add_expense"),
     path('edit/<int:id>', views.edit_expense, name="edit_expense"),
     path("filter/<int:id>/", views.filter, name='filter'),
@@ -30,13 +69,34 @@ urlpatterns = [
         views.results,
         name='results'
     ),
+    path(
+        "trends/",
+        views.trends,
+        name='trends'
+    ),
+    path(
+        "budget/",
+        views.budget,
+        name='budget'
+    ),
     path(
         "delete_expense/<int:id>",
         views.delete_expense,
         name='delete_expense'
     ),
+    path("metrics", views.metrics, name="metrics"),
     path("login/", views.login_request, name="login_request"),
     path("accounts/logout/", LogoutView.as_view(), name="logout"),
+    path(
+        'api/v1/totals/',
+        views.ExpenseTotalsView.as_view(),
+        name='expense_totals'
+    ),
+    path(
+        'api/v1/report-cache/',
+        views.ReportCacheStatsView.as_view(),
+        name='report_cache_stats'
+    ),
     path('api/v1/', include(router.urls)),
     path(
         "accounts/password-reset/",
@@ -1,38 +1,96 @@
-from locale import currency
-import pandas as pd
-import pandasql as ps
-import numpy as np
-import plotly.graph_objs as go
+import asyncio
+import hmac
 import logging
-
-
-from django.shortcuts import render, redirect
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.shortcuts import get_object_or_404, render, redirect
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse
+)
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 from django.contrib.auth.models import User
-from .models import Expense, ExpenseType
+from .models import Expense, ExpenseType, Job
+from .reports import (
+    abudget_vs_actual,
+    aexpense_totals,
+    aexpense_totals_by_type,
+    alatest_inserted_date,
+    budget_charts,
+    expense_totals,
+    trend_range
+)
 from .forms import (
     ExpenseForm,
     AuthenticationFormWithCaptchaField,
-    DateRangeForm
+    BudgetMonthForm,
+    DateRangeForm,
+    ExpenseFilterForm,
+    ExpenseImportForm,
+    ExpenseTotalsForm,
+    TrendForm
 )
 from django.contrib.auth import (
     login, logout, authenticate)
 from django.contrib import messages
 from .signals import log_user_logout
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from rest_framework import viewsets
-from .serializers import ExpenseTypeSerializer
-from pretty_html_table import build_table
+from .pagination import ExpenseCursorPagination, KeysetPage, acached_count
+from .datatables import table_data
+from .expense_types import get_expense_types
+from .conditional import conditional_page, not_modified, page_etag, set_etag
+from .export import (
+    FORMATS,
+    astream_export,
+    available_formats,
+    stream_export
+)
+from .fragments import afragment_cached, expense_table_key
+from .jobs import enqueue
+from .metrics import prometheus_text
+from .search import SEARCH_LIMIT, search_expenses
+from django.db import transaction
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .serializers import (
+    ExpenseBulkSerializer,
+    ExpenseSerializer,
+    ExpenseTypeSerializer
+)
+from .rollups import refresh_expense_rollups
+from .report_cache import (
+    acached_report,
+    adata_version,
+    cached_report,
+    data_version,
+    month_versions,
+    report_cache_stats
+)
 from django.utils import timezone
-from plotly.offline import plot
 
 
-# Set float values to 2 decimal places
-pd.options.display.float_format = '{:,.2f}'.format
-pd.set_option('future.no_silent_downcasting', True)
-
 logger = logging.getLogger(__name__)
 
+# Bounded pool the async report views draw charts in, so pandas and plotly
+# run off the event loop and at most CHART_WORKERS charts are drawn at once
+chart_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'CHART_WORKERS', 2),
+    thread_name_prefix='charts'
+)
+
 class ExpenseTypeView(viewsets.ModelViewSet):
     # Class for expense type view set
 
@@ -43,48 +101,279 @@ class ExpenseTypeView(viewsets.ModelViewSet):
     serializer_class = ExpenseTypeSerializer
 
 
-def get_chart(category, title):
+class ExpenseView(viewsets.ModelViewSet):
+    # Class for expense view set.  Lists are filtered by the start_date,
+    # end_date and expense_type query parameters and paged with cursors.
+
+    queryset = Expense.objects.order_by('-expense_date', '-id')
+    serializer_class = ExpenseSerializer
+    pagination_class = ExpenseCursorPagination
+    permission_classes = [IsAuthenticated]
+
+    # Largest number of rows accepted by one bulk request
+    max_bulk_rows = 10000
+
+    # Fields of the list rows
+    list_fields = (
+        'id',
+        'expense_date',
+        'expense_type_id',
+        'name',
+        'org',
+        'amount',
+        'notes',
+        'inserted_date'
+    )
+
+    def get_queryset(self):
+        expenses = super().get_queryset()
+        if self.action != 'list':
+            return expenses
+
+        form = ExpenseFilterForm(self.request.query_params)
+        if not form.is_valid():
+            raise ValidationError(form.errors)
+        return form.filter(expenses)
+
+    def list(self, request, *args, **kwargs):
+        # List rows are read as dicts and written directly, rather than
+        # building a model instance and running every serializer field for
+        # each row.  Pages carry an ETag from the expense data version, so
+        # a client asking again for an unchanged page gets an empty 304
+        # response without a query.
+
+        etag = page_etag(
+            request, data_version(), request.user.pk, request.get_full_path()
+        )
+        response = not_modified(request, etag)
+        if response is not None:
+            return set_etag(response, etag)
+
+        expenses = self.get_queryset().values(*self.list_fields)
+        page = self.paginate_queryset(expenses)
+        response = self.get_paginated_response([
+            {
+                'id': row['id'],
+                'expense_date': row['expense_date'],
+                'expense_type': row['expense_type_id'],
+                'name': row['name'],
+                'org': row['org'],
+                'amount': str(row['amount']),
+                'notes': row['notes'],
+                'inserted_date': row['inserted_date'],
+            }
+            for row in page
+        ])
+        return set_etag(response, etag)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        # Function creates (rows without an id) and updates (rows with an id)
+        # a list of expenses in one transaction
+
+        if not isinstance(request.data, list):
+            raise ValidationError('Expected a list of expenses.')
+        if len(request.data) > self.max_bulk_rows:
+            raise ValidationError(
+                f'At most {self.max_bulk_rows} expenses can be sent at once.'
+            )
+
+        serializer = ExpenseBulkSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        rows = serializer.validated_data
 
-    df = category
-    trace1 = go.Bar(
-                x=df['Category'],
-                y=df['Budget Amount'],
-                name='Budget',
-                hovertemplate='%{y}',  # Display only the value on hover
-                #text=[f'{cat}: {val}' for cat, val in zip(budget['Category'], budget['Total Monthly Balance'])],
-                textposition='auto',
-                showlegend=True
+        # Check expense types against the cached expense types and load the
+        # expenses to update in one query
+        expense_type_ids = get_expense_types().by_id
+        existing = Expense.objects.in_bulk(
+            [row['id'] for row in rows if 'id' in row]
+        )
+        errors = []
+        for row in rows:
+            row_errors = {}
+            if row['expense_type'] not in expense_type_ids:
+                row_errors['expense_type'] = ['Unknown expense type.']
+            if 'id' in row and row['id'] not in existing:
+                row_errors['id'] = ['Unknown expense.']
+            errors.append(row_errors)
+        if any(errors):
+            raise ValidationError(errors)
+
+        fields = ['expense_date', 'name', 'org', 'amount', 'notes']
+        changed = []
+        to_create = []
+        to_update = []
+        for row in rows:
+            if 'id' in row:
+                expense = existing[row['id']]
+                changed.append((expense.expense_date, expense.expense_type_id))
+                to_update.append(expense)
+            else:
+                expense = Expense()
+                to_create.append(expense)
+            for field in fields:
+                setattr(expense, field, row[field])
+            expense.expense_type_id = row['expense_type']
+            changed.append((expense.expense_date, expense.expense_type_id))
+
+        with transaction.atomic():
+            Expense.objects.bulk_create(to_create, batch_size=1000)
+            Expense.objects.bulk_update(
+                to_update, fields + ['expense_type'], batch_size=1000
             )
+            refresh_expense_rollups(*changed)
+
+        return Response(
+            {
+                'created': len(to_create),
+                'updated': len(to_update),
+                'ids': [expense.id for expense in to_create + to_update],
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class ExpenseTotalsView(APIView):
+    # Class for the expense totals API.  Returns the totals between the
+    # start_date and end_date query parameters grouped by expense type and/or
+    # period, as compact rows.  Responses carry an ETag from the versions of
+    # the range's months, so clients polling for unchanged totals get an
+    # empty 304 response without the totals being read.
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        form = ExpenseTotalsForm(request.query_params)
+        if not form.is_valid():
+            raise ValidationError(form.errors)
+
+        start = form.cleaned_data['start_date']
+        end = form.cleaned_data['end_date']
+        by_type, period = form.cleaned_data['group_by']
 
-    trace2 = go.Bar(
-        x=df['Category'],
-        y=df['Monthly Expense Amount'],
-        name='Expense',
-        hovertemplate='%{y}',  # Display only the value on hover
-        # text=[f'{cat}: {val}' for cat, val in zip(budget['Category'], budget['Monthly Expense Amount'])],
-        textposition='auto',
-        showlegend=True
+        etag = page_etag(
+            request, *month_versions(start, end), request.get_full_path()
+        )
+        response = not_modified(request, etag)
+        if response is not None:
+            return set_etag(response, etag, max_age=60)
+
+        totals = cached_report(
+            f'totals:{"type" if by_type else ""}:{period or ""}',
+            start,
+            end,
+            lambda: expense_totals(start, end, by_type, period)
+        )
+
+        columns = list(totals[0]) if totals else (
+            (['period'] if period else []) +
+            (['expense_type'] if by_type else []) +
+            ['total', 'count']
+        )
+        data = {
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat(),
+            'columns': columns,
+            'rows': [
+                [
+                    f'{value:.2f}' if column == 'total' else
+                    value.isoformat() if column == 'period' else value
+                    for column, value in total.items()
+                ]
+                for total in totals
+            ],
+        }
+
+        return set_etag(Response(data), etag, max_age=60)
+
+
+class ReportCacheStatsView(APIView):
+    # Class for the report cache hit and miss counters
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(report_cache_stats())
+
+
+def metrics_allowed(request):
+    # Function returns whether a request may read the metrics: from a staff
+    # user, with the METRICS_TOKEN bearer token or from an address in
+    # METRICS_ALLOWED_IPS
+
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(
+        authorization.encode(), f'Bearer {token}'.encode()
+    ):
+        return True
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', [])
+    return (
+        request.META.get('REMOTE_ADDR') in allowed or
+        request.user.is_staff
     )
 
-    layout = go.Layout(
-        title={
-            'text': f'<b>{title} Monthly Budget</b>',
-        },
-        title_x=.5,
-        xaxis={
-            'title': '<b>Category</b>'
-        },
-        yaxis={
-            'title': '<b>Amount (in dollars)</b>'
-        },
-        barmode='group',
-        height=500,  # Set the height of the chart in pixels
-        plot_bgcolor='rgba(0, 0, 0, 0)',
-        paper_bgcolor='rgba(0, 0, 0, 0)',
+
+def metrics(request):
+    # Function returns the request metrics of this process and the report
+    # cache counters in the Prometheus text format, to the requests allowed
+    # by metrics_allowed
+
+    if not metrics_allowed(request):
+        return HttpResponse(status=403)
+    return HttpResponse(
+        prometheus_text(), content_type='text/plain; version=0.0.4'
+    )
+
+
+async def expense_page_parts(request, *args, **kwargs):
+    # Function returns what a page of expenses or reports varies on: the
+    # expense data version, the url and today's date (report ranges default
+    # to ending today)
+
+    return [
+        await adata_version(),
+        request.get_full_path(),
+        timezone.now().date()
+    ]
+
+
+async def expense_table_context(expenses, expense_filter, page):
+    # Function returns the context of the expense table of a page.  The
+    # rendered table is cached per page until any expense or expense type is
+    # written, so the page and count queries only run when it is not cached.
+
+    table_key = expense_table_key(
+        await adata_version(), expense_filter, page
+    )
+    context = {'my_expenses': page, 'table_key': table_key}
+    if not await afragment_cached('expense_table', table_key):
+        await page.afetch()
+        context['expense_count'] = await acached_count(
+            expenses, expense_filter
+        )
+    return context
+
+
+def expense_table_rows(expenses):
+    # Function returns the expenses for the expense table, newest expense
+    # date (then id) first.  The expense type is joined in the same query and only the
+    # columns shown in the table are fetched.
+
+    return expenses.select_related(
+        'expense_type'
+    ).only(
+        'id',
+        'expense_date',
+        'expense_type__name',
+        'name',
+        'org',
+        'amount',
+        'notes'
+    ).order_by(
+        '-expense_date',
+        '-id'
     )
-    fig = go.Figure(data=[trace1, trace2], layout=layout)
-    plt_div = plot(fig, output_type='div')
-    return plt_div
 
 
 def index(request):
@@ -183,43 +472,41 @@ def password_reset_complete(request):
 
 
 @login_required()
-def expenses(request):
+@conditional_page(expense_page_parts)
+async def expenses(request):
     # Function requires user to be logged in and renders a table of expenses
     # showing the date, type organization, amount and notes (with edit and
-    # delete buttons)
+    # delete buttons).  The queries run on the async ORM; the template is
+    # rendered from the fetched rows in a thread.
 
     # Set up pagination
-    # Get 50 expenses per page, by expense date descending
-    p = Paginator(Expense.objects.order_by(
-        '-expense_date',
-        'expense_type__name',
-        'name',
-        'org'
-    ), 50)
-    page = request.GET.get('page')
-    my_expenses = p.get_page(page)
-
-    distinct_expense_types = ExpenseType.objects.all().order_by(
-            'name'
-            )
+    # Get 50 expenses per page, by expense date descending, starting after or
+    # before the cursor of the page the user navigated from
+    expenses = Expense.objects.all()
+    my_expenses = KeysetPage(
+        expense_table_rows(expenses),
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
+    context = await expense_table_context(expenses, 'all', my_expenses)
 
-    # Render expense table list 50 expense per page with page navigation at
-    # the bottom of the page
-    return render(request=request,
-                  template_name='expense_tracking/expense.html',
-                  context={
-                      'my_expenses': my_expenses,
-                      'distinct_expense_types': distinct_expense_types
-                  }
-                  )
+    # Render expense table list 50 expense per page with previous and next
+    # links at the bottom of the page
+    return await sync_to_async(render)(
+        request=request,
+        template_name='expense_tracking/expense.html',
+        context=context
+    )
 
 
 @login_required()
 def add_expense(request):
     # Function for adding an expense.  User must be logged in to access.
 
-    # Obtain expense records ordered by expense name
-    expense_types = ExpenseType.objects.order_by('name')
+    # Obtain expense types ordered by name, and their version, which the
+    # cached drop down values vary on
+    snapshot = get_expense_types()
+    expense_types = snapshot.ordered
 
     # When the form method is post
     if request.method == 'POST':
@@ -251,7 +538,8 @@ def add_expense(request):
                 template_name='expense_tracking/add_expense.html',
                 context={
                     'form': form,
-                    'expense_types': expense_types
+                    'expense_types': expense_types,
+                    'expense_types_version': snapshot.version
                 }
             )
 
@@ -266,7 +554,8 @@ def add_expense(request):
             template_name="expense_tracking/add_expense.html",
             context={
                 'form': form,
-                'expense_types': expense_types
+                'expense_types': expense_types,
+                'expense_types_version': snapshot.version
             }
         )
 
@@ -276,13 +565,17 @@ def edit_expense(request, id):
     # Function for adding an expense. User must be logged in to access.
 
     # Obtain expense record to edit by id
-    expense_to_edit = Expense.objects.get(id=id)
+    expense_to_edit = Expense.objects.select_related('expense_type').get(
+        id=id
+    )
 
     # Obtain list of expense types in order by name, except the selected value
     # by id from the form
-    expense_types = ExpenseType.objects.exclude(
-        id=expense_to_edit.expense_type.pk
-    ).order_by('name')
+    snapshot = get_expense_types()
+    expense_types = [
+        expense_type for expense_type in snapshot
+        if expense_type.pk != expense_to_edit.expense_type_id
+    ]
 
     # When the form method is post
     if request.method == 'POST':
@@ -316,6 +609,7 @@ def edit_expense(request, id):
             template_name='expense_tracking/edit_expense.html',
             context={
                 'expense_types': expense_types,
+                'expense_types_version': snapshot.version,
                 'expense_to_edit': expense_to_edit,
                 'form': form
             }
@@ -323,37 +617,253 @@ def edit_expense(request, id):
 
 
 @login_required
-def filter(request, id):
+@conditional_page(expense_page_parts)
+async def filter(request, id):
 
     # Function requires user to be logged in and renders a table of expenses
     # showing the date, type organization, amount and notes (with edit and
     # delete buttons)
 
     # Set up pagination
-    # Get 50 expenses per page, by expense date descending
-    p = Paginator(Expense.objects.filter(expense_type__id=id).order_by(
-        '-expense_date',
-        'expense_type__name',
-        'name',
-        'org'
-    ), 50)
-    page = request.GET.get('page')
-    my_expenses = p.get_page(page)
+    # Get 50 expenses per page, by expense date descending, starting after or
+    # before the cursor of the page the user navigated from
+    expenses = Expense.objects.filter(expense_type__id=id)
+    my_expenses = KeysetPage(
+        expense_table_rows(expenses),
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
+    context = await expense_table_context(expenses, f'type:{id}', my_expenses)
+    context['expense_type_id'] = id
+
+    # Render the expense table list with 50 expense per page with previous
+    # and next links at the bottom of the page
+    return await sync_to_async(render)(
+        request=request,
+        template_name='expense_tracking/expense.html',
+        context=context
+    )
 
-    distinct_expense_types = ExpenseType.objects.all().order_by('name')
 
-    # Render a dropdown list of expense types to filter by, the expense table
-    # list with 50 expense per page with page navigation at the bottom of the
-    # page
+@login_required()
+def browse_expenses(request):
+    # Function requires user to be logged in and renders the expense table
+    # with sorting, searching and paging done by the server
+
+    snapshot = get_expense_types()
+
     return render(request=request,
-                  template_name='expense_tracking/expense.html',
+                  template_name='expense_tracking/browse_expenses.html',
                   context={
+                      'distinct_expense_types': snapshot.ordered,
+                      'expense_types_version': snapshot.version
+                  }
+                  )
+
+
+@login_required()
+def search(request):
+    # Function requires user to be logged in and renders the expenses whose
+    # name, organization or notes match the search query
+
+    query = request.GET.get('q', '')
+    my_expenses = list(
+        search_expenses(expense_table_rows(Expense.objects.all()), query)
+    )
+
+    return render(request=request,
+                  template_name='expense_tracking/search_expenses.html',
+                  context={
+                      'query': query,
                       'my_expenses': my_expenses,
-                      'distinct_expense_types': distinct_expense_types
+                      'search_limit': SEARCH_LIMIT
                   }
                   )
 
 
+@login_required()
+def expense_table_data(request):
+    # Function requires user to be logged in and returns a page of expenses
+    # as JSON for the DataTables server-side processing protocol, optionally
+    # filtered by expense type
+
+    expenses = Expense.objects.all()
+    count_key = 'all'
+    expense_type = request.GET.get('type')
+    if expense_type and expense_type.isdigit():
+        expenses = expenses.filter(expense_type__id=expense_type)
+        count_key = f'type:{expense_type}'
+
+    return JsonResponse(table_data(request.GET, expenses, count_key))
+
+
+def export_request(data):
+    # Function returns the format and valid filter form of an export
+    # request, or the 400 response explaining why it is invalid
+
+    export_format = data.get('format', 'csv')
+    if export_format not in available_formats():
+        return None, None, JsonResponse(
+            {'format': [f'Choose one of {", ".join(available_formats())}.']},
+            status=400
+        )
+
+    form = ExpenseFilterForm(data)
+    if not form.is_valid():
+        return None, None, JsonResponse(form.errors, status=400)
+    return export_format, form, None
+
+
+@login_required()
+def export_expenses(request):
+    # Function requires user to be logged in and streams the expenses
+    # matching the date range and expense type filters as CSV, Parquet or
+    # XLSX.  Rows are written as they are read, so memory use does not
+    # depend on the number of expenses.  An ASGI server is given an async
+    # iterator, as it would read a synchronous one into memory first.
+
+    export_format, form, error = export_request(request.GET)
+    if error is not None:
+        return error
+
+    content_type, extension = FORMATS[export_format]
+    content = stream_export(
+        form.filter(Expense.objects.all()), export_format
+    )
+    if isinstance(request, ASGIRequest):
+        content = astream_export(content)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="expenses.{extension}"'
+    )
+    return response
+
+
+@login_required()
+@require_POST
+def export_job(request):
+    # Function requires user to be logged in and queues a background export
+    # of the expenses matching the filters, then shows the job
+
+    export_format, form, error = export_request(request.POST)
+    if error is not None:
+        return error
+
+    params = {
+        name: str(value)
+        for name, value in form.cleaned_data.items()
+        if value is not None
+    }
+    params['format'] = export_format
+    job = enqueue(Job.EXPORT, params, user=request.user)
+    messages.info(request, 'Your export is being prepared.')
+    return redirect('expense_tracking:job', id=job.pk)
+
+
+@login_required()
+def import_expenses(request):
+    # Function requires user to be logged in and queues a background import
+    # of an uploaded CSV file, then shows the job
+
+    if request.method == 'POST':
+        form = ExpenseImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            job = enqueue(
+                Job.IMPORT, user=request.user, upload=form.cleaned_data['file']
+            )
+            messages.info(request, 'Your file is being imported.')
+            return redirect('expense_tracking:job', id=job.pk)
+    else:
+        form = ExpenseImportForm()
+
+    return render(
+        request=request,
+        template_name='expense_tracking/import_expenses.html',
+        context={
+            'form': form
+        }
+    )
+
+
+def user_job(request, id):
+    # Function returns the job with id when it belongs to the user (staff
+    # users can see every job)
+
+    jobs = Job.objects.all()
+    if not request.user.is_staff:
+        jobs = jobs.filter(user=request.user)
+    return get_object_or_404(jobs, pk=id)
+
+
+def job_data(job):
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'finished': job.finished,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'message': job.message,
+        'download_url': (
+            reverse('expense_tracking:job_download', args=[job.pk])
+            if job.result else None
+        ),
+    }
+
+
+@login_required()
+def jobs(request):
+    # Function requires user to be logged in and renders the user's latest
+    # background jobs
+
+    return render(
+        request=request,
+        template_name='expense_tracking/jobs.html',
+        context={
+            'jobs': Job.objects.filter(
+                user=request.user
+            ).order_by('-created_date', '-id')[:50]
+        }
+    )
+
+
+@login_required()
+def job(request, id):
+    # Function requires user to be logged in and renders the status of a
+    # background job, which the page polls until the job finishes
+
+    return render(
+        request=request,
+        template_name='expense_tracking/job.html',
+        context={
+            'job': user_job(request, id)
+        }
+    )
+
+
+@login_required()
+def job_status(request, id):
+    # Function requires user to be logged in and returns the status of a
+    # background job as JSON
+
+    return JsonResponse(job_data(user_job(request, id)))
+
+
+@login_required()
+def job_download(request, id):
+    # Function requires user to be logged in and downloads the result file
+    # of a background job
+
+    job = user_job(request, id)
+    if not job.result:
+        raise Http404('The job has no result to download.')
+    return FileResponse(
+        job.result.open('rb'),
+        as_attachment=True,
+        filename=os.path.basename(job.result.name)
+    )
+
+
 @login_required()
 def delete_expense(request, id):
     # Function to delete an expense.  User must be logged in to access.
@@ -388,8 +898,25 @@ def logout_request(request):
     return redirect('catalog:index')
 
 
+def draw_report(start, end, totals):
+    # Function draws the table and chart of a date range report.  Charting
+    # libraries are imported on first use, so the rest of the application
+    # does not pay for loading them.
+
+    from .charts import draw_report
+    return draw_report(start, end, totals)
+
+
+def draw_trends(start, end, period, window, totals):
+    # Function computes the series of a trends report, importing the
+    # charting libraries on first use like draw_report
+
+    from .charts import draw_trends
+    return draw_trends(start, end, period, window, totals)
+
+
 @login_required()
-def get_data(request):
+async def get_data(request):
 
     # if this is a POST request we need to process the form data
     if request.method == 'POST':
@@ -401,12 +928,8 @@ def get_data(request):
             start = form.cleaned_data['start_date']
             end = form.cleaned_data['end_date']
 
-            # String format of dates for chart
-            start_str = start.strftime('%m-%d-%Y')
-            end_str = end.strftime('%m-%d-%Y')
-
-            if ((end - start).days < 0 or (end - start).days > 366):
-                return render(
+            if (end - start).days < 0:
+                return await sync_to_async(render)(
                     request=request,
                     template_name='expense_tracking/get_data.html',
                     context={
@@ -414,47 +937,43 @@ def get_data(request):
                     }
                 )
 
-            else:
-                # Create dataframe from all expense records for specified
-                # fields
-                df = pd.DataFrame(list(
-                    Expense.objects.all().values(
-                        'expense_date',
-                        'expense_type__name',
-                        'name',
-                        'org',
-                        'amount',
-                        'inserted_date'
-                    )
+            elif (end - start).days > 366:
+                # Reports over more than a year are built by a background
+                # job rather than in the request
+                job = await sync_to_async(enqueue)(
+                    Job.REPORT,
+                    {
+                        'start_date': start.isoformat(),
+                        'end_date': end.isoformat()
+                    },
+                    user=await request.auser()
                 )
+                messages.info(
+                    request,
+                    'Reports over more than a year are prepared in the '
+                    'background.'
                 )
+                return redirect('expense_tracking:job', id=job.pk)
 
+            else:
+                # Table and chart for the date range, from the report cache
+                # unless an expense in the range changed since it was built.
+                # The totals are read with the async ORM and the chart is
+                # drawn in the chart thread pool.
+                async def build_report():
+                    totals = await aexpense_totals_by_type(start, end)
+                    if not totals:
+                        return {}
+                    return await asyncio.get_running_loop().run_in_executor(
+                        chart_executor, draw_report, start, end, totals
+                    )
 
-                # Max date for df
-                max_date = df['inserted_date'].max()
-
-                # Convert amount column values to float
-                df['amount'] = pd.to_numeric(df['amount'], downcast='float')
-
-
-                # Select sub-dataframe for date range fromform
-                mask = (
-                    df['expense_date'] >= start
-                ) & (
-                    df['expense_date'] <= end
+                report = await acached_report(
+                    'get_data', start, end, build_report
                 )
 
-                # Query for df grouped by expense type with sum of amounts for
-                # between dates from form
-                filtered_df = df[mask]
-
-                # Using as_index=False set the index
-                grouped_df= filtered_df.groupby('expense_type__name', as_index=False)['amount'].sum()
-
-                grouped_df.columns = ['Expense Type', 'Amount']
-
-                if len(grouped_df.index) == 0:
-                    return render(
+                if not report:
+                    return await sync_to_async(render)(
                         request=request,
                         template_name='expense_tracking/results.html',
                         context={
@@ -464,27 +983,8 @@ def get_data(request):
                         }
                     )
                 else:
-                    trace = go.Bar(
-                        x=grouped_df['Expense Type'],
-                        y=grouped_df['Amount']
-                    )
-
-                    layout = go.Layout(
-                        title={
-                            'text': f'<b>Expenses from {start_str} to {end_str}</b>',
-                        },
-                        title_x=.5,
-                        xaxis={
-                            'title': '<b>Expense Type</b>'
-                        },
-                        yaxis={
-                            'title': '<b>Amount (in dollars)</b>'
-                        },
-                        plot_bgcolor='rgba(0, 0, 0, 0)',
-                        paper_bgcolor='rgba(0, 0, 0, 0)',
-                    )
-                    fig = go.Figure(data=trace, layout=layout)
-                    plt_div = plot(fig, output_type='div')
+                    # Max date for all expense records
+                    max_date = await alatest_inserted_date()
 
                     # Display info alert for results with current timestamp
                     messages.info(
@@ -494,14 +994,12 @@ def get_data(request):
                         "%m-%d-%Y %I:%M:%S %p %Z"
                         )}.'''
                     )
-                    return render(
+                    return await sync_to_async(render)(
                         request=request,
                         template_name='expense_tracking/results.html',
                         context={
-                            'grouped_df': build_table(
-                                grouped_df, 'blue_light'
-                            ),
-                            'plt_div': plt_div,
+                            'grouped_df': report['grouped_df'],
+                            'plt_div': report['plt_div'],
                             'start': start,
                             'end': end
                         }
@@ -511,12 +1009,69 @@ def get_data(request):
     else:
         form = DateRangeForm()
 
-    # Render data visualization template for 2021 data
-    return render(
+    # Render data visualization template for 2021 data, with a 400 status
+    # for an invalid range
+    return await sync_to_async(render)(
         request=request,
         template_name='expense_tracking/get_data.html',
         context={
             'form': form
+        },
+        status=400 if form.errors else 200
+    )
+
+
+@login_required
+@conditional_page(expense_page_parts)
+async def trends(request):
+    # Function requires user to be logged in and renders the monthly or
+    # weekly expense totals per expense type over several years, with their
+    # rolling averages and year over year changes.  The totals are read from
+    # the rollups and the series computed in the chart thread pool; the page
+    # draws the charts with plotly.js.
+
+    form = TrendForm(request.GET)
+    if not form.is_valid():
+        return await sync_to_async(render)(
+            request=request,
+            template_name='expense_tracking/trends.html',
+            context={
+                'form': form
+            }
+        )
+
+    end = form.cleaned_data['end_date']
+    period = form.cleaned_data['period']
+    window = form.cleaned_data['window']
+    start, totals_start = trend_range(
+        form.cleaned_data['start_date'], end, period
+    )
+
+    async def build_trends():
+        totals = await aexpense_totals(totals_start, end, period=period)
+        if not totals:
+            return {}
+        return await asyncio.get_running_loop().run_in_executor(
+            chart_executor, draw_trends, start, end, period, window, totals
+        )
+
+    trend = await acached_report(
+        f'trends:{period}:{window}', totals_start, end, build_trends
+    )
+
+    return await sync_to_async(render)(
+        request=request,
+        template_name='expense_tracking/trends.html',
+        context={
+            'form': form,
+            'trend': trend,
+            'none': (
+                None if trend else 'No records found for the specified range!'
+            ),
+            'start': start,
+            'end': end,
+            'period': period,
+            'window': window
         }
     )
 
@@ -527,3 +1082,41 @@ def results(request):
         request=request,
         template_name='expense_tracking/results.html'
     )
+
+
+@login_required
+async def budget(request):
+
+    # Budget for the requested month, or the current month
+    form = BudgetMonthForm(request.GET)
+    if form.is_valid():
+        month = form.cleaned_data['month']
+    else:
+        month = timezone.now().date().replace(day=1)
+        form = BudgetMonthForm(initial={'month': month})
+
+    budgets = await abudget_vs_actual(month)
+
+    if not budgets:
+        return await sync_to_async(render)(
+            request=request,
+            template_name='expense_tracking/budget.html',
+            context={
+                'form': form,
+                'none': 'No budget or expenses found for this month!',
+                'current_month_display_name': month.strftime('%B'),
+                'current_year': month.year
+            }
+        )
+
+    return await sync_to_async(render)(
+        request=request,
+        template_name='expense_tracking/budget.html',
+        context={
+            'form': form,
+            'budget': budgets,
+            'charts': budget_charts(budgets, month.strftime('%B %Y')),
+            'current_month_display_name': month.strftime('%B'),
+            'current_year': month.year
+        }
+    )
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'expense_tracking.apps.ExpenseTrackingConfig',
     'widget_tweaks',
     'captcha',
@@ -55,7 +56,14 @@ DBBACKUP_STORAGE = 'django.core.files.storage.FileSystemStorage'
 DBBACKUP_STORAGE_OPTIONS = {'location': '/home/mfsd1809/Dev/FullStackWebDeveloper/GitRepos/django-expenses/backup'}
 
 MIDDLEWARE = [
+    'expense_tracking.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Responses are compressed with brotli (when installed) or gzip, after
+    # ConditionalGetMiddleware has answered requests for unchanged pages
+    # with 304 Not Modified
+    'django.middleware.gzip.GZipMiddleware',
+    'expense_tracking.middleware.BrotliMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -77,6 +85,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'expense_tracking.fragments.fragment_settings',
             ],
         },
     },
@@ -87,6 +96,15 @@ WSGI_APPLICATION = 'project.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
+#
+# Connections are reused rather than opened per request.  By default each
+# worker thread keeps its connection open for DB_CONN_MAX_AGE seconds and
+# checks it is still usable before reusing it.  Set DB_POOL=true in .env to
+# use a psycopg connection pool per process instead (needs psycopg 3 with the
+# pool extra, `pip install "psycopg[binary,pool]"`), sized by DB_POOL_MIN_SIZE
+# and DB_POOL_MAX_SIZE; this suits ASGI servers, whose threads come and go.
+
+DB_POOL = config.get('DB_POOL', 'false').lower() in ('1', 'true', 'yes')
 
 DATABASES = {
     'default': {
@@ -94,12 +112,99 @@ DATABASES = {
         'NAME': config['DB_NAME'],
         'USER': config['DB_USER'],
         'PASSWORD': config['DB_USER_PASSWORD'],
-        'HOST': '127.0.0.1',
-        'PORT': '5432',
+        'HOST': config.get('DB_HOST', '127.0.0.1'),
+        'PORT': config.get('DB_PORT', '5432'),
+        # Pooled connections are returned to the pool after each request,
+        # so they must not also be persistent
+        'CONN_MAX_AGE': 0 if DB_POOL else int(
+            config.get('DB_CONN_MAX_AGE', 60)
+        ),
+        'CONN_HEALTH_CHECKS': not DB_POOL,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(config.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(config.get('DB_POOL_MAX_SIZE', 10)),
+                'timeout': int(config.get('DB_POOL_TIMEOUT', 10)),
+            },
+        } if DB_POOL else {},
     }
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+#
+# Report results, and the versions that invalidate them when expenses
+# change, are cached in the 'reports' cache.  Every web and job worker
+# process must share it, so it defaults to files in the project's cache
+# directory; set REPORT_CACHE_BACKEND and REPORT_CACHE_LOCATION in .env to
+# use another shared cache, e.g.
+# django.core.cache.backends.redis.RedisCache and redis://127.0.0.1:6379
+
+REPORT_CACHE_BACKEND = config.get(
+    'REPORT_CACHE_BACKEND',
+    'django.core.cache.backends.filebased.FileBasedCache'
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reports': {
+        'BACKEND': REPORT_CACHE_BACKEND,
+        'LOCATION': config.get(
+            'REPORT_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'reports')
+        ),
+        'TIMEOUT': None,
+        # Files beyond MAX_ENTRIES are culled at random, versions included
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        } if REPORT_CACHE_BACKEND.endswith('FileBasedCache') else {},
+    },
+    # Rendered fragments of pages (the expense table, navbar and expense
+    # type dropdowns), keyed by the data they show so they are never stale
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template_fragments',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+# Seconds a rendered template fragment is kept
+FRAGMENT_CACHE_TIMEOUT = 60 * 10
+
+# Seconds a cached report is kept (it is invalidated earlier when an expense
+# in its date range changes)
+REPORT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Threads each process draws report charts in when serving the async report
+# views, which keeps pandas and plotly work off the event loop
+CHART_WORKERS = int(config.get('CHART_WORKERS', 2))
+
+# Background jobs (reports, exports and CSV imports), run by the run_jobs
+# command: worker threads per process, attempts per job, seconds before the
+# first retry (doubling after each attempt), seconds a job may run before it
+# is considered stopped and queued again, and days finished jobs and their
+# files are kept
+JOB_WORKERS = int(config.get('JOB_WORKERS', 2))
+JOB_MAX_ATTEMPTS = int(config.get('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_DELAY = int(config.get('JOB_RETRY_DELAY', 30))
+JOB_TIMEOUT = int(config.get('JOB_TIMEOUT', 60 * 60))
+JOB_KEEP_DAYS = int(config.get('JOB_KEEP_DAYS', 7))
+
+# Who may read the Prometheus metrics at /metrics besides staff users:
+# scrapers sending METRICS_TOKEN as a bearer token, and the addresses in
+# METRICS_ALLOWED_IPS (comma separated in .env).  Both are empty by default;
+# behind a reverse proxy every request comes from the proxy's address, so
+# prefer the token.
+METRICS_TOKEN = config.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [
+    address
+    for address in config.get('METRICS_ALLOWED_IPS', '').split(',')
+    if address
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -140,6 +245,12 @@ STATIC_DIRS = [
     'expenses/expense_tracking'
 ]
 
+# Uploaded files and job results (downloaded through the jobs views, not
+# served from MEDIA_URL)
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = config.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
@@ -0,0 +1,297 @@
+import datetime
+import io
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from expense_tracking.csv_import import COLUMNS, import_expenses
+from expense_tracking.models import Expense
+from expense_tracking.pagination import encode_cursor
+from expense_tracking.report_cache import get_cache
+
+
+# Usage: python manage.py runscript bench_app --script-args \
+#            requests=50 save=bench.json compare=bench.json
+#
+# Runs repeatable scenarios against the current database through Django's
+# test client, in process, so the numbers are the application's own time
+# without the network:
+#   - the expense list, a page deep in the list and an expense type filter
+#   - get_data over a month, a quarter and a year, with the report cache
+#     cleared first
+#   - the trends report
+#   - adding, editing and deleting expenses
+#   - a bulk CSV import
+# For each it prints the p50/p95/p99 latency, the queries per request and
+# the peak memory traced while handling one more request.
+#
+# save=<file> stores the results as a baseline; compare=<file> prints the
+# change from a stored baseline and flags scenarios whose p95 grew by more
+# than threshold=<percent> (default 20) or that run more queries.
+#
+# Seed the database first, e.g. python manage.py seed_expenses 1000000.
+# Requests are made as user=<username>, the first superuser by default.
+# The scenarios clean up after themselves: added expenses are deleted again
+# and imports are rolled back.
+
+WARMUP = 2
+
+
+def percentile(values, percent):
+    return statistics.quantiles(values, n=100, method='inclusive')[
+        percent - 1
+    ]
+
+
+class Scenario:
+    # Class for a named request (or other operation) run repeat times.
+    # before(i) runs untimed ahead of call(i), which returns a response or
+    # None.
+
+    def __init__(self, name, call, before=None, repeat=None):
+        self.name = name
+        self.call = call
+        self.before = before
+        self.repeat = repeat
+
+
+def run_scenario(scenario, repeat):
+    # Returns the latencies (ms), queries per call and peak memory (KB) of a
+    # scenario
+
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    def call(i):
+        if scenario.before is not None:
+            scenario.before(i)
+        began = time.perf_counter()
+        with connection.execute_wrapper(count):
+            response = scenario.call(i)
+        elapsed = (time.perf_counter() - began) * 1000
+        if response is not None and response.status_code >= 400:
+            raise RuntimeError(
+                f'{scenario.name} returned {response.status_code}'
+            )
+        return elapsed
+
+    for i in range(WARMUP):
+        call(i)
+    queries = 0
+    latencies = [call(WARMUP + i) for i in range(repeat)]
+    queries_per_call = queries / repeat
+
+    tracemalloc.start()
+    call(WARMUP + repeat)
+    peak = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+
+    return {
+        'requests': repeat,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'mean_ms': statistics.mean(latencies),
+        'queries': queries_per_call,
+        'peak_kb': peak,
+    }
+
+
+def build_scenarios(client, import_rows):
+    # Returns the scenarios, in the order they must run: expenses added by
+    # the add scenario are edited, then deleted
+
+    expenses = Expense.objects.order_by('-expense_date', '-id')
+    total = expenses.count()
+    if total < 100:
+        raise RuntimeError(
+            'Seed the database first, e.g. '
+            'python manage.py seed_expenses 100000'
+        )
+    deep = expenses[total // 2]
+    latest = expenses.first().expense_date
+    expense_type_id = deep.expense_type_id
+
+    def get_data(days):
+        def call(i):
+            return client.post(reverse('expense_tracking:get_data'), {
+                'start_date': latest - datetime.timedelta(days=days),
+                'end_date': latest,
+            })
+        return call
+
+    added = []
+
+    def add(i):
+        return client.post(reverse('expense_tracking:add_expense'), {
+            'expense_date': latest,
+            'expense_type': expense_type_id,
+            'name': f'Benchmark {i}',
+            'org': 'Benchmark',
+            'amount': '12.34',
+            'notes': '',
+        })
+
+    def find_added(i):
+        if not added:
+            added.extend(Expense.objects.filter(
+                org='Benchmark'
+            ).order_by('id').values_list('pk', flat=True))
+
+    def edit(i):
+        return client.post(
+            reverse('expense_tracking:edit_expense', args=[added[i]]),
+            {
+                'expense_date': latest,
+                'expense_type': expense_type_id,
+                'name': f'Benchmark {i} edited',
+                'org': 'Benchmark',
+                'amount': '43.21',
+                'notes': '',
+            }
+        )
+
+    def delete(i):
+        return client.get(
+            reverse('expense_tracking:delete_expense', args=[added.pop()])
+        )
+
+    type_name = deep.expense_type.name
+    lines = [','.join(COLUMNS)] + [
+        f'{latest},{type_name},Benchmark import {i},Benchmark,9.99,'
+        for i in range(import_rows)
+    ]
+    csv_text = '\n'.join(lines) + '\n'
+
+    def bulk_import(i):
+        # The import is rolled back, so every run imports the same rows
+        # into the same database
+        with transaction.atomic():
+            import_expenses(io.StringIO(csv_text))
+            transaction.set_rollback(True)
+
+    def clear_cache(i):
+        get_cache().clear()
+
+    return [
+        Scenario('list', lambda i: client.get(
+            reverse('expense_tracking:expenses')
+        )),
+        Scenario('deep_page', lambda i: client.get(
+            reverse('expense_tracking:expenses'),
+            {'after': encode_cursor(deep)}
+        )),
+        Scenario('filter', lambda i: client.get(
+            reverse('expense_tracking:filter', args=[expense_type_id])
+        )),
+        Scenario('get_data_month', get_data(30), before=clear_cache),
+        Scenario('get_data_quarter', get_data(91), before=clear_cache),
+        Scenario('get_data_year', get_data(365), before=clear_cache),
+        Scenario('trends', lambda i: client.get(
+            reverse('expense_tracking:trends')
+        ), before=clear_cache),
+        Scenario('add', add),
+        Scenario('edit', edit, before=find_added),
+        Scenario('delete', delete),
+        Scenario(f'import_{import_rows}', bulk_import, repeat=3),
+    ]
+
+
+def remove_added():
+    # Deletes the expenses left by an add scenario that did not finish
+
+    for expense in Expense.objects.filter(org='Benchmark'):
+        expense.delete()
+
+
+def print_results(results, baseline=None, threshold=20):
+    header = (
+        f'{"scenario":<18} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+        f'{"queries":>8} {"peak KB":>9}'
+    )
+    if baseline is not None:
+        header += f' {"base p95":>9} {"change":>8}'
+    print(header)
+
+    regressions = 0
+    for name, result in results.items():
+        line = (
+            f'{name:<18} {result["p50_ms"]:>8.1f} {result["p95_ms"]:>8.1f} '
+            f'{result["p99_ms"]:>8.1f} {result["queries"]:>8.1f} '
+            f'{result["peak_kb"]:>9.0f}'
+        )
+        before = (baseline or {}).get(name)
+        if before is not None:
+            change = (result['p95_ms'] / before['p95_ms'] - 1) * 100
+            line += f' {before["p95_ms"]:>9.1f} {change:>+7.0f}%'
+            if change > threshold or result['queries'] > before['queries']:
+                line += '  REGRESSION'
+                regressions += 1
+        print(line)
+    if baseline is not None:
+        print(f'{regressions} regressions (p95 over +{threshold}% or more '
+              'queries than the baseline)')
+
+
+def run(*args):
+    options = dict(arg.split('=', 1) for arg in args)
+    repeat = int(options.get('requests', 50))
+    import_rows = int(options.get('rows', 1000))
+    threshold = float(options.get('threshold', 20))
+
+    if options.get('user'):
+        user = User.objects.get(username=options['user'])
+    else:
+        user = User.objects.filter(is_superuser=True).order_by('id').first()
+    if user is None:
+        raise RuntimeError('Create a superuser or pass user=<username>.')
+
+    host = next(
+        (host.lstrip('.') for host in settings.ALLOWED_HOSTS
+         if host not in ('*', '')),
+        'localhost'
+    )
+    client = Client(HTTP_HOST=host)
+    client.force_login(user)
+
+    print(f'{connection.vendor}, {Expense.objects.count()} expenses, '
+          f'{repeat} requests per scenario')
+    results = {}
+    try:
+        for scenario in build_scenarios(client, import_rows):
+            results[scenario.name] = run_scenario(
+                scenario, scenario.repeat or repeat
+            )
+    finally:
+        remove_added()
+
+    baseline = None
+    if options.get('compare'):
+        with open(options['compare']) as file:
+            baseline = json.load(file)['results']
+    print_results(results, baseline, threshold)
+
+    if options.get('save'):
+        with open(options['save'], 'w') as file:
+            json.dump({
+                'created': timezone.now().isoformat(),
+                'vendor': connection.vendor,
+                'python': platform.python_version(),
+                'expenses': Expense.objects.count(),
+                'requests': repeat,
+                'results': results,
+            }, file, indent=2)
+        print(f'Saved the results to {options["save"]}')
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+
+
+# Usage: python manage.py runscript bench_asgi --script-args \
+#            path=/expenses concurrency=200 requests=5000 workers=4
+#
+# Starts the project under gunicorn (WSGI, sync workers with threads) and
+# under uvicorn (ASGI) with the same number of worker processes, sends the
+# same logged in requests to each at a fixed concurrency and prints the
+# requests per second and latency percentiles of each.  Needs gunicorn and
+# uvicorn installed, a user to log in as (user=<username>, the first
+# superuser by default) and a database the servers can share, e.g.
+# PostgreSQL.  Pass wsgi=<url> and/or asgi=<url> to load test servers that
+# are already running instead.
+
+SERVERS = {
+    'wsgi': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', 'project.wsgi:application',
+        '--workers', str(workers), '--threads', '8',
+        '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+    ],
+    'asgi': lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', 'project.asgi:application',
+        '--workers', str(workers), '--port', str(port),
+        '--log-level', 'warning', '--no-access-log',
+    ],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, workers):
+    # Returns the process and url of a new server, once it accepts
+    # connections
+
+    port = free_port()
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+    process = subprocess.Popen(
+        SERVERS[kind](port, workers), cwd=settings.BASE_DIR, env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'The {kind} server exited.')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(.2)
+    process.terminate()
+    raise RuntimeError(f'The {kind} server did not start.')
+
+
+def session_cookie(username):
+    # Returns a session cookie logging in as username
+
+    users = User.objects.filter(is_active=True)
+    if username:
+        user = users.get(username=username)
+    else:
+        user = users.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            raise RuntimeError('Create a superuser or pass user=<username>.')
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+async def fetch(host, port, request):
+    # Returns the status code of a request sent on a new connection
+
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(request)
+        await writer.drain()
+        status_line = await reader.readline()
+        while await reader.read(65536):
+            pass
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def load(url, cookie, concurrency, total):
+    # Returns the elapsed seconds, latencies (ms) and failed requests of
+    # sending total requests, concurrency at a time
+
+    parts = urlsplit(url)
+    request = (
+        f'GET {parts.path or "/"}{"?" + parts.query if parts.query else ""} '
+        f'HTTP/1.1\r\nHost: {parts.netloc}\r\nCookie: {cookie}\r\n'
+        'Connection: close\r\n\r\n'
+    ).encode()
+    latencies = []
+    failures = 0
+    remaining = total
+
+    async def client():
+        nonlocal failures, remaining
+        while remaining > 0:
+            remaining -= 1
+            began = time.perf_counter()
+            try:
+                status = await fetch(parts.hostname, parts.port, request)
+            except OSError:
+                status = None
+            latencies.append((time.perf_counter() - began) * 1000)
+            if status != 200:
+                failures += 1
+
+    began = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - began, latencies, failures
+
+
+def percentile(values, percent):
+    return statistics.quantiles(values, n=100)[percent - 1]
+
+
+def run(*args):
+    options = dict(arg.split('=', 1) for arg in args)
+    path = options.get('path', '/expenses')
+    concurrency = int(options.get('concurrency', 200))
+    total = int(options.get('requests', 5000))
+    workers = int(options.get('workers', 4))
+    cookie = session_cookie(options.get('user'))
+
+    print(f'{total} requests of {path}, {concurrency} at a time')
+    print(f'{"server":<8} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} '
+          f'{"p99 ms":>9} {"failed":>7}')
+    for kind in SERVERS:
+        process = None
+        url = options.get(kind)
+        if url is None:
+            process, url = start_server(kind, workers)
+        try:
+            # Warm up the workers (imports, connections) before measuring
+            asyncio.run(load(url + path, cookie, workers * 2, workers * 10))
+            elapsed, latencies, failures = asyncio.run(
+                load(url + path, cookie, concurrency, total)
+            )
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+        print(f'{kind:<8} {total / elapsed:>9.0f} '
+              f'{percentile(latencies, 50):>9.1f} '
+              f'{percentile(latencies, 95):>9.1f} '
+              f'{percentile(latencies, 99):>9.1f} {failures:>7}')
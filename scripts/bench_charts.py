@@ -0,0 +1,105 @@
+import time
+
+import pandas as pd
+import plotly.graph_objs as go
+from django.template.loader import render_to_string
+from plotly.offline import plot
+
+from expense_tracking.forms import BudgetMonthForm
+from expense_tracking.reports import budget_charts
+
+
+# Usage: python manage.py runscript bench_charts
+#
+# Renders results.html and budget.html with charts that inline plotly.js
+# (as before) and with charts that load it once from the CDN (as now), and
+# prints the page size and server render time of each.  The budget charts
+# are drawn in the browser from one shared payload.
+
+EXPENSE_TYPES = [
+    'Groceries', 'Rent', 'Utilities', 'Gas', 'Dining', 'Insurance',
+    'Medical', 'Entertainment', 'Clothing', 'Travel'
+]
+BUDGET_CHARTS = 6
+REPEAT = 5
+
+
+def results_page(include_plotlyjs):
+    fig = go.Figure(
+        data=go.Bar(x=EXPENSE_TYPES, y=list(range(len(EXPENSE_TYPES)))),
+        layout=go.Layout(title={'text': '<b>Expenses</b>'})
+    )
+    return render_to_string(
+        'expense_tracking/results.html',
+        {
+            'grouped_df': '<table></table>',
+            'plt_div': plot(
+                fig, output_type='div', include_plotlyjs=include_plotlyjs
+            ),
+            'start': '01-01-2024',
+            'end': '12-31-2024',
+        }
+    )
+
+
+def budget_page(include_plotlyjs):
+    if include_plotlyjs:
+        # The charts as they were before: one figure per chart, each
+        # inlining plotly.js
+        df = pd.DataFrame({
+            'Category': EXPENSE_TYPES,
+            'Budget Amount': [100.0] * len(EXPENSE_TYPES),
+            'Monthly Expense Amount': [80.0] * len(EXPENSE_TYPES),
+        })
+        charts = []
+        for i in range(BUDGET_CHARTS):
+            fig = go.Figure(data=[
+                go.Bar(x=df['Category'], y=df['Budget Amount']),
+                go.Bar(x=df['Category'], y=df['Monthly Expense Amount']),
+            ])
+            charts.append(plot(fig, output_type='div'))
+        return '\n'.join(charts)
+
+    budgets = [
+        {
+            'expense_type': category,
+            'budget': 100.0,
+            'expense': 80.0,
+            'remaining': 20.0,
+        }
+        for category in EXPENSE_TYPES[:BUDGET_CHARTS]
+    ]
+    return render_to_string(
+        'expense_tracking/budget.html',
+        {
+            'form': BudgetMonthForm(initial={'month': '2024-01'}),
+            'budget': budgets,
+            'charts': budget_charts(budgets, 'January 2024'),
+            'current_month_display_name': 'January',
+            'current_year': 2024,
+        }
+    )
+
+
+def measure(page, include_plotlyjs):
+    # Returns the size (KB) and best render time (ms) of a page
+
+    times = []
+    for _ in range(REPEAT):
+        began = time.perf_counter()
+        html = page(include_plotlyjs)
+        times.append((time.perf_counter() - began) * 1000)
+    return len(html.encode()) / 1024, min(times)
+
+
+def run():
+    print(f'{"page":<14} {"inlined KB":>11} {"inlined ms":>11} '
+          f'{"cdn KB":>9} {"cdn ms":>9}')
+    for name, page in [
+        ('results.html', results_page),
+        ('budget.html', budget_page),
+    ]:
+        inline_size, inline_time = measure(page, True)
+        cdn_size, cdn_time = measure(page, False)
+        print(f'{name:<14} {inline_size:>11.0f} {inline_time:>11.1f} '
+              f'{cdn_size:>9.0f} {cdn_time:>9.1f}')
@@ -0,0 +1,108 @@
+import statistics
+import time
+
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+
+# Usage: python manage.py runscript bench_connections --script-args 500
+#
+# Runs the given number of simulated requests (the request started and
+# finished signals Django's connection handling hooks into, around the query
+# of a short request) with a new connection per request, with persistent
+# connections and health checks, and with a psycopg connection pool (when
+# using PostgreSQL with psycopg 3 and psycopg_pool), and prints the time per
+# request and the number of connections opened in each mode.
+
+MODES = {
+    'new connection': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+    'persistent': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True},
+    'pool': {
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+        'pool': {'min_size': 1, 'max_size': 1},
+    },
+}
+
+
+def pool_supported():
+    if connection.vendor != 'postgresql':
+        return False
+    try:
+        import psycopg  # noqa: F401
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def configure(mode):
+    # Applies the connection settings of a mode to the default connection
+
+    connection.close()
+    if connection.vendor == 'postgresql':
+        connection.close_pool()
+    settings_dict = connection.settings_dict
+    settings_dict['CONN_MAX_AGE'] = mode['CONN_MAX_AGE']
+    settings_dict['CONN_HEALTH_CHECKS'] = mode['CONN_HEALTH_CHECKS']
+    settings_dict['OPTIONS'] = dict(settings_dict['OPTIONS'])
+    settings_dict['OPTIONS'].pop('pool', None)
+    if 'pool' in mode:
+        settings_dict['OPTIONS']['pool'] = mode['pool']
+
+
+def measure(requests):
+    # Returns the time (ms) of each simulated request and the number of
+    # connections opened
+
+    connects = 0
+
+    def count(**kwargs):
+        nonlocal connects
+        connects += 1
+
+    connection_created.connect(count)
+    times = []
+    try:
+        for _ in range(requests):
+            began = time.perf_counter()
+            request_started.send(sender=None)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT id FROM expense_tracking_expense '
+                    'ORDER BY expense_date DESC, id DESC LIMIT 1'
+                )
+                cursor.fetchall()
+            request_finished.send(sender=None)
+            times.append((time.perf_counter() - began) * 1000)
+    finally:
+        connection_created.disconnect(count)
+    return times, connects
+
+
+def run(*args):
+    requests = int(args[0]) if args else 500
+    original = dict(connection.settings_dict)
+
+    print(f'{connection.vendor}, {requests} requests per mode')
+    print(f'{"mode":<16} {"mean ms":>9} {"p50 ms":>9} {"p99 ms":>9} '
+          f'{"connects":>9}')
+    try:
+        for name, mode in MODES.items():
+            if 'pool' in mode and not pool_supported():
+                print(f'{name:<16} skipped (needs PostgreSQL, psycopg 3 and '
+                      'psycopg_pool)')
+                continue
+            configure(mode)
+            times, connects = measure(requests)
+            percentiles = statistics.quantiles(times, n=100)
+            print(f'{name:<16} {statistics.mean(times):>9.3f} '
+                  f'{percentiles[49]:>9.3f} {percentiles[98]:>9.3f} '
+                  f'{connects:>9}')
+    finally:
+        connection.close()
+        if connection.vendor == 'postgresql':
+            connection.close_pool()
+        connection.settings_dict.clear()
+        connection.settings_dict.update(original)
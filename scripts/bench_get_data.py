@@ -0,0 +1,136 @@
+import datetime
+import random
+import time
+import tracemalloc
+from decimal import Decimal
+
+import pandas as pd
+from django.db import transaction
+
+from expense_tracking.models import Expense, ExpenseType
+from expense_tracking.reports import (
+    expense_totals_by_type,
+    latest_inserted_date
+)
+from expense_tracking.rollups import refresh_rollups
+
+
+# Usage: python manage.py runscript bench_get_data --script-args 10000 100000
+#
+# Seeds the given numbers of expenses inside a transaction that is rolled
+# back at the end, then times the get_data report using the old in-memory
+# DataFrame path and the database aggregation path.
+
+START = datetime.date(2023, 1, 1)
+END = datetime.date(2023, 12, 31)
+EXPENSE_TYPES = [
+    'Groceries', 'Rent', 'Utilities', 'Gas', 'Dining', 'Insurance',
+    'Medical', 'Entertainment', 'Clothing', 'Travel'
+]
+
+
+def dataframe_report(start, end):
+    # The get_data report as it was computed before: every expense record is
+    # loaded into a dataframe which is then masked and grouped in memory
+
+    df = pd.DataFrame(list(
+        Expense.objects.all().values(
+            'expense_date',
+            'expense_type__name',
+            'name',
+            'org',
+            'amount',
+            'inserted_date'
+        )
+    ))
+    max_date = df['inserted_date'].max()
+    df['amount'] = pd.to_numeric(df['amount'], downcast='float')
+    mask = (df['expense_date'] >= start) & (df['expense_date'] <= end)
+    grouped_df = df[mask].groupby(
+        'expense_type__name', as_index=False
+    )['amount'].sum()
+    grouped_df.columns = ['Expense Type', 'Amount']
+    return grouped_df, max_date
+
+
+def database_report(start, end):
+    # The get_data report computed by the database
+
+    totals = expense_totals_by_type(start, end)
+    max_date = latest_inserted_date()
+    grouped_df = pd.DataFrame(
+        [(total['expense_type'], float(total['amount'])) for total in totals],
+        columns=['Expense Type', 'Amount']
+    )
+    return grouped_df, max_date
+
+
+def measure(report):
+    # Returns the wall time (ms), peak traced memory (KB) and result of report
+
+    tracemalloc.start()
+    began = time.perf_counter()
+    result = report(START, END)
+    elapsed = (time.perf_counter() - began) * 1000
+    peak = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def seed(count, expense_types):
+    # Adds count expenses spread over five years, ten percent of which fall
+    # in the reported year, and refreshes their rollups, which the database
+    # report reads
+
+    first_date = datetime.date(2020, 1, 1)
+    last_date = first_date + datetime.timedelta(days=5 * 365 - 1)
+    rows = []
+    for i in range(count):
+        rows.append(Expense(
+            expense_date=first_date + datetime.timedelta(
+                days=random.randrange(5 * 365)
+            ),
+            expense_type=random.choice(expense_types),
+            name=f'Expense {i}',
+            org=f'Org {i % 500}',
+            amount=Decimal(random.randrange(100, 50000)) / 100,
+        ))
+    Expense.objects.bulk_create(rows, batch_size=5000)
+    refresh_rollups(
+        first_date,
+        last_date,
+        [expense_type.pk for expense_type in expense_types]
+    )
+
+
+def run(*args):
+    sizes = [int(arg) for arg in args] or [10000, 50000, 100000]
+
+    with transaction.atomic():
+        expense_types = [
+            ExpenseType.objects.get_or_create(name=name)[0]
+            for name in EXPENSE_TYPES
+        ]
+        seeded = 0
+        print(
+            f'{"rows":>10} {"dataframe ms":>14} {"dataframe KB":>14} '
+            f'{"database ms":>13} {"database KB":>13}'
+        )
+        for size in sorted(sizes):
+            seed(size - seeded, expense_types)
+            seeded = size
+
+            df_time, df_peak, df_result = measure(dataframe_report)
+            db_time, db_peak, db_result = measure(database_report)
+
+            # Both paths must produce the same report
+            assert list(df_result[0]['Expense Type']) == list(
+                db_result[0]['Expense Type']
+            )
+            assert df_result[1] == db_result[1]
+
+            print(
+                f'{Expense.objects.count():>10} {df_time:>14.1f} '
+                f'{df_peak:>14.0f} {db_time:>13.1f} {db_peak:>13.0f}'
+            )
+        transaction.set_rollback(True)
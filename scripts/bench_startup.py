@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+
+# Usage: python manage.py runscript bench_startup --script-args 5
+#
+# Starts fresh interpreters running `manage.py check` and loading the WSGI
+# application with its URLs (what a worker does before its first request),
+# and prints the best wall time, the largest peak RSS and the heavy
+# libraries each one imported.
+
+HEAVY_MODULES = ['pandas', 'plotly', 'numpy', 'pandasql', 'pretty_html_table']
+
+LOAD_WSGI = (
+    'import sys; '
+    'from project.wsgi import application; '
+    'from django.urls import get_resolver; '
+    'get_resolver().url_patterns; '
+    f'print("modules:" + ",".join(m for m in {HEAVY_MODULES!r} '
+    'if m in sys.modules))'
+)
+
+CHECK = (
+    'import sys; '
+    'from django.core.management import execute_from_command_line; '
+    'execute_from_command_line(["manage.py", "check", "-v", "0"]); '
+    f'print("modules:" + ",".join(m for m in {HEAVY_MODULES!r} '
+    'if m in sys.modules))'
+)
+
+
+def measure(code):
+    # Returns the wall time (ms), peak RSS (MB) and output of running code in
+    # a new interpreter
+
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+    began = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-c', code],
+        cwd=settings.BASE_DIR,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True
+    )
+    output = process.stdout.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = (time.perf_counter() - began) * 1000
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f'Failed to run: {code}')
+    # ru_maxrss is in kilobytes on Linux
+    modules = [
+        line[len('modules:'):]
+        for line in output.splitlines()
+        if line.startswith('modules:')
+    ]
+    return elapsed, usage.ru_maxrss / 1024, modules[-1]
+
+
+def run(*args):
+    repeat = int(args[0]) if args else 5
+
+    print(f'{"scenario":<20} {"best ms":>9} {"peak MB":>9}  heavy modules')
+    for name, code in [
+        ('manage.py check', CHECK),
+        ('WSGI app + URLs', LOAD_WSGI),
+    ]:
+        results = [measure(code) for _ in range(repeat)]
+        best = min(result[0] for result in results)
+        peak = max(result[1] for result in results)
+        modules = results[-1][2] or '-'
+        print(f'{name:<20} {best:>9.0f} {peak:>9.1f}  {modules}')
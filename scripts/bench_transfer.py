@@ -0,0 +1,130 @@
+import datetime
+from importlib.util import find_spec
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import Client
+from django.urls import reverse
+
+from expense_tracking.models import Expense
+
+
+# Usage: python manage.py runscript bench_transfer --script-args user=smk
+#
+# Measures the bytes sent for the expense list, filter, trends, report and
+# API pages: uncompressed, gzipped, with brotli (when the brotli package is
+# installed) and on a repeat visit, when the browser sends the ETag of its
+# copy and an unchanged page is answered with an empty 304 response.  Sizes
+# include the response headers.  Requests are made through Django's test
+# client as user=<username>, the first superuser by default.  The report is
+# a POST, so its repeat visit is only compressed.
+
+ACCEPT = {
+    'plain': 'identity',
+    'gzip': 'gzip',
+    'br': 'br',
+}
+
+
+def response_bytes(response):
+    # Function returns the size of a response's headers and body
+
+    headers = sum(
+        len(f'{name}: {value}\r\n') for name, value in response.items()
+    )
+    return headers + len(response.content)
+
+
+def build_pages():
+    # Returns the (name, method, url, data) of each page measured
+
+    latest = Expense.objects.order_by('-expense_date').values_list(
+        'expense_date', 'expense_type_id'
+    ).first()
+    if latest is None:
+        raise RuntimeError(
+            'Seed the database first, e.g. '
+            'python manage.py seed_expenses 100000'
+        )
+    latest_date, expense_type_id = latest
+    start = latest_date - datetime.timedelta(days=90)
+
+    return [
+        ('expenses', 'get', reverse('expense_tracking:expenses'), None),
+        ('filter', 'get',
+         reverse('expense_tracking:filter', args=[expense_type_id]), None),
+        ('trends', 'get', reverse('expense_tracking:trends'), None),
+        ('api_expenses', 'get',
+         reverse('expense_tracking:expense-list') + '?page_size=500', None),
+        ('api_totals', 'get',
+         reverse('expense_tracking:expense_totals') +
+         f'?start_date={start}&end_date={latest_date}&group_by=type,day',
+         None),
+        # Last, as its messages are shown on the next page
+        ('report', 'post', reverse('expense_tracking:get_data'),
+         {'start_date': start, 'end_date': latest_date}),
+    ]
+
+
+def measure(client, method, url, data, encodings):
+    # Returns the bytes of a first visit with each encoding and of a repeat
+    # visit, and the status of the repeat visit
+
+    request = getattr(client, method)
+    # Visit once so the CSRF cookie is set, as it is for a returning browser
+    request(url, data)
+
+    sizes = {}
+    etag = None
+    for name in encodings:
+        response = request(url, data, HTTP_ACCEPT_ENCODING=ACCEPT[name])
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} returned {response.status_code}')
+        sizes[name] = response_bytes(response)
+        etag = response.get('ETag', etag)
+
+    headers = {'HTTP_ACCEPT_ENCODING': ', '.join(encodings[1:])}
+    if etag is not None:
+        headers['HTTP_IF_NONE_MATCH'] = etag
+    response = request(url, data, **headers)
+    sizes['repeat'] = response_bytes(response)
+    return sizes, response.status_code
+
+
+def run(*args):
+    options = dict(arg.split('=', 1) for arg in args)
+
+    if options.get('user'):
+        user = User.objects.get(username=options['user'])
+    else:
+        user = User.objects.filter(is_superuser=True).order_by('id').first()
+    if user is None:
+        raise RuntimeError('Create a superuser or pass user=<username>.')
+
+    host = next(
+        (host.lstrip('.') for host in settings.ALLOWED_HOSTS
+         if host not in ('*', '')),
+        'localhost'
+    )
+    client = Client(HTTP_HOST=host)
+    client.force_login(user)
+
+    encodings = ['plain', 'gzip']
+    if find_spec('brotli') is not None:
+        encodings.append('br')
+
+    print(f'{"page":<14}' + ''.join(
+        f'{name:>10}' for name in encodings
+    ) + f'{"repeat":>10} {"status":>6} {"saved":>6}')
+    plain = repeat = 0
+    for name, method, url, data in build_pages():
+        sizes, status = measure(client, method, url, data, encodings)
+        plain += sizes['plain']
+        repeat += sizes['repeat']
+        print(f'{name:<14}' + ''.join(
+            f'{sizes[encoding]:>10,}' for encoding in encodings
+        ) + f'{sizes["repeat"]:>10,} {status:>6} '
+            f'{1 - sizes["repeat"] / sizes["plain"]:>6.1%}')
+
+    print(f'A repeat visit of every page sends {repeat:,} bytes instead of '
+          f'{plain:,} ({1 - repeat / plain:.1%} saved).')
@@ -0,0 +1,123 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from expense_tracking.models import Expense, ExpenseType
+from expense_tracking.views import expense_table_rows
+
+
+# Usage: python manage.py runscript explain_indexes --script-args 3000000
+#
+# Seeds the given number of expenses (default 3,000,000) inside a
+# transaction that is rolled back at the end, then prints the query plans
+# of the expense list, filter and date range queries and checks that they
+# use the expense indexes.  The plans are meant to be read on PostgreSQL.
+
+EXPENSE_TYPES = [
+    'Groceries', 'Rent', 'Utilities', 'Gas', 'Dining', 'Insurance',
+    'Medical', 'Entertainment', 'Clothing', 'Travel', 'Gifts', 'Education'
+]
+
+
+def seed(count, expense_type_ids):
+    # Adds count expenses spread over fifteen years
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                '''
+                INSERT INTO expense_tracking_expense
+                    (expense_date, expense_type_id, name, org, amount, notes,
+                     inserted_date)
+                SELECT
+                    DATE '2010-01-01' + (random() * 5475)::int,
+                    (%s::bigint[])[1 + floor(random() * %s)::int],
+                    'Expense ' || i,
+                    'Org ' || (i %% 1000),
+                    round((random() * 500)::numeric, 2),
+                    '',
+                    now()
+                FROM generate_series(1, %s) AS i
+                ''',
+                [expense_type_ids, len(expense_type_ids), count]
+            )
+            cursor.execute('ANALYZE expense_tracking_expense')
+        return
+
+    batch = []
+    for i in range(count):
+        batch.append(Expense(
+            expense_date=datetime.date(2010, 1, 1) + datetime.timedelta(
+                days=random.randrange(5475)
+            ),
+            expense_type_id=random.choice(expense_type_ids),
+            name=f'Expense {i}',
+            org=f'Org {i % 1000}',
+            amount=Decimal(random.randrange(50000)) / 100,
+        ))
+        if len(batch) == 10000:
+            Expense.objects.bulk_create(batch)
+            batch = []
+    Expense.objects.bulk_create(batch)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def run(*args):
+    count = int(args[0]) if args else 3000000
+
+    with transaction.atomic():
+        expense_type_ids = [
+            ExpenseType.objects.get_or_create(name=name)[0].id
+            for name in EXPENSE_TYPES
+        ]
+        seed(count, expense_type_ids)
+
+        checks = [
+            (
+                'Expense list, page 1',
+                expense_table_rows(Expense.objects.all())[:50],
+                'expense_date_id_idx'
+            ),
+            (
+                'Expense list, page after a cursor from 2015',
+                expense_table_rows(Expense.objects.all()).filter(
+                    Q(expense_date__lt=datetime.date(2015, 6, 1)) |
+                    Q(expense_date=datetime.date(2015, 6, 1), pk__lt=1000),
+                    expense_date__lte=datetime.date(2015, 6, 1)
+                )[:51],
+                'expense_date_id_idx'
+            ),
+            (
+                'Expense list filtered by type',
+                expense_table_rows(
+                    Expense.objects.filter(expense_type_id=expense_type_ids[0])
+                )[:50],
+                'expense_type_date_id_idx'
+            ),
+            (
+                'Expenses in a one month range',
+                Expense.objects.filter(
+                    expense_date__range=(
+                        datetime.date(2020, 1, 1), datetime.date(2020, 1, 31)
+                    )
+                ).values('expense_type_id', 'amount'),
+                'expense_date_id_idx'
+            ),
+        ]
+
+        failures = 0
+        for title, queryset, index in checks:
+            plan = queryset.explain()
+            used = index in plan
+            failures += not used
+            print(f'== {title}: {"uses" if used else "DOES NOT USE"} {index}')
+            print(plan)
+            print()
+
+        print(f'{len(checks) - failures} of {len(checks)} plans use the '
+              'expected index.')
+        transaction.set_rollback(True)